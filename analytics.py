@@ -0,0 +1,358 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from game import LOCATION_NAMES, replay_moves
+from game_log import GAMES_DIR, list_game_logs, read_game_log
+
+# Columnar index over the game logs in games/, so analyses don't re-parse
+# every JSON file. Logs are flattened into NumPy arrays, one row per game, per
+# turn and per action, stored in <games>/.index/index.npz next to a manifest
+# of the ingested files (size and mtime); an update only parses new or
+# changed logs. Needs NumPy.
+
+INDEX_DIRNAME = '.index'
+INDEX_VERSION = 1
+MAX_TURNS = 120
+
+TEAMS = ('Blue', 'Red')
+TEAM_CODES = {'Blue': 1, 'Red': 2}
+# games['winner']: 0 Draw, 1 Blue, 2 Red, 3 game did not finish
+OUTCOMES = ('Draw', 'Blue', 'Red', 'Unfinished')
+ACTION_TYPES = ('move', 'reinforce', 'other')
+LOCATION_CODES = {name: i for i, name in enumerate(LOCATION_NAMES)}
+
+# Column name -> dtype, per table
+SCHEMA = {
+    'games': {'game_id': str, 'file': str, 'blue_model': str, 'red_model': str, 'seed': str,
+              'turns': 'int16', 'winner': 'int8', 'winner_exact': 'bool'},
+    'turns': {'game': 'int32', 'turn': 'int16', 'team': 'int8', 'resources': 'int32', 'own_units': 'int16',
+              'opponent_units': 'int16', 'actions': 'int16', 'controller_ms': 'float32', 'control': 'int8'},
+    'actions': {'game': 'int32', 'turn': 'int16', 'team': 'int8', 'type': 'int8', 'location': 'int8'},
+}
+
+
+def index_dir(games_dir=GAMES_DIR):
+    return os.path.join(games_dir, INDEX_DIRNAME)
+
+
+def infer_winner(header, moves):
+    """
+    Works out who won a logged game (logs do not record it).
+
+    Seeded logs are re-simulated, which is exact. Otherwise a game that stopped before
+    the turn limit is taken to be won by the team that moved last.
+
+    :return: tuple (outcome from OUTCOMES, bool exact)
+    """
+    if header and header.get('seed') is not None:
+        try:
+            game = None
+            for game, _, _ in replay_moves(moves, header['seed']):
+                pass
+            winner = game.check_victory() if game else None
+            if winner:
+                return winner, True
+            return ('Draw' if moves and moves[-1]['turn'] >= MAX_TURNS else 'Unfinished'), True
+        except ValueError:
+            pass
+    if not moves:
+        return 'Unfinished', False
+    if moves[-1]['turn'] >= MAX_TURNS:
+        return 'Draw', False
+    return moves[-1]['team'], False
+
+
+def _flatten(path):
+    # One log -> (game row, turn rows, action rows); rows reference the game as 0
+    header, moves = read_game_log(path)
+    header = header or {}
+    models = header.get('models') or {}
+    winner, exact = infer_winner(header, moves)
+    game_id = header.get('game_id') or os.path.basename(path).split('.')[0][len('game_'):]
+    game = {
+        'game_id': game_id, 'file': os.path.basename(path),
+        'blue_model': models.get('Blue') or '', 'red_model': models.get('Red') or '',
+        'seed': '' if header.get('seed') is None else str(header['seed']),
+        'turns': moves[-1]['turn'] if moves else 0,
+        'winner': OUTCOMES.index(winner), 'winner_exact': exact,
+    }
+    turns, actions = [], []
+    for move in moves:
+        team = TEAM_CODES.get(move.get('team'), 0)
+        visible = move.get('visible_state') or {}
+        locations = visible.get('locations') or {}
+        logged_actions = move.get('actions') or []
+        timings = (move.get('telemetry') or {}).get('timings_ms') or {}
+        turns.append({
+            'game': 0, 'turn': move['turn'], 'team': team,
+            'resources': visible.get('resources', 0),
+            'own_units': visible.get('own_unit_count', 0),
+            'opponent_units': visible.get('opponent_unit_count', 0),
+            'actions': len(logged_actions),
+            'controller_ms': timings.get('controller', float('nan')),
+            'control': [TEAM_CODES.get((locations.get(name) or {}).get('control'), 0) for name in LOCATION_NAMES],
+        })
+        for action in logged_actions:
+            kind = action.get('type') if isinstance(action, dict) else None
+            if kind == 'move':
+                target = action.get('to')
+            elif kind == 'reinforce':
+                target = action.get('location')
+            else:
+                kind, target = 'other', None
+            actions.append({
+                'game': 0, 'turn': move['turn'], 'team': team,
+                'type': ACTION_TYPES.index(kind), 'location': LOCATION_CODES.get(target, -1),
+            })
+    return game, turns, actions
+
+
+def _columns(table, rows):
+    columns = {}
+    for name, dtype in SCHEMA[table].items():
+        values = [row[name] for row in rows]
+        if name == 'control':
+            columns[name] = np.array(values, dtype=dtype).reshape(len(rows), len(LOCATION_NAMES))
+        else:
+            columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+def _empty_tables():
+    return {table: _columns(table, []) for table in SCHEMA}
+
+
+def _load_tables(path):
+    with np.load(path) as data:
+        return {table: {name: data[f'{table}.{name}'] for name in SCHEMA[table]} for table in SCHEMA}
+
+
+def _save_tables(path, tables):
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **{f'{table}.{name}': column for table, columns in tables.items() for name, column in columns.items()})
+    os.replace(tmp, path)
+
+
+def update_index(games_dir=GAMES_DIR, rebuild=False):
+    """
+    Brings the index up to date with the logs in games_dir, parsing only files that are
+    new or whose size or mtime changed since they were ingested; rows of changed and
+    deleted logs are dropped.
+
+    :param rebuild: ignore the manifest and ingest every log again
+    :return: dict with counts of 'added', 'removed' and 'games' (total indexed)
+    """
+    directory = index_dir(games_dir)
+    os.makedirs(directory, exist_ok=True)
+    data_path = os.path.join(directory, 'index.npz')
+    manifest_path = os.path.join(directory, 'manifest.json')
+
+    manifest = {}
+    tables = None
+    if not rebuild and os.path.exists(manifest_path) and os.path.exists(data_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        if stored.get('version') == INDEX_VERSION:
+            manifest = stored['files']
+            tables = _load_tables(data_path)
+    if tables is None:
+        manifest = {}
+        tables = _empty_tables()
+
+    current = {}
+    for path in list_game_logs(games_dir):
+        st = os.stat(path)
+        current[os.path.basename(path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    stale = {name for name, meta in manifest.items() if current.get(name) != meta}
+    new = [name for name, meta in current.items() if manifest.get(name) != meta]
+
+    if stale:
+        # Drop stale games and renumber the rest
+        keep = ~np.isin(tables['games']['file'], sorted(stale))
+        renumber = np.cumsum(keep) - 1
+        tables['games'] = {name: column[keep] for name, column in tables['games'].items()}
+        for table in ('turns', 'actions'):
+            rows = keep[tables[table]['game']]
+            tables[table] = {name: column[rows] for name, column in tables[table].items()}
+            tables[table]['game'] = renumber[tables[table]['game']].astype('int32')
+
+    if new:
+        first = len(tables['games']['file'])
+        games, turns, actions = [], [], []
+        for offset, name in enumerate(sorted(new)):
+            game, game_turns, game_actions = _flatten(os.path.join(games_dir, name))
+            games.append(game)
+            for row in game_turns + game_actions:
+                row['game'] = first + offset
+            turns += game_turns
+            actions += game_actions
+        for table, rows in (('games', games), ('turns', turns), ('actions', actions)):
+            added = _columns(table, rows)
+            tables[table] = {name: np.concatenate([tables[table][name], added[name]]) for name in SCHEMA[table]}
+
+    if stale or new or not os.path.exists(data_path):
+        _save_tables(data_path, tables)
+        tmp = manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'files': current}, f, indent=1)
+        os.replace(tmp, manifest_path)
+    return {'added': len(new), 'removed': len(stale - set(new)), 'games': len(tables['games']['file'])}
+
+
+class GameIndex:
+    """
+    Read-only view of an index built by update_index, with common queries.
+
+    The raw columns are in `games`, `turns` and `actions` (dicts of NumPy arrays) for
+    anything the query methods don't cover.
+    """
+
+    def __init__(self, tables):
+        self.games = tables['games']
+        self.turns = tables['turns']
+        self.actions = tables['actions']
+
+    @classmethod
+    def open(cls, games_dir=GAMES_DIR, update=True):
+        """
+        Loads the index for games_dir, updating it first unless update is False.
+        """
+        if update:
+            update_index(games_dir)
+        return cls(_load_tables(os.path.join(index_dir(games_dir), 'index.npz')))
+
+    def _game_mask(self, blue_model=None, red_model=None):
+        mask = np.ones(len(self.games['file']), dtype=bool)
+        if blue_model is not None:
+            mask &= self.games['blue_model'] == blue_model
+        if red_model is not None:
+            mask &= self.games['red_model'] == red_model
+        return mask
+
+    def win_rates(self, blue_model=None, red_model=None):
+        """
+        Outcome counts and shares over all finished games, optionally only those with the given models.
+
+        :return: dict outcome -> {'games': int, 'rate': float} for Blue, Red and Draw
+        """
+        outcomes = self.games['winner'][self._game_mask(blue_model, red_model)]
+        counts = np.bincount(outcomes, minlength=len(OUTCOMES))
+        finished = counts[:3].sum()
+        return {
+            OUTCOMES[code]: {'games': int(counts[code]), 'rate': float(counts[code] / finished) if finished else 0.0}
+            for code in (1, 2, 0)
+        }
+
+    def win_rates_by_matchup(self):
+        """
+        :return: dict (blue_model, red_model) -> win_rates for that pairing
+        """
+        pairs = sorted(set(zip(self.games['blue_model'].tolist(), self.games['red_model'].tolist())))
+        return {(blue, red): self.win_rates(blue, red) for blue, red in pairs}
+
+    def action_frequencies(self, team=None, model=None):
+        """
+        How often each action type was ordered, per team or model if given.
+
+        :param team: 'Blue' or 'Red'
+        :param model: only actions by teams played by this model (either side)
+        :return: dict action type -> {'count': int, 'share': float, 'per_turn': float}
+        """
+        rows = np.ones(len(self.actions['type']), dtype=bool)
+        turn_rows = np.ones(len(self.turns['turn']), dtype=bool)
+        if team is not None:
+            rows &= self.actions['team'] == TEAM_CODES[team]
+            turn_rows &= self.turns['team'] == TEAM_CODES[team]
+        if model is not None:
+            team_models = np.stack([self.games['blue_model'], self.games['red_model']])
+            # Row i of each table is by `model` when its game's model for its team matches
+            played = team_models == model
+            rows &= played[np.maximum(self.actions['team'] - 1, 0), self.actions['game']] & (self.actions['team'] > 0)
+            turn_rows &= played[np.maximum(self.turns['team'] - 1, 0), self.turns['game']] & (self.turns['team'] > 0)
+        counts = np.bincount(self.actions['type'][rows], minlength=len(ACTION_TYPES))
+        total = counts.sum()
+        turns = turn_rows.sum()
+        return {
+            kind: {'count': int(counts[i]), 'share': float(counts[i] / total) if total else 0.0,
+                   'per_turn': float(counts[i] / turns) if turns else 0.0}
+            for i, kind in enumerate(ACTION_TYPES)
+        }
+
+    def control_timeline(self, game_id=None):
+        """
+        Who controlled each location, turn by turn (at the start of each turn).
+
+        For one game: dict location -> list of 'Blue', 'Red' or None per logged turn.
+        Over all games: dict location -> {'Blue': array, 'Red': array} where element t-1
+        is the share of games still running at turn t in which that team held it.
+        """
+        control = self.turns['control']
+        if game_id is not None:
+            matches = np.flatnonzero(self.games['game_id'] == game_id)
+            if not matches.size:
+                raise KeyError(f"Game '{game_id}' is not in the index")
+            rows = self.turns['game'] == matches[0]
+            order = np.argsort(self.turns['turn'][rows], kind='stable')
+            names = (None, 'Blue', 'Red')
+            return {
+                loc: [names[code] for code in control[rows][order, i]]
+                for i, loc in enumerate(LOCATION_NAMES)
+            }
+        turns = self.turns['turn'].astype(np.int64)
+        length = int(turns.max()) if turns.size else 0
+        running = np.bincount(turns - 1, minlength=length)
+        timeline = {}
+        for i, loc in enumerate(LOCATION_NAMES):
+            timeline[loc] = {}
+            for team, code in TEAM_CODES.items():
+                held = np.bincount(turns - 1, weights=(control[:, i] == code).astype(float), minlength=length)
+                timeline[loc][team] = np.divide(held, running, out=np.zeros(length), where=running > 0)
+        return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the game logs and report win rates, actions and control")
+    parser.add_argument("--games-dir", default=GAMES_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="re-ingest every log")
+    parser.add_argument("--game", default=None, help="print the control timeline of one game ID")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = update_index(args.games_dir, rebuild=args.rebuild)
+    print(f"Index: {stats['games']} games ({stats['added']} ingested, {stats['removed']} removed) "
+          f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    index = GameIndex.open(args.games_dir, update=False)
+    if args.game:
+        for loc, owners in index.control_timeline(args.game).items():
+            print(f"{loc:<24} " + ''.join({'Blue': 'B', 'Red': 'R'}.get(o, '.') for o in owners))
+        return
+
+    rates = index.win_rates()
+    print(f"\n{len(index.games['file'])} games, {len(index.turns['turn'])} turns, {len(index.actions['type'])} actions")
+    print('  '.join(f"{outcome}: {r['games']} ({r['rate']:.1%})" for outcome, r in rates.items()))
+
+    print(f"\n{'Blue':<40} {'Red':<40} {'Blue W':>7} {'Red W':>6} {'Draws':>6}")
+    for (blue, red), r in index.win_rates_by_matchup().items():
+        print(f"{blue or '?':<40} {red or '?':<40} {r['Blue']['games']:>7} {r['Red']['games']:>6} {r['Draw']['games']:>6}")
+
+    print(f"\n{'Action':<12} {'Blue':>14} {'Red':>14}")
+    by_team = {team: index.action_frequencies(team) for team in TEAMS}
+    for kind in ACTION_TYPES:
+        print(f"{kind:<12} " + ' '.join(f"{by_team[t][kind]['count']:>6} ({by_team[t][kind]['per_turn']:.2f}/t)" for t in TEAMS))
+
+    timeline = index.control_timeline()
+    print(f"\nShare of games with each location held (Blue/Red) at turns 1, 10, 20, 40")
+    for loc, shares in timeline.items():
+        cells = [f"{shares['Blue'][t - 1]:.0%}/{shares['Red'][t - 1]:.0%}" for t in (1, 10, 20, 40) if t <= len(shares['Blue'])]
+        print(f"{loc:<24} " + '  '.join(f"{c:>9}" for c in cells))
+    print(f"\nQueries took {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
+import argparse
 import asyncio
 import time
 import sys
 from dataclasses import dataclass
-from typing import List
-from game import Game
-from llm_controller import get_action_plan
+from typing import Callable, Dict, List
+from game import Game, derive_seed
+from llm_controller import get_action_plan, get_unique_game_id, TEAM_MODELS
+from game_log import GameLogWriter
+from controllers import CONTROLLER_NAMES, describe_controller, get_controller
+import llm_controller
+from response_cache import ResponseCache
+from sequential import SequentialTest
+from telemetry import PERCENTILES, start_turn, telemetry, timed, write_prometheus
+from miniOR import close_client, rate_limiter, set_max_inflight_requests, set_rate_limit, usage_stats, usage_summary
 
 @dataclass
 class GameResult:
@@ -18,42 +26,91 @@ class GameResult:
     duration_seconds: float
 
 class BatchGameRunner:
-    def __init__(self):
+    def __init__(self, log_games: bool = True, concurrency: int = 1, max_inflight_requests: int | None = None,
+                 controllers: Dict[str, Callable | str] | None = None, master_seed=None):
         self.all_results: List[GameResult] = []
         self.current_batch_results: List[GameResult] = []
+        self.log_games = log_games
+        # Per-team async controllers with get_action_plan's signature (see controllers.py), or
+        # controller names, which are built afresh for each game with an RNG seeded from the game's seed
+        self.controllers = {'Blue': get_action_plan, 'Red': get_action_plan, **(controllers or {})}
+        # Game n is seeded with derive_seed(master_seed, n); None gives every game a fresh seed
+        self.master_seed = master_seed
+        # Number of games played at once; LLM calls from all of them share miniOR's request cap
+        self.concurrency = max(1, concurrency)
+        if max_inflight_requests is not None:
+            set_max_inflight_requests(max_inflight_requests)
         
-    async def run_single_game(self, game_number: int) -> GameResult:
-        """Run a single game without visualization for speed"""
+    async def run_single_game(self, game_number: int, seed=None,
+                              controllers: Dict[str, Callable] | None = None) -> GameResult:
+        """Run a single game without visualization for speed.
+        `seed` makes the dice reproducible (default: derived from master_seed, if set);
+        `controllers` overrides the runner's for this game."""
         start_time = time.time()
-        game = Game()
+        if seed is None and self.master_seed is not None:
+            seed = derive_seed(self.master_seed, game_number)
+        game = Game(seed=seed)
+        controllers = {
+            team: get_controller(c, seed=derive_seed(game.seed, team)) if isinstance(c, str) else c
+            for team, c in {**self.controllers, **(controllers or {})}.items()
+        }
+        game_log = None
+        if self.log_games:
+            game_id = f"{get_unique_game_id()}_{game_number}"
+            models = {team: describe_controller(team, controller) for team, controller in controllers.items()}
+            # The seed lets replay.py re-simulate the game exactly
+            game_log = GameLogWriter(game_id, header={'game_id': game_id, 'models': models, 'seed': game.seed})
         
         winner = None
         turn = 0
         
-        for turn in range(1, 121):  # Max 120 turns
-            game.turn = turn
+        # The log is closed (and synced) even when the game is cancelled, e.g. by early stopping
+        try:
+            for turn in range(1, 121):  # Max 120 turns
+                game.turn = turn
+            
+                active_team = 'Blue' if turn % 2 == 1 else 'Red'
+            
+                recorder = start_turn()
             
-            active_team = 'Blue' if turn % 2 == 1 else 'Red'
+                # Get state and actions from LLM
+                with timed('get_visible_state'):
+                    state = game.get_visible_state(active_team)
+                with timed('controller'):
+                    actions, _, response = await controllers[active_team](active_team, state)
+                logged_actions = actions.get('actions', [])
             
-            # Get state and actions from LLM
-            state = game.get_visible_state(active_team)
-            actions, _, _ = await get_action_plan(active_team, state)
+                # Apply action limit based on opponent units
+                opponent_team = 'Red' if active_team == 'Blue' else 'Blue'
+                num_opponent_units = len(game.teams[opponent_team].units)
+                action_limit = max(1, num_opponent_units)
             
-            # Apply action limit based on opponent units
-            opponent_team = 'Red' if active_team == 'Blue' else 'Blue'
-            num_opponent_units = len(game.teams[opponent_team].units)
-            action_limit = max(1, num_opponent_units)
+                if len(actions['actions']) > action_limit:
+                    actions['actions'] = actions['actions'][:action_limit]
             
-            if len(actions['actions']) > action_limit:
-                actions['actions'] = actions['actions'][:action_limit]
+                # Execute actions
+                with timed('execute_actions'):
+                    game.execute_actions(active_team, actions['actions'])
             
-            # Execute actions
-            game.execute_actions(active_team, actions['actions'])
+                if game_log:
+                    # Written after the turn is played so its timings can go in the record
+                    with timed('save_game_move'):
+                        game_log.append({
+                            "turn": turn,
+                            "team": active_team,
+                            "visible_state": state,
+                            "actions": logged_actions,
+                            "raw_response": response,
+                            "telemetry": recorder.as_dict(),
+                        })
             
-            # Check for victory
-            winner = game.check_victory()
-            if winner:
-                break
+                # Check for victory
+                winner = game.check_victory()
+                if winner:
+                    break
+        finally:
+            if game_log:
+                game_log.close()
         
         end_time = time.time()
         
@@ -74,6 +131,9 @@ class BatchGameRunner:
     
     async def run_batch(self, batch_number: int) -> List[GameResult]:
         """Run a batch of 10 games"""
+        if self.concurrency > 1:
+            return await self.run_batch_concurrent(batch_number)
+        
         print(f"\n🎮 Running Batch {batch_number} (10 games)...")
         
         batch_results = []
@@ -97,7 +157,69 @@ class BatchGameRunner:
         
         return batch_results
     
-    def display_results(self):
+    async def run_batch_concurrent(self, batch_number: int) -> List[GameResult]:
+        """Run a batch of 10 games, up to `concurrency` at a time, recording results as they finish"""
+        print(f"\n🎮 Running Batch {batch_number} (10 games, {self.concurrency} at a time)...")
+        
+        self.current_batch_results = []
+        first_game_number = len(self.all_results) + 1
+        game_slots = asyncio.Semaphore(self.concurrency)
+        
+        async def run_game(game_number: int) -> GameResult:
+            async with game_slots:
+                return await self.run_single_game(game_number)
+        
+        tasks = [asyncio.create_task(run_game(first_game_number + i)) for i in range(10)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                self.current_batch_results.append(result)
+                self.all_results.append(result)
+                
+                outcome = "Draw!" if result.winner == "Draw" else f"{result.winner} wins!"
+                print(f"Game {result.game_number} finished in {result.turns_taken} turns "
+                      f"({result.duration_seconds:.1f}s): {outcome}")
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        return self.current_batch_results
+    
+    async def run_until_decided(self, test: SequentialTest) -> str:
+        """Keep `concurrency` games in flight, feeding each result to `test` until it reaches a decision.
+        Games still running at that point are cancelled; returns the decision"""
+        print(f"\n🎮 Playing until decided ({test.method}, up to {test.max_games} games, {self.concurrency} at a time)...")
+        
+        self.current_batch_results = []
+        first_game_number = len(self.all_results) + 1
+        started = 0
+        running = set()
+        decision = None
+        try:
+            while decision is None:
+                # Top up to `concurrency` games, never starting more than the budget allows
+                while len(running) < self.concurrency and started < test.max_games:
+                    started += 1
+                    running.add(asyncio.create_task(self.run_single_game(first_game_number + started - 1)))
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    result = finished.result()
+                    self.current_batch_results.append(result)
+                    self.all_results.append(result)
+                    decision = test.update(result.winner)
+                    print(f"Game {result.game_number}: {result.winner} in {result.turns_taken} turns - {test.summary()}")
+                    if decision:
+                        break
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        
+        return decision
+    
+    def display_results(self, show_controls: bool = True):
         """Display results with option to continue or exit"""
         print("\n" + "="*80)
         print(f"🏆 All Game Results (Total: {len(self.all_results)} games)")
@@ -141,6 +263,15 @@ class BatchGameRunner:
             print(f"Draws: {draws} ({total_draws_pct:.1f}%)")
             print(f"Average Turns: {avg_turns:.1f}")
             print(f"Average Duration: {avg_duration:.1f}s")
+            if llm_controller.response_cache is not None:
+                print(f"Response Cache: {llm_controller.response_cache.summary()}")
+            if llm_controller.retry_policy.stats:
+                print(f"LLM Retries: {llm_controller.retry_policy.summary()}")
+            if usage_stats['requests']:
+                print(f"Token Usage: {usage_summary()}")
+            if rate_limiter.summary():
+                print(f"Rate Limiter:\n{rate_limiter.summary()}")
+            self.display_timings()
             
             # Show latest batch summary
             if len(self.current_batch_results) > 0:
@@ -152,11 +283,35 @@ class BatchGameRunner:
                 print(f"  Blue: {batch_blue_wins}, Red: {batch_red_wins}, Draws: {batch_draws}")
         
         print("\n" + "="*80)
+        if not show_controls:
+            return
         print("Controls:")
         print("  SPACE or ENTER - Run another batch of 10 games")
         print("  ESC or 'q' - Exit gracefully")
         print("="*80)
     
+    def display_timings(self):
+        """Print per-call latency percentiles recorded by telemetry.py"""
+        rows = telemetry.summary_rows()
+        if not rows:
+            return
+        print(f"\n⏱️  Timings (ms)")
+        print(f"{'Call':<20} {'Count':>7} {'Mean':>9} " + ' '.join(f"{'p' + str(p):>9}" for p in PERCENTILES))
+        for name, n, mean, quantiles in rows:
+            print(f"{name:<20} {n:>7} {mean * 1000:>9.2f} " + ' '.join(f"{quantiles[p] * 1000:>9.2f}" for p in PERCENTILES))
+    
+    def export_metrics(self, path: str):
+        """Write timings, game counts, token usage and retry counts in Prometheus text format"""
+        winners = {w: sum(1 for r in self.all_results if r.winner == w) for w in ("Blue", "Red", "Draw")}
+        counters = {f"games_{w.lower()}": n for w, n in winners.items()}
+        # Token counts are already telemetry counters; add the request total
+        counters["llm_requests"] = usage_stats["requests"]
+        counters.update({f"llm_retry_{reason}": n for reason, n in llm_controller.retry_policy.stats.items()})
+        if llm_controller.response_cache is not None:
+            counters.update({f"response_cache_{name}": n for name, n in llm_controller.response_cache.stats.items()})
+        gauges = {"rate_limiter_queue_depth": sum(m['queue_depth'] for m in rate_limiter.metrics().values())}
+        write_prometheus(path, counters, gauges)
+    
     def wait_for_input(self) -> str:
         """Wait for user input (space/enter to continue, esc/q to exit)"""
         try:
@@ -186,10 +341,60 @@ class BatchGameRunner:
                 return "continue"
 
 async def main():
-    runner = BatchGameRunner()
+    parser = argparse.ArgumentParser(description="Run batches of LLM-vs-LLM games")
+    parser.add_argument("--concurrency", type=int, default=1, help="games to play at the same time")
+    parser.add_argument("--max-inflight", type=int, default=None, help="cap on concurrent LLM requests")
+    parser.add_argument("--blue", choices=CONTROLLER_NAMES, default="llm", help="controller for Blue")
+    parser.add_argument("--red", choices=CONTROLLER_NAMES, default="llm", help="controller for Red")
+    parser.add_argument("--cache", default=None, help="SQLite file for the LLM response cache (enables caching)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="seconds before cached responses expire")
+    parser.add_argument("--rpm", type=int, default=0, help="requests-per-minute budget per team model (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens-per-minute budget per team model (0 = unlimited)")
+    parser.add_argument("--metrics-file", default=None, help="write Prometheus text metrics here after every batch")
+    parser.add_argument("--seed", type=int, default=None, help="master seed; game n uses a seed derived from it (default: random per game)")
+    parser.add_argument("--sequential", choices=("sprt", "wilson"), default=None,
+                        help="play until Blue vs Red is decided instead of in batches of 10")
+    parser.add_argument("--max-games", type=int, default=200, help="game budget for --sequential")
+    parser.add_argument("--min-games", type=int, default=10, help="games before --sequential may stop")
+    parser.add_argument("--alpha", type=float, default=0.05, help="false-positive rate for --sequential")
+    parser.add_argument("--beta", type=float, default=0.05, help="false-negative rate for --sequential (sprt)")
+    parser.add_argument("--delta", type=float, default=0.1,
+                        help="win-rate margin around 50%% that counts as a tie for --sequential")
+    args = parser.parse_args()
+    
+    if args.rpm or args.tpm:
+        for model in set(TEAM_MODELS.values()):
+            set_rate_limit(model, args.rpm, args.tpm)
+    if args.cache:
+        llm_controller.set_response_cache(ResponseCache(args.cache, ttl_seconds=args.cache_ttl))
+    
+    # Names, so scripted policies get a per-game RNG derived from the game's seed
+    runner = BatchGameRunner(concurrency=args.concurrency, max_inflight_requests=args.max_inflight,
+                             controllers={'Blue': args.blue, 'Red': args.red}, master_seed=args.seed)
     batch_number = 1
     
     print("🎮 Harford County Strategy Game - Batch Runner 🎮")
+    
+    if args.sequential:
+        test = SequentialTest(method=args.sequential, alpha=args.alpha, beta=args.beta, delta=args.delta,
+                              min_games=args.min_games, max_games=args.max_games)
+        decision = await runner.run_until_decided(test)
+        runner.display_results(show_controls=False)
+        if args.metrics_file:
+            runner.export_metrics(args.metrics_file)
+        verdicts = {
+            "blue": "Blue is stronger",
+            "red": "Red is stronger",
+            "tie": f"practically tied (within ±{args.delta:.0%})",
+            "budget": "undecided, game budget reached",
+        }
+        print(f"\n📈 Decision after {test.games} games: {verdicts[decision]}")
+        print(f"   {test.summary()}")
+        await close_client()
+        if llm_controller.response_cache is not None:
+            llm_controller.response_cache.close()
+        return
+    
     print("This will run games in batches of 10 and display results.")
     
     while True:
@@ -198,6 +403,8 @@ async def main():
         
         # Display results
         runner.display_results()
+        if args.metrics_file:
+            runner.export_metrics(args.metrics_file)
         
         # Wait for user input
         user_choice = runner.wait_for_input()
@@ -209,6 +416,10 @@ async def main():
             batch_number += 1
             continue
     
+    await close_client()
+    if llm_controller.response_cache is not None:
+        llm_controller.response_cache.close()
+    
     try:
         import pygame
         pygame.quit()
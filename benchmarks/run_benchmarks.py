@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import llm_controller
+from game import Game
+from llm_controller import build_action_prompt, extract_json_from_markdown, get_action_plan, save_game_move, close_game_log
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+ARMY_SIZES = [5, 25, 100]
+GAME_LENGTHS = [30, 120]
+QUICK_ARMY_SIZES = [5, 25]
+QUICK_GAME_LENGTHS = [30]
+
+# Each side holds half the map so every kind of action is available
+TERRITORY = {
+    'Blue': ['Bel Air', 'Fallston', 'Joppatowne'],
+    'Red': ['Aberdeen Proving Ground', 'Havre de Grace', 'Edgewood'],
+}
+
+
+def make_game(units_per_team, seed=0):
+    """
+    Builds a mid-game position with units_per_team units per side spread over its territory.
+    """
+    game = Game(rng=random.Random(seed))
+    for team_name, loc_names in TERRITORY.items():
+        team = game.teams[team_name]
+        for name in loc_names:
+            loc = game.get_location_by_name(name)
+            if loc.control != team_name:
+                loc.control = team_name
+                team.controlled_locations.append(name)
+        extra = max(0, units_per_team - len(team.units))
+        team.resources = 3 * extra
+        game.execute_actions(team_name, [
+            {'type': 'reinforce', 'location': loc_names[i % len(loc_names)]} for i in range(extra)
+        ])
+        team.resources = 0
+    assert not game.check_consistency()
+    return game
+
+
+def action_mix(game, kind):
+    """
+    Returns a list of Blue actions of one kind ('move', 'combat', 'reinforce' or 'mixed').
+    """
+    blue = game.teams['Blue']
+    limit = max(1, len(game.teams['Red'].units))
+    moves, attacks = [], []
+    for u in blue.units:
+        loc = game.get_location_of_unit(u.id).name
+        if loc == 'Joppatowne':
+            attacks.append({'type': 'move', 'unit_id': u.id, 'to': 'Edgewood'})
+        elif loc == 'Bel Air':
+            attacks.append({'type': 'move', 'unit_id': u.id, 'to': 'Aberdeen Proving Ground'})
+            moves.append({'type': 'move', 'unit_id': u.id, 'to': 'Fallston'})
+        else:
+            moves.append({'type': 'move', 'unit_id': u.id, 'to': 'Bel Air'})
+    reinforces = [{'type': 'reinforce', 'location': TERRITORY['Blue'][i % 3]} for i in range(limit)]
+    if kind == 'move':
+        return moves[:limit]
+    if kind == 'combat':
+        return attacks[:limit]
+    if kind == 'reinforce':
+        return reinforces
+    mixed = reinforces[:2] + [a for pair in zip(moves, attacks) for a in pair]
+    return mixed[:limit]
+
+
+def measure(fn, setup=None, repeat=5, min_time=0.05):
+    """
+    Times fn, returning per-call seconds (min and median over `repeat` runs).
+    setup, if given, runs untimed before every call.
+    """
+    def run(number):
+        total = 0.0
+        for _ in range(number):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            total += time.perf_counter() - start
+        return total
+
+    number = 1
+    while run(number) < min_time and number < 1_000_000:
+        number *= 2
+    timings = [run(number) / number for _ in range(repeat)]
+    return {'min': min(timings), 'median': statistics.median(timings), 'number': number}
+
+
+def engine_cases(army_sizes):
+    cases = {'game_init': (Game, None)}
+    for n in army_sizes:
+        game = make_game(n)
+        cases[f'visible_state[units={n}]'] = (lambda g=game: g.get_visible_state('Blue'), None)
+        cases[f'full_state[units={n}]'] = (lambda g=game: g.get_full_state(), None)
+        start = game.snapshot()
+        for kind in ('move', 'combat', 'reinforce', 'mixed'):
+            def setup(g=game, s=start, resources=3 * n):
+                g.restore(s)
+                g.teams['Blue'].resources = resources
+            actions = action_mix(game, kind)
+            cases[f'execute_actions[{kind},units={n}]'] = (lambda g=game, a=actions: g.execute_actions('Blue', a), setup)
+    return cases
+
+
+def llm_cases(army_sizes):
+    cases = {}
+    loop = asyncio.new_event_loop()
+
+    for n in army_sizes:
+        game = make_game(n)
+        state = game.get_visible_state('Blue')
+        cases[f'build_action_prompt[units={n}]'] = (lambda s=state: build_action_prompt('Blue', s), None)
+
+        canned = '```json\n' + json.dumps({'actions': action_mix(game, 'mixed')}, indent=2) + '\n```'
+
+        async def fake_chat(prompt_str, model=None, response=canned, **kwargs):
+            return response
+
+        def plan(s=state, chat=fake_chat):
+            real_chat = llm_controller.chat
+            llm_controller.chat = chat
+            try:
+                loop.run_until_complete(get_action_plan('Blue', s))
+            finally:
+                llm_controller.chat = real_chat
+        cases[f'get_action_plan_offline[units={n}]'] = (plan, None)
+
+    for n in (5, 50, 500):
+        actions = [{'type': 'move', 'unit_id': f'Blue-{i}', 'to': 'Edgewood'} for i in range(n)]
+        response = 'Here is my plan.\n```json\n' + json.dumps({'actions': actions}, indent=2) + '\n```\nGood luck!'
+        cases[f'extract_json_from_markdown[actions={n}]'] = (lambda r=response: extract_json_from_markdown(r), None)
+    return cases
+
+
+def persistence_cases(game_lengths):
+    cases = {}
+    state = make_game(25).get_visible_state('Blue')
+    for turns in game_lengths:
+        moves = [{'turn': t, 'team': 'Blue' if t % 2 else 'Red', 'visible_state': state,
+                  'actions': [], 'raw_response': '{"actions": []}'} for t in range(1, turns + 1)]
+        counter = iter(range(10 ** 9))
+
+        def write_game(moves=moves):
+            game_id = f'bench_{next(counter)}'
+            log = []
+            for move in moves:
+                log.append(move)
+                save_game_move(game_id, log)
+            close_game_log(game_id)
+        cases[f'save_game_move[turns={turns}]'] = (write_game, None)
+    return cases
+
+
+def render_cases():
+    """
+    Visualizer frames on SDL's dummy video driver; skipped when pygame is not installed.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        from visualization import GameVisualizer
+    except ImportError:
+        return {}
+    game = make_game(25)
+    visualizer = GameVisualizer()
+    visualizer.draw_game_state(game)
+
+    def new_turn(g=game):
+        g.turn += 1
+
+    def animate(v=visualizer):
+        # A fresh set of effects each call, so they neither expire nor pile up
+        v.animations.clear()
+        v.combat_effects.clear()
+        v.events.clear()
+        v.process_action_results(['Moving Blue-1 from Bel Air to Edgewood', 'Combat at Edgewood: Blue attacks'], 'Blue')
+        v.add_event('Reinforced Bel Air', 'success')
+
+    return {
+        'render_frame[idle]': (lambda: visualizer.draw_game_state(game), None),
+        'render_frame[new_turn]': (lambda: visualizer.draw_game_state(game), new_turn),
+        'render_frame[animating]': (lambda: visualizer.draw_game_state(game), animate),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns (name, baseline s, current s, ratio) for every case slower than baseline by more than tolerance.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        ratio = current['min'] / base['min']
+        if ratio > 1 + tolerance:
+            regressions.append((name, base['min'], current['min'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engine, prompt and persistence hot paths")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--no-check", action="store_true", help="only record results, without comparing to a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--output", default=None, help="where to write results (default benchmarks/results/)")
+    args = parser.parse_args()
+
+    army_sizes = QUICK_ARMY_SIZES if args.quick else ARMY_SIZES
+    game_lengths = QUICK_GAME_LENGTHS if args.quick else GAME_LENGTHS
+    repeat = min(args.repeat, 3) if args.quick else args.repeat
+
+    # Paths given relative to where we were started, before moving to the scratch directory
+    baseline_path = os.path.abspath(args.baseline)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # Debug logs and game files go to a scratch directory, removed afterwards
+    cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='harco_bench_') as workdir:
+        os.chdir(workdir)
+        try:
+            cases = {**engine_cases(army_sizes), **llm_cases(army_sizes), **persistence_cases(game_lengths),
+                     **render_cases()}
+            for name, (fn, setup) in cases.items():
+                if args.filter and args.filter not in name:
+                    continue
+                results[name] = measure(fn, setup, repeat=repeat)
+                print(f"{name:<48} {results[name]['min'] * 1e6:>12.1f} us")
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+        'cases': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = output or os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    if args.no_check:
+        return 0
+
+    if not os.path.exists(baseline_path):
+        # Timings only compare on the same machine, so there is no shared baseline to fall back on
+        print(f"No baseline at {baseline_path}; run with --save-baseline first, or pass --no-check.")
+        return 2
+
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for name, base, current, ratio in regressions:
+            print(f"  {name}: {base * 1e6:.1f} us -> {current * 1e6:.1f} us ({ratio:.2f}x)")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} against {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
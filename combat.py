@@ -0,0 +1,260 @@
+# Fights: each round both sides roll 1d6 + total strength, the lower roll loses 1 health
+# on a random unit, ties change nothing. Units at 0 health are eliminated.
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+from math import comb
+
+import numpy as np
+
+MAX_ROUNDS = 100
+
+# Fights that may reach more army states than this are estimated with
+# simulate_combat (fixed seed) instead of solved exactly
+EXACT_STATE_LIMIT = 10_000
+
+
+@dataclass(frozen=True)
+class CombatOdds:
+    attacker_win: float  # defenders eliminated, attackers remain
+    defender_win: float  # attackers eliminated
+    unresolved: float  # both sides remain when the round cap is hit
+    expected_attackers_left: float
+    expected_defenders_left: float
+
+
+def resolve_combat(att_units, def_units, rng=random, max_rounds=MAX_ROUNDS):
+    """
+    Plays out one fight, damaging units and removing eliminated ones from the lists in place.
+
+    :param att_units: list of attacking units (anything with health and strength attributes)
+    :param def_units: list of defending units
+    :param rng: random.Random (or the random module) used for dice and casualty selection
+    :param max_rounds: int, rounds after which the fight stops even if both sides remain
+    :return: list of (side, unit) for each eliminated unit in order, side being 'attacker' or 'defender'
+    """
+    eliminated = []
+    rounds = 0
+    while att_units and def_units and rounds < max_rounds:
+        att_strength = sum(u.strength for u in att_units)
+        def_strength = sum(u.strength for u in def_units)
+        att_roll = rng.randint(1, 6) + att_strength
+        def_roll = rng.randint(1, 6) + def_strength
+
+        if att_roll > def_roll:
+            lost_unit = rng.choice(def_units)
+            lost_unit.health -= 1
+            if lost_unit.health <= 0:
+                def_units.remove(lost_unit)
+                eliminated.append(('defender', lost_unit))
+        elif def_roll > att_roll:
+            lost_unit = rng.choice(att_units)
+            lost_unit.health -= 1
+            if lost_unit.health <= 0:
+                att_units.remove(lost_unit)
+                eliminated.append(('attacker', lost_unit))
+        rounds += 1
+    return eliminated
+
+
+@lru_cache(maxsize=None)
+def round_odds(att_strength, def_strength):
+    """
+    Returns (p attacker wins the round, p defender wins the round, p tie) for the given total strengths.
+    """
+    diff = att_strength - def_strength
+    att_wins = sum(1 for a in range(1, 7) for d in range(1, 7) if a + diff > d)
+    def_wins = sum(1 for a in range(1, 7) for d in range(1, 7) if a + diff < d)
+    return att_wins / 36, def_wins / 36, (36 - att_wins - def_wins) / 36
+
+
+def _side(units):
+    # Canonical form of one side: sorted (health, strength) pairs of living units
+    pairs = []
+    for u in units:
+        health, strength = (u.health, u.strength) if hasattr(u, 'health') else u
+        if health > 0:
+            pairs.append((health, strength))
+    return tuple(sorted(pairs))
+
+
+@lru_cache(maxsize=100_000)
+def _damaged(side):
+    # Returns ((probability, side after one random unit loses 1 health), ...)
+    n = len(side)
+    seen = {}
+    for i, unit in enumerate(side):
+        seen.setdefault(unit, []).append(i)
+    outcomes = []
+    for (health, strength), positions in seen.items():
+        rest = list(side)
+        del rest[positions[0]]
+        if health > 1:
+            rest.append((health - 1, strength))
+        outcomes.append((len(positions) / n, tuple(sorted(rest))))
+    return tuple(outcomes)
+
+
+def _state_bound(side):
+    # Upper bound on the distinct forms a side can take as it loses health: per strength,
+    # the multisets of at most n healths from 1..max health
+    bound = 1
+    for strength in {s for _, s in side}:
+        healths = [h for h, s in side if s == strength]
+        bound *= comb(len(healths) + max(healths), len(healths))
+    return bound
+
+
+# (attackers, defenders) -> (p attacker wins, expected attackers left, expected defenders
+# left) for every fight state solved so far; later fights reuse the states they share
+# (a big fight passes through most smaller ones), so lookahead-style callers pay once
+_solved = {}
+MAX_SOLVED_STATES = 2_000_000
+
+
+def _levels(att, dfn):
+    # Unsolved fight states reachable from (att, dfn), grouped by hits so far; every hit
+    # removes 1 health, so a state's successors are all in the next level (or solved)
+    levels = [[(att, dfn)]]
+    seen = {(att, dfn)}
+    while True:
+        following = []
+        for a, d in levels[-1]:
+            if a and d:
+                for state in [(a, new_d) for _, new_d in _damaged(d)] + [(new_a, d) for _, new_a in _damaged(a)]:
+                    if state not in seen and state not in _solved:
+                        seen.add(state)
+                        following.append(state)
+        if not following:
+            return levels
+        levels.append(following)
+
+
+def _exact_outcome(att, dfn):
+    # Returns (p attacker wins, expected attackers left, expected defenders left).
+    # Tie rounds are skipped by renormalising, which is exact apart from the round cap.
+    # Levels are solved last to first, each from states already solved.
+    if (att, dfn) in _solved:
+        return _solved[att, dfn]
+    if len(_solved) > MAX_SOLVED_STATES:
+        _solved.clear()
+    for level in reversed(_levels(att, dfn)):
+        for a, d in level:
+            if not d:
+                _solved[a, d] = (1.0, float(len(a)), 0.0)
+                continue
+            if not a:
+                _solved[a, d] = (0.0, 0.0, float(len(d)))
+                continue
+            p_att, p_def, _ = round_odds(sum(s for _, s in a), sum(s for _, s in d))
+            total = p_att + p_def
+            win = att_left = def_left = 0.0
+            for p, new_d in _damaged(d):
+                w, al, dl = _solved[a, new_d]
+                q = p * p_att / total
+                win += q * w
+                att_left += q * al
+                def_left += q * dl
+            for p, new_a in _damaged(a):
+                w, al, dl = _solved[new_a, d]
+                q = p * p_def / total
+                win += q * w
+                att_left += q * al
+                def_left += q * dl
+            _solved[a, d] = (win, att_left, def_left)
+    return _solved[att, dfn]
+
+
+def combat_odds(attackers, defenders):
+    """
+    Odds of a fight, computed exactly by dynamic programming over the remaining units
+    when the fight can reach at most EXACT_STATE_LIMIT army states. Bigger fights are
+    estimated with simulate_combat, seeded so that repeated calls agree.
+
+    Exact odds ignore the round cap, so their unresolved is 0; for armies small enough
+    to solve, the chance of a fight lasting 100 rounds is negligible.
+
+    :param attackers: units, or (health, strength) pairs, on the attacking side
+    :param defenders: units, or (health, strength) pairs, on the defending side
+    :return: CombatOdds
+    """
+    att = _side(attackers)
+    dfn = _side(defenders)
+    if _state_bound(att) * _state_bound(dfn) > EXACT_STATE_LIMIT:
+        return simulate_combat(att, dfn, seed=0)
+    win, att_left, def_left = _exact_outcome(att, dfn)
+    return CombatOdds(
+        attacker_win=win,
+        defender_win=1.0 - win,
+        unresolved=0.0,
+        expected_attackers_left=att_left,
+        expected_defenders_left=def_left,
+    )
+
+
+def odds_table(max_attackers=5, max_defenders=5, health=3, strength=1):
+    """
+    Attacker win probabilities for every matchup of full-health identical units.
+
+    :return: dict {(attackers, defenders): attacker win probability}
+    """
+    return {
+        (a, d): combat_odds([(health, strength)] * a, [(health, strength)] * d).attacker_win
+        for a in range(1, max_attackers + 1)
+        for d in range(1, max_defenders + 1)
+    }
+
+
+def simulate_combat(attackers, defenders, n=10_000, max_rounds=MAX_ROUNDS, seed=None):
+    """
+    Estimates the odds of a fight by playing n copies of it, all advancing together
+    one round at a time as NumPy arrays.
+
+    :param attackers: units, or (health, strength) pairs, on the attacking side
+    :param defenders: units, or (health, strength) pairs, on the defending side
+    :param n: int, number of fights to simulate
+    :param max_rounds: int, round cap per fight, as in execute_actions
+    :param seed: int or None, seed for the simulation RNG
+    :return: CombatOdds
+    """
+    att = _side(attackers)
+    dfn = _side(defenders)
+    gen = np.random.default_rng(seed)
+    att_health = np.tile(np.array([h for h, _ in att], dtype=np.int16), (n, 1))
+    def_health = np.tile(np.array([h for h, _ in dfn], dtype=np.int16), (n, 1))
+    att_strength = np.array([s for _, s in att], dtype=np.int32)
+    def_strength = np.array([s for _, s in dfn], dtype=np.int32)
+    rows = np.arange(n)
+
+    for _ in range(max_rounds):
+        att_alive = att_health > 0
+        def_alive = def_health > 0
+        att_count = att_alive.sum(axis=1)
+        def_count = def_alive.sum(axis=1)
+        active = (att_count > 0) & (def_count > 0)
+        if not active.any():
+            break
+        att_roll = gen.integers(1, 7, size=n) + att_alive @ att_strength
+        def_roll = gen.integers(1, 7, size=n) + def_alive @ def_strength
+        _hit_random_unit(gen, def_health, def_alive, def_count, rows[active & (att_roll > def_roll)])
+        _hit_random_unit(gen, att_health, att_alive, att_count, rows[active & (def_roll > att_roll)])
+
+    att_left = (att_health > 0).sum(axis=1)
+    def_left = (def_health > 0).sum(axis=1)
+    return CombatOdds(
+        attacker_win=float(np.mean((att_left > 0) & (def_left == 0))),
+        defender_win=float(np.mean(att_left == 0)),
+        unresolved=float(np.mean((att_left > 0) & (def_left > 0))),
+        expected_attackers_left=float(att_left.mean()),
+        expected_defenders_left=float(def_left.mean()),
+    )
+
+
+def _hit_random_unit(gen, health, alive, count, rows):
+    # Takes 1 health from a uniformly chosen living unit in each of the given rows
+    if rows.size == 0:
+        return
+    pick = (gen.random(rows.size) * count[rows]).astype(np.int64)
+    target = np.argmax(np.cumsum(alive[rows], axis=1) > pick[:, None], axis=1)
+    health[rows, target] -= 1
+
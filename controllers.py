@@ -0,0 +1,261 @@
+import json
+import random
+from functools import lru_cache
+
+from combat import combat_odds
+from llm_controller import TEAM_MODELS, get_action_plan
+
+# Controllers share get_action_plan's interface:
+#     async controller(team, visible_state) -> (action_plan, prompt, response)
+# The local ones below wrap a policy, a plain function
+#     policy(team, visible_state, rng) -> list of action dicts
+# that only looks at the visible state, exactly like an LLM team.
+
+REINFORCE_COST = 3
+UNIT_HEALTH = 3
+
+# One-ply evaluation weights
+CAPTURE_VALUE = 3.0
+KILL_VALUE = 1.0
+LOSS_VALUE = 1.2
+REINFORCE_VALUE = 1.5
+
+
+def action_limit(visible_state):
+    """
+    Number of actions the runners will accept this turn.
+    """
+    return max(1, visible_state.get('opponent_unit_count', 1))
+
+
+def legal_actions(visible_state):
+    """
+    Lists every single-step move and affordable reinforcement in a visible state.
+    """
+    actions = []
+    for u in visible_state['units']:
+        for dest in visible_state['locations'][u['location']]['connections']:
+            actions.append({'type': 'move', 'unit_id': u['id'], 'to': dest})
+    if visible_state['resources'] >= REINFORCE_COST:
+        for loc in visible_state['controlled_locations']:
+            actions.append({'type': 'reinforce', 'location': loc})
+    return actions
+
+
+def random_policy(team, visible_state, rng):
+    """
+    Moves a random subset of units to random adjacent locations and sometimes reinforces.
+    """
+    limit = action_limit(visible_state)
+    actions = []
+    resources = visible_state['resources']
+    while resources >= REINFORCE_COST and visible_state['controlled_locations'] and rng.random() < 0.5:
+        actions.append({'type': 'reinforce', 'location': rng.choice(visible_state['controlled_locations'])})
+        resources -= REINFORCE_COST
+    units = list(visible_state['units'])
+    rng.shuffle(units)
+    for u in units:
+        if rng.random() < 0.7:
+            dest = rng.choice(visible_state['locations'][u['location']]['connections'])
+            actions.append({'type': 'move', 'unit_id': u['id'], 'to': dest})
+    return actions[:limit]
+
+
+def greedy_policy(team, visible_state, rng):
+    """
+    Grabs every undefended location it can reach, keeping one unit on each held location,
+    and attacks visible enemy stacks only when it has more units next to them.
+    """
+    limit = action_limit(visible_state)
+    locations = visible_state['locations']
+    actions = []
+
+    resources = visible_state['resources']
+    frontier = sorted(
+        visible_state['controlled_locations'],
+        key=lambda name: -sum(1 for c in locations[name]['connections'] if locations[c]['control'] != team),
+    )
+    while resources >= REINFORCE_COST and frontier and len(actions) < limit:
+        actions.append({'type': 'reinforce', 'location': frontier[0]})
+        resources -= REINFORCE_COST
+
+    units_at = {}
+    for u in visible_state['units']:
+        units_at.setdefault(u['location'], []).append(u['id'])
+
+    targeted = set()
+    for loc_name in sorted(units_at):
+        ids = units_at[loc_name]
+        # Keep a garrison on held locations
+        movable = ids[1:] if locations[loc_name]['control'] == team else ids
+        for uid in movable:
+            best = None
+            for dest in locations[loc_name]['connections']:
+                info = locations[dest]
+                if info['control'] == team or dest in targeted:
+                    continue
+                enemies = info['enemy_units_count'] or 0
+                if enemies == 0:
+                    best = dest
+                    break
+                if best is None and len(ids) > enemies:
+                    best = dest
+            if best is not None:
+                targeted.add(best)
+                actions.append({'type': 'move', 'unit_id': uid, 'to': best})
+    return actions[:limit]
+
+
+@lru_cache(maxsize=None)
+def _attack_odds(health, defenders):
+    # Odds of one unit attacking a stack of full-health defenders
+    return combat_odds([(health, 1)], [(UNIT_HEALTH, 1)] * defenders)
+
+
+def lookahead_policy(team, visible_state, rng):
+    """
+    One-ply search: scores every legal action by its immediate effect (captures, expected
+    kills and losses from combat.combat_odds, locations left undefended), plays the best,
+    updates its picture of the board, and repeats until the limit or no action helps.
+    """
+    limit = action_limit(visible_state)
+    locations = visible_state['locations']
+    control = {name: info['control'] for name, info in locations.items()}
+    enemies = {name: info['enemy_units_count'] for name, info in locations.items()}
+    positions = {u['id']: u['location'] for u in visible_state['units']}
+    health = {u['id']: u['health'] for u in visible_state['units']}
+    own_counts = {name: 0 for name in locations}
+    for loc_name in positions.values():
+        own_counts[loc_name] += 1
+    resources = visible_state['resources']
+    moved = set()
+    actions = []
+
+    def threatened(name):
+        return any((enemies[c] or 0) > 0 for c in locations[name]['connections'])
+
+    def score_move(uid, dest):
+        src = positions[uid]
+        score = 0.0
+        if control[src] == team and own_counts[src] == 1:
+            score -= CAPTURE_VALUE if threatened(src) else 0.5
+        k = enemies[dest]
+        if k:
+            odds = _attack_odds(health[uid], k)
+            score += odds.attacker_win * CAPTURE_VALUE
+            score += (k - odds.expected_defenders_left) * KILL_VALUE
+            score -= (1 - odds.expected_attackers_left) * LOSS_VALUE
+        elif control[dest] != team:
+            # Unknown (None) locations may hide defenders
+            score += CAPTURE_VALUE if k == 0 else CAPTURE_VALUE / 2
+        return score
+
+    while len(actions) < limit:
+        best_score, best_action = 0.0, None
+        # Units at the same place with the same health score identically; try one of each
+        candidates = {}
+        for uid, src in positions.items():
+            if uid not in moved:
+                candidates.setdefault((src, health[uid]), uid)
+        for (src, _), uid in candidates.items():
+            for dest in locations[src]['connections']:
+                s = score_move(uid, dest) + rng.random() * 1e-3
+                if s > best_score:
+                    best_score, best_action = s, {'type': 'move', 'unit_id': uid, 'to': dest}
+        if resources >= REINFORCE_COST:
+            for name, owner in control.items():
+                if owner != team:
+                    continue
+                s = REINFORCE_VALUE + (1.0 if threatened(name) else 0.0)
+                if s > best_score:
+                    best_score, best_action = s, {'type': 'reinforce', 'location': name}
+        if best_action is None:
+            break
+
+        actions.append(best_action)
+        if best_action['type'] == 'reinforce':
+            resources -= REINFORCE_COST
+            own_counts[best_action['location']] += 1
+            continue
+
+        uid, dest = best_action['unit_id'], best_action['to']
+        src = positions[uid]
+        moved.add(uid)
+        own_counts[src] -= 1
+        k = enemies[dest]
+        if k:
+            odds = _attack_odds(health[uid], k)
+            enemies[dest] = round(odds.expected_defenders_left)
+            if odds.attacker_win < 0.5:
+                del positions[uid]
+                continue
+        positions[uid] = dest
+        own_counts[dest] += 1
+        control[dest] = team
+    return actions
+
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+    'lookahead': lookahead_policy,
+}
+
+
+def make_controller(policy, seed=None):
+    """
+    Wraps a policy as an async controller with the same signature as get_action_plan.
+
+    :param policy: callable (team, visible_state, rng) -> list of actions, or a POLICIES name
+    :param seed: seed for the policy's RNG
+    :return: async callable (team, visible_state) -> (action_plan, prompt, response)
+    """
+    if isinstance(policy, str):
+        policy = POLICIES[policy]
+    rng = random.Random(seed)
+
+    async def controller(team, visible_state):
+        action_plan = {'actions': policy(team, visible_state, rng)}
+        return action_plan, '', json.dumps(action_plan)
+
+    controller.policy = policy
+    return controller
+
+
+def make_llm_controller(model):
+    """
+    Returns a controller that asks a specific model instead of the team's TEAM_MODELS entry.
+    """
+    async def controller(team, visible_state):
+        return await get_action_plan(team, visible_state, model=model)
+
+    controller.model = model
+    return controller
+
+
+def get_controller(name, seed=None):
+    """
+    Returns the controller for a name: 'llm' for get_action_plan, 'llm:<model>' for a
+    specific model, or one of POLICIES.
+    """
+    if name == 'llm':
+        return get_action_plan
+    if name.startswith('llm:'):
+        return make_llm_controller(name[len('llm:'):])
+    if name not in POLICIES:
+        raise ValueError(f"Unknown controller '{name}'. Choose from: llm, llm:<model>, {', '.join(POLICIES)}")
+    return make_controller(POLICIES[name], seed)
+
+
+def describe_controller(team, controller):
+    """
+    Label for who plays a team: the model name for LLM controllers, else the policy name.
+    """
+    if getattr(controller, 'model', None):
+        return controller.model
+    if getattr(controller, 'policy', None):
+        return controller.policy.__name__
+    return TEAM_MODELS.get(team)
+
+
+CONTROLLER_NAMES = ['llm'] + list(POLICIES)
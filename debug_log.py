@@ -0,0 +1,183 @@
+import atexit
+import gzip
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+
+# Debug logging that never blocks the event loop: callers only put lines on a
+# queue, and a background thread writes them in batches, rotating the file by
+# size and gzipping old ones (game_debug.log.1.gz, .2.gz, ...).
+#
+# Configured from the environment:
+#   HARCO_DEBUG_LOG           file to write, or 'off' to disable (ic becomes a no-op)
+#   HARCO_LOG_LEVEL           DEBUG, INFO, WARNING or ERROR
+#   HARCO_LOG_MAX_BYTES       rotate once the file is this big
+#   HARCO_LOG_BACKUPS         compressed files to keep
+#   HARCO_PROMPT_SAMPLE_RATE  fraction of prompt bodies to log (0..1)
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+DISABLED_VALUES = ('', '0', 'off', 'none', 'false')
+
+
+def ic_noop(*args):
+    """
+    Stand-in for icecream's ic when logging is off: no formatting, no frame inspection.
+    """
+    if not args:
+        return None
+    return args[0] if len(args) == 1 else args
+
+
+class DebugLog:
+    """
+    Queue-backed, batching, size-rotating log file.
+
+    Lines are dropped (and counted in `dropped`) rather than blocking when the
+    queue is full. The writer thread starts on first use in each process.
+    """
+
+    def __init__(self, path='game_debug.log', level=DEBUG, max_bytes=10 * 1024 * 1024, backups=5,
+                 prompt_sample_rate=1.0, max_queue=100_000, flush_interval=0.5, batch_size=1000):
+        self.path = path
+        self.enabled = bool(path)
+        self.level = level
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.prompt_sample_rate = prompt_sample_rate
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._stamp_second = None
+        self._stamp = ''
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv('HARCO_DEBUG_LOG', 'game_debug.log')
+        return cls(
+            path=None if path.strip().lower() in DISABLED_VALUES else path,
+            level=LEVELS.get(os.getenv('HARCO_LOG_LEVEL', 'DEBUG').upper(), DEBUG),
+            max_bytes=int(os.getenv('HARCO_LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            backups=int(os.getenv('HARCO_LOG_BACKUPS', '5')),
+            prompt_sample_rate=float(os.getenv('HARCO_PROMPT_SAMPLE_RATE', '1.0')),
+        )
+
+    def is_enabled_for(self, level):
+        return self.enabled and level >= self.level
+
+    def log(self, level, *args):
+        if not self.is_enabled_for(level):
+            return
+        self._ensure_thread()
+        now = int(time.time())
+        if now != self._stamp_second:
+            self._stamp_second, self._stamp = now, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        line = f"{self._stamp} {LEVEL_NAMES.get(level, level)} {' '.join(str(a) for a in args)}\n"
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def debug(self, *args):
+        self.log(DEBUG, *args)
+
+    def info(self, *args):
+        self.log(INFO, *args)
+
+    def warning(self, *args):
+        self.log(WARNING, *args)
+
+    def error(self, *args):
+        self.log(ERROR, *args)
+
+    def prompt(self, text, label='Prompt'):
+        """
+        Logs a prompt body at DEBUG level, keeping only a prompt_sample_rate fraction of them.
+        """
+        if self.is_enabled_for(DEBUG) and self._rng.random() < self.prompt_sample_rate:
+            self.log(DEBUG, f"{label}:\n{text}")
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # After a fork the parent's writer thread does not exist in the child
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='debug-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        f = open(self.path, 'a', encoding='utf-8')
+        try:
+            while True:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                if first is None:
+                    break
+                batch = [first]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                f.write(''.join(batch))
+                f.flush()
+                if self.max_bytes and f.tell() >= self.max_bytes:
+                    f.close()
+                    self._rotate()
+                    f = open(self.path, 'a', encoding='utf-8')
+                if stop:
+                    break
+        finally:
+            f.close()
+
+    def _rotate(self):
+        # game_debug.log -> .1.gz, .1.gz -> .2.gz, ...; the oldest beyond `backups` is removed
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.path}.{i}.gz'
+            if os.path.exists(src):
+                os.replace(src, f'{self.path}.{i + 1}.gz')
+        with open(self.path, 'rb') as src, gzip.open(f'{self.path}.1.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+    def close(self, timeout=5.0):
+        """
+        Writes out everything queued and stops the writer thread.
+        """
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+
+debug_log = DebugLog.from_env()
+atexit.register(debug_log.close)
@@ -1,7 +1,22 @@
 import random
+from dataclasses import dataclass
+from combat import resolve_combat
 from llm_controller import TEAM_MODELS
 
+# The map is static, so every game shares these lists instead of building its own
+LOCATION_NAMES = ['Bel Air', 'Aberdeen Proving Ground', 'Havre de Grace', 'Edgewood', 'Joppatowne', 'Fallston']
+CONNECTIONS = {
+    'Bel Air': ['Fallston', 'Joppatowne', 'Edgewood', 'Aberdeen Proving Ground'],
+    'Aberdeen Proving Ground': ['Edgewood', 'Havre de Grace', 'Bel Air'],
+    'Havre de Grace': ['Aberdeen Proving Ground'],
+    'Edgewood': ['Aberdeen Proving Ground', 'Joppatowne', 'Bel Air'],
+    'Joppatowne': ['Edgewood', 'Bel Air'],
+    'Fallston': ['Bel Air']
+}
+
 class Location:
+    __slots__ = ('name', 'connections', 'resources', 'control', 'units')
+
     def __init__(self, name, connections, resources):
         self.name = name
         self.connections = connections
@@ -10,6 +25,8 @@ class Location:
         self.units = {}  # team_name: list[Unit]
 
 class Unit:
+    __slots__ = ('id', 'type', 'health', 'strength')
+
     def __init__(self, id, type, health, strength):
         self.id = id
         self.type = type
@@ -17,33 +34,70 @@ class Unit:
         self.strength = strength
 
 class Team:
+    __slots__ = ('name', 'units', 'resources', 'controlled_locations', 'next_unit_number')
+
     def __init__(self, name):
         self.name = name
         self.units = []
         self.resources = 0
         self.controlled_locations = []
+        self.next_unit_number = 0  # suffix of the last unit ID issued
 
-class Game:
-    def __init__(self):
-        self.turn = 0
-        self.locations = []
-        names = ['Bel Air', 'Aberdeen Proving Ground', 'Havre de Grace', 'Edgewood', 'Joppatowne', 'Fallston']
-        conn_dict = {
-            'Bel Air': ['Fallston', 'Joppatowne', 'Edgewood', 'Aberdeen Proving Ground'],
-            'Aberdeen Proving Ground': ['Edgewood', 'Havre de Grace', 'Bel Air'],
-            'Havre de Grace': ['Aberdeen Proving Ground'],
-            'Edgewood': ['Aberdeen Proving Ground', 'Joppatowne', 'Bel Air'],
-            'Joppatowne': ['Edgewood', 'Bel Air'],
-            'Fallston': ['Bel Air']
-        }
-        for n in names:
-            loc = Location(n, conn_dict.get(n, []), 1)
-            self.locations.append(loc)
+@dataclass(frozen=True, slots=True)
+class GameSnapshot:
+    """
+    Immutable, compact copy of everything execute_actions can change.
 
-        self.teams = {
-            'Blue': Team('Blue'),
-            'Red': Team('Red')
-        }
+    Units are stored column-wise in team order: unit i has ID unit_ids[i],
+    health unit_health[i] and strength unit_strength[i]. Per-team fields
+    follow the order of Game.teams. Location control is one byte per
+    location (0 = neutral, 1 = first team, 2 = second team).
+    """
+    turn: int
+    resources: tuple
+    next_unit_numbers: tuple
+    controlled_locations: tuple
+    control: bytes
+    unit_ids: tuple
+    unit_types: tuple
+    unit_health: bytes
+    unit_strength: bytes
+    team_sizes: tuple
+    placement: tuple  # per location: ((team_name, (unit index, ...)), ...)
+
+def derive_seed(master_seed, *parts):
+    """
+    Seed for one game (or one of its RNG streams) derived from a master seed,
+    e.g. derive_seed(7, 12) == '7:12' and derive_seed('7:12', 'Blue') == '7:12:Blue'.
+
+    random.Random hashes string seeds with SHA-512, so derived seeds give the same
+    dice in every process and on every run.
+    """
+    return ':'.join(str(p) for p in (master_seed, *parts))
+
+
+def new_seed():
+    """
+    A fresh random seed, for games that are not given one but should still be reproducible.
+    """
+    return random.SystemRandom().getrandbits(64)
+
+
+class Game:
+    def __init__(self, rng=None, seed=None):
+        """
+        :param rng: random.Random to use for the dice (seed is then unknown and left None)
+        :param seed: seed for the game's own RNG; a fresh one is drawn when neither is given,
+                     so every game can be replayed from game.seed
+        """
+        # Each game owns its RNG so concurrent games don't share dice
+        if rng is not None:
+            self.seed = seed
+            self.rng = rng
+        else:
+            self.seed = seed if seed is not None else new_seed()
+            self.rng = random.Random(self.seed)
+        self._init_board()
 
         # Initial setup
         bel_air = self.get_location_by_name('Bel Air')
@@ -58,33 +112,245 @@ class Game:
             u = Unit(f'Blue-{i}', 'infantry', 3, 1)
             self.teams['Blue'].units.append(u)
             bel_air.units['Blue'].append(u)
+            self._index_unit(u, bel_air)
+        self.teams['Blue'].next_unit_number = 5
 
         aberdeen.units['Red'] = []
         for i in range(1, 6):
             u = Unit(f'Red-{i}', 'infantry', 3, 1)
             self.teams['Red'].units.append(u)
             aberdeen.units['Red'].append(u)
+            self._index_unit(u, aberdeen)
+        self.teams['Red'].next_unit_number = 5
 
-    def get_location_by_name(self, name):
-        for loc in self.locations:
-            if loc.name == name:
-                return loc
-        return None
+    def _init_board(self):
+        self.turn = 0
+        self.locations = []
+        for n in LOCATION_NAMES:
+            loc = Location(n, tuple(CONNECTIONS.get(n, ())), 1)
+            self.locations.append(loc)
 
-    def get_unit_by_id(self, uid):
+        # Lookup indexes, kept in sync by execute_actions
+        self._locations_by_name = {loc.name: loc for loc in self.locations}
+        self._units_by_id = {}
+        self._unit_locations = {}
+
+        # Delta restore: the snapshot last taken or restored, its Unit objects, and what
+        # execute_actions has touched since (locations, and whether units came or went)
+        self._base = None
+        self._base_units = None
+        self._dirty = set()
+        self._roster_changed = False
+
+        self.teams = {
+            'Blue': Team('Blue'),
+            'Red': Team('Red')
+        }
+
+    def snapshot(self):
+        """
+        Captures the current turn, resources, control and units as a GameSnapshot.
+        Restoring the most recent snapshot only rebuilds what changed since (see restore).
+        """
+        snapshot, units = self._capture()
+        self._set_base(snapshot, units)
+        return snapshot
+
+    def _capture(self):
+        # Returns (GameSnapshot, the Unit objects in snapshot order)
+        units = []
+        unit_index = {}
+        ids, types, health, strength, sizes = [], [], [], [], []
         for team in self.teams.values():
             for u in team.units:
-                if u.id == uid:
-                    return u
-        return None
+                unit_index[u.id] = len(ids)
+                units.append(u)
+                ids.append(u.id)
+                types.append(u.type)
+                health.append(u.health)
+                strength.append(u.strength)
+            sizes.append(len(team.units))
+
+        team_codes = {name: i + 1 for i, name in enumerate(self.teams)}
+        snapshot = GameSnapshot(
+            turn=self.turn,
+            resources=tuple(t.resources for t in self.teams.values()),
+            next_unit_numbers=tuple(t.next_unit_number for t in self.teams.values()),
+            controlled_locations=tuple(tuple(t.controlled_locations) for t in self.teams.values()),
+            control=bytes(team_codes.get(loc.control, 0) for loc in self.locations),
+            unit_ids=tuple(ids),
+            unit_types=tuple(types),
+            unit_health=bytes(health),
+            unit_strength=bytes(strength),
+            team_sizes=tuple(sizes),
+            placement=tuple(
+                tuple((t, tuple(unit_index[u.id] for u in us)) for t, us in loc.units.items())
+                for loc in self.locations
+            ),
+        )
+        return snapshot, units
+
+    def _set_base(self, snapshot, units):
+        self._base = snapshot
+        self._base_units = units
+        self._dirty = set()
+        self._roster_changed = False
+
+    def restore(self, snapshot):
+        """
+        Rewinds the game to a snapshot taken from this game or one with the same map.
+
+        Restoring the snapshot last taken or restored only resets the locations that
+        execute_actions has touched since, so branching on a move costs little more
+        than the move. Any other snapshot is restored in full, updating Unit objects
+        that still exist in place. Changes made other than through execute_actions are
+        not tracked; take a new snapshot after them.
+        """
+        if snapshot is self._base:
+            self._restore_delta(snapshot)
+            return
+        team_names = list(self.teams)
+        units = []
+        for i, uid in enumerate(snapshot.unit_ids):
+            u = self._units_by_id.get(uid)
+            if u is None:
+                u = Unit(uid, snapshot.unit_types[i], snapshot.unit_health[i], snapshot.unit_strength[i])
+            else:
+                u.type = snapshot.unit_types[i]
+                u.health = snapshot.unit_health[i]
+                u.strength = snapshot.unit_strength[i]
+            units.append(u)
+        self._reset_teams(snapshot, units)
+
+        self._units_by_id = {u.id: u for u in units}
+        self._unit_locations = {}
+        for loc, code, placed in zip(self.locations, snapshot.control, snapshot.placement):
+            loc.control = team_names[code - 1] if code else None
+            loc.units = {}
+            for team_name, indexes in placed:
+                loc.units[team_name] = [units[j] for j in indexes]
+                for j in indexes:
+                    self._unit_locations[units[j].id] = loc
+        self.turn = snapshot.turn
+        self._set_base(snapshot, units)
+
+    def _reset_teams(self, snapshot, units=None):
+        # Per-team fields, and the unit lists too if units are given
+        start = 0
+        for i, team in enumerate(self.teams.values()):
+            team.resources = snapshot.resources[i]
+            team.next_unit_number = snapshot.next_unit_numbers[i]
+            team.controlled_locations = list(snapshot.controlled_locations[i])
+            if units is not None:
+                team.units = units[start:start + snapshot.team_sizes[i]]
+            start += snapshot.team_sizes[i]
+
+    def _restore_delta(self, snapshot):
+        # Every unit that moved, fought or was eliminated since the base snapshot left
+        # or fought at a location that is now dirty, as did every new unit, so
+        # resetting the dirty locations (and the per-team fields) restores everything
+        units = self._base_units
+        self._reset_teams(snapshot, units if self._roster_changed else None)
+        if self._roster_changed:
+            self._units_by_id = {u.id: u for u in units}
+            for uid in [uid for uid in self._unit_locations if uid not in self._units_by_id]:
+                del self._unit_locations[uid]
+        team_names = list(self.teams)
+        for i, loc in enumerate(self.locations):
+            if loc not in self._dirty:
+                continue
+            code = snapshot.control[i]
+            loc.control = team_names[code - 1] if code else None
+            loc.units = {}
+            for team_name, indexes in snapshot.placement[i]:
+                placed = loc.units[team_name] = [units[j] for j in indexes]
+                for j, u in zip(indexes, placed):
+                    u.type = snapshot.unit_types[j]
+                    u.health = snapshot.unit_health[j]
+                    u.strength = snapshot.unit_strength[j]
+                    self._unit_locations[u.id] = loc
+        self.turn = snapshot.turn
+        self._dirty = set()
+        self._roster_changed = False
+
+    def clone(self, rng=None):
+        """
+        Returns an independent copy of the game. Unless another rng is given, the
+        copy's RNG starts from this game's RNG state, so a clone replays the same dice.
+        """
+        if rng is None:
+            rng = random.Random()
+            rng.setstate(self.rng.getstate())
+        game = Game.__new__(Game)
+        game.seed = self.seed
+        game.rng = rng
+        game._init_board()
+        game.restore(self._capture()[0])
+        return game
+
+    def _index_unit(self, unit, loc):
+        self._roster_changed = True
+        self._units_by_id[unit.id] = unit
+        self._unit_locations[unit.id] = loc
+
+    def _unindex_unit(self, unit):
+        self._roster_changed = True
+        self._units_by_id.pop(unit.id, None)
+        self._unit_locations.pop(unit.id, None)
+
+    def get_location_by_name(self, name):
+        return self._locations_by_name.get(name)
+
+    def get_unit_by_id(self, uid):
+        return self._units_by_id.get(uid)
 
     def get_location_of_unit(self, uid):
+        return self._unit_locations.get(uid)
+
+    def check_consistency(self):
+        """
+        Cross-checks the lookup indexes against the unit lists in teams and locations.
+        Returns a list of problem descriptions; an empty list means the state is consistent.
+        """
+        problems = []
+        placed = {}
         for loc in self.locations:
+            if self._locations_by_name.get(loc.name) is not loc:
+                problems.append(f'Location {loc.name} missing from name index')
             for team_name, us in loc.units.items():
                 for u in us:
-                    if u.id == uid:
-                        return loc
-        return None
+                    if u.id in placed:
+                        problems.append(f'Unit {u.id} is in both {placed[u.id].name} and {loc.name}')
+                    placed[u.id] = loc
+                    if u not in self.teams[team_name].units:
+                        problems.append(f'Unit {u.id} at {loc.name} is not in team {team_name}')
+            if loc.control and loc.name not in self.teams[loc.control].controlled_locations:
+                problems.append(f'{loc.name} is controlled by {loc.control} but not in its controlled_locations')
+
+        team_unit_ids = set()
+        for team_name, team in self.teams.items():
+            for u in team.units:
+                if u.id in team_unit_ids:
+                    problems.append(f'Duplicate unit ID {u.id}')
+                team_unit_ids.add(u.id)
+                if u.health <= 0:
+                    problems.append(f'Unit {u.id} has {u.health} health but was not removed')
+                if self._units_by_id.get(u.id) is not u:
+                    problems.append(f'Unit {u.id} missing from unit index')
+                if u.id not in placed:
+                    problems.append(f'Unit {u.id} is not at any location')
+                elif self._unit_locations.get(u.id) is not placed[u.id]:
+                    problems.append(f'Unit {u.id} indexed at wrong location')
+            for loc_name in team.controlled_locations:
+                loc = self._locations_by_name.get(loc_name)
+                if not loc or loc.control != team_name:
+                    problems.append(f'{team_name} lists {loc_name} as controlled but it is not')
+
+        for uid in set(self._units_by_id) - team_unit_ids:
+            problems.append(f'Stale unit index entry {uid}')
+        for uid in set(self._unit_locations) - team_unit_ids:
+            problems.append(f'Stale location index entry {uid}')
+        return problems
 
     def get_visible_state(self, team_name):
         team = self.teams[team_name]
@@ -92,7 +358,7 @@ class Game:
         state = {
             'team': team_name,
             'resources': team.resources,
-            'controlled_locations': team.controlled_locations,
+            'controlled_locations': list(team.controlled_locations),
             'own_unit_count': len(team.units),
             'opponent_unit_count': len(self.teams[opponent_name].units),
             'units': [
@@ -110,7 +376,7 @@ class Game:
             loc_dict = {
                 'control': loc.control,
                 'resources': loc.resources,
-                'connections': loc.connections,
+                'connections': list(loc.connections),
                 'own_units_count': len(loc.units.get(team_name, [])),
             }
             visible = len(loc.units.get(team_name, [])) > 0
@@ -140,10 +406,14 @@ class Game:
                 loc = self.get_location_by_name(loc_name)
                 if loc and loc.control == team_name and team.resources >= 3:
                     team.resources -= 3
-                    new_id = f"{team_name}-{len(team.units) + 1}"
+                    self._dirty.add(loc)
+                    # Numbering from a counter keeps IDs unique after units are eliminated
+                    team.next_unit_number += 1
+                    new_id = f"{team_name}-{team.next_unit_number}"
                     new_unit = Unit(new_id, 'infantry', 3, 1)
                     team.units.append(new_unit)
                     loc.units.setdefault(team_name, []).append(new_unit)
+                    self._index_unit(new_unit, loc)
                     results.append(f'Reinforced {loc_name} with new unit {new_id}')
                 else:
                     results.append(f'Failed to reinforce {loc_name}')
@@ -176,6 +446,8 @@ class Game:
                     continue
 
                 # Execute the move
+                self._dirty.add(from_loc)
+                self._dirty.add(to_loc)
                 results.append(f'Moving {unit_id} from {from_loc.name} to {to_name}')
                 
                 # Remove unit from its current location
@@ -191,6 +463,7 @@ class Game:
                 if not def_units:
                     # No combat, move in
                     to_loc.units.setdefault(team_name, []).append(unit)
+                    self._unit_locations[unit_id] = to_loc
                     old_control = to_loc.control
                     if old_control != team_name:
                         to_loc.control = team_name
@@ -202,28 +475,14 @@ class Game:
                     # Combat
                     att_units = [unit]
                     combat_log = [f'Combat at {to_name}: {len(att_units)} attackers vs {len(def_units)} defenders']
-                    combat_rounds = 0
-                    while att_units and def_units and combat_rounds < 100:
-                        att_strength = sum(u.strength for u in att_units)
-                        def_strength = sum(u.strength for u in def_units)
-                        att_roll = random.randint(1, 6) + att_strength
-                        def_roll = random.randint(1, 6) + def_strength
-
-                        if att_roll > def_roll:
-                            lost_unit = random.choice(def_units)
-                            lost_unit.health -= 1
-                            if lost_unit.health <= 0:
-                                def_units.remove(lost_unit)
-                                self.teams[opponent_name].units.remove(lost_unit)
-                                combat_log.append(f'Defender unit {lost_unit.id} eliminated')
-                        elif def_roll > att_roll:
-                            lost_unit = random.choice(att_units)
-                            lost_unit.health -= 1
-                            if lost_unit.health <= 0:
-                                att_units.remove(lost_unit)
-                                team.units.remove(lost_unit)
-                                combat_log.append(f'Attacker unit {lost_unit.id} eliminated')
-                        combat_rounds += 1
+                    for side, lost_unit in resolve_combat(att_units, def_units, self.rng):
+                        if side == 'defender':
+                            self.teams[opponent_name].units.remove(lost_unit)
+                            combat_log.append(f'Defender unit {lost_unit.id} eliminated')
+                        else:
+                            team.units.remove(lost_unit)
+                            combat_log.append(f'Attacker unit {lost_unit.id} eliminated')
+                        self._unindex_unit(lost_unit)
                     
                     results.extend(combat_log)
                     results.append(f'Combat result: {len(att_units)} attackers left, {len(def_units)} defenders left')
@@ -231,6 +490,8 @@ class Game:
                     to_loc.units[opponent_name] = def_units
                     if att_units:
                         to_loc.units.setdefault(team_name, []).extend(att_units)
+                        for u in att_units:
+                            self._unit_locations[u.id] = to_loc
                         old_control = to_loc.control
                         if old_control != team_name:
                             to_loc.control = team_name
@@ -256,7 +517,7 @@ class Game:
             state['teams'][team_name] = {
                 'model': TEAM_MODELS.get(team_name, team_name),
                 'resources': team.resources,
-                'controlled_locations': team.controlled_locations,
+                'controlled_locations': list(team.controlled_locations),
                 'units': [{
                     'id': u.id,
                     'type': u.type,
@@ -269,7 +530,7 @@ class Game:
             loc_dict = {
                 'control': loc.control,
                 'resources': loc.resources,
-                'connections': loc.connections,
+                'connections': list(loc.connections),
                 'units': {t: len(us) for t, us in loc.units.items()}
             }
             state['locations'][loc.name] = loc_dict
@@ -281,4 +542,26 @@ class Game:
             opponent = self.teams['Red' if team_name == 'Blue' else 'Blue']
             if len(team.controlled_locations) >= 5 or len(opponent.units) == 0:
                 return team_name
-        return None
\ No newline at end of file
+        return None
+
+def replay_moves(moves, seed):
+    """
+    Plays logged turns again on a fresh Game(seed=seed), applying each turn's actions
+    under the same action limit as the runners.
+
+    :param moves: move dicts from game_log.read_game_log
+    :param seed: the seed from the log header
+    :return: generator of (game, move, results) after each turn
+    :raises ValueError: when a turn's visible state differs from the logged one (the log
+                        came from another seed or engine version)
+    """
+    game = Game(seed=seed)
+    for move in moves:
+        team = move['team']
+        opponent = 'Red' if team == 'Blue' else 'Blue'
+        game.turn = move['turn']
+        if game.get_visible_state(team) != move['visible_state']:
+            raise ValueError(f"Turn {move['turn']} does not match the log")
+        action_limit = max(1, len(game.teams[opponent].units))
+        actions = [dict(a) if isinstance(a, dict) else a for a in move.get('actions', [])][:action_limit]
+        yield game, move, game.execute_actions(team, actions)
@@ -0,0 +1,121 @@
+import glob
+import json
+import os
+
+GAMES_DIR = 'games'
+
+# How many turn records to write between fsync calls (0 = only on close)
+DEFAULT_FSYNC_EVERY = int(os.getenv('HARCO_LOG_FSYNC_EVERY', '10'))
+
+
+def game_log_path(game_id, directory=GAMES_DIR):
+    """
+    Returns the path of the append-only log for a game.
+    """
+    return os.path.join(directory, f'game_{game_id}.jsonl')
+
+
+class GameLogWriter:
+    """
+    Append-only JSON Lines writer for a single game.
+
+    The file holds an optional header line ({"header": {...}}) followed by one
+    compact JSON record per turn. Every record is flushed as soon as it is
+    written, and the file is fsync'd every `fsync_every` records and on close,
+    so a crash loses at most the turns since the last sync.
+    """
+
+    def __init__(self, game_id, directory=GAMES_DIR, fsync_every=DEFAULT_FSYNC_EVERY, header=None):
+        os.makedirs(directory, exist_ok=True)
+        self.game_id = game_id
+        self.path = game_log_path(game_id, directory)
+        self.fsync_every = fsync_every
+        self.records_written = 0
+        self._unsynced = 0
+        # 'x' so that two games given the same ID fail loudly instead of sharing a file
+        self._file = open(self.path, 'x', encoding='utf-8')
+        if header is not None:
+            self._write({'header': header})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def append(self, move):
+        """
+        Appends one turn record to the log.
+        """
+        self._write(move)
+        self.records_written += 1
+
+    def sync(self):
+        """
+        Forces written records to disk.
+        """
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_game_log(path):
+    """
+    Reads a game log written either as a pretty-printed JSON list (legacy
+    games/*.json files) or as JSON Lines by GameLogWriter.
+
+    :param path: str, path to the log file
+    :return: tuple (dict header or None, list of move dicts)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    if text.lstrip().startswith('['):
+        return None, json.loads(text)
+
+    header = None
+    moves = []
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # A torn final line means the writer died mid-record; keep what we have
+            if i == len(lines) - 1:
+                break
+            raise
+        if 'header' in record and len(record) == 1:
+            header = record['header']
+        else:
+            moves.append(record)
+    return header, moves
+
+
+def load_game_log(path):
+    """
+    Returns the list of move dicts stored in a game log of either format.
+    """
+    return read_game_log(path)[1]
+
+
+def list_game_logs(directory=GAMES_DIR):
+    """
+    Returns the paths of all game logs in a directory, oldest first.
+    """
+    paths = glob.glob(os.path.join(directory, 'game_*.json')) + glob.glob(os.path.join(directory, 'game_*.jsonl'))
+    return sorted(paths)
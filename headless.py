@@ -0,0 +1,113 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_runner import GameResult
+from controllers import POLICIES
+from game import Game, derive_seed
+
+MAX_TURNS = 120
+
+
+def play_game(game_number, blue_policy, red_policy, seed=None, max_turns=MAX_TURNS):
+    """
+    Plays one full game between two local policies, synchronously and without logging.
+
+    :param game_number: int, number recorded in the result
+    :param blue_policy: str (POLICIES name) or policy callable for Blue
+    :param red_policy: str (POLICIES name) or policy callable for Red
+    :param seed: seed for the game's dice and the policies' RNG
+    :return: GameResult
+    """
+    policies = {
+        'Blue': POLICIES[blue_policy] if isinstance(blue_policy, str) else blue_policy,
+        'Red': POLICIES[red_policy] if isinstance(red_policy, str) else red_policy,
+    }
+    start_time = time.time()
+    game = Game(seed=seed)
+    # One RNG per team, as controllers.get_controller gets in batch_runner.py and tournament.py
+    rngs = {team: random.Random(derive_seed(game.seed, team)) for team in policies}
+
+    winner = None
+    turn = 0
+    for turn in range(1, max_turns + 1):
+        game.turn = turn
+        active_team = 'Blue' if turn % 2 == 1 else 'Red'
+        opponent_team = 'Red' if active_team == 'Blue' else 'Blue'
+
+        state = game.get_visible_state(active_team)
+        actions = policies[active_team](active_team, state, rngs[active_team])
+        action_limit = max(1, len(game.teams[opponent_team].units))
+        game.execute_actions(active_team, actions[:action_limit])
+
+        winner = game.check_victory()
+        if winner:
+            break
+
+    blue_team = game.teams['Blue']
+    red_team = game.teams['Red']
+    return GameResult(
+        game_number=game_number,
+        winner=winner or "Draw",
+        turns_taken=turn,
+        final_blue_units=len(blue_team.units),
+        final_red_units=len(red_team.units),
+        final_blue_locations=len(blue_team.controlled_locations),
+        final_red_locations=len(red_team.controlled_locations),
+        duration_seconds=time.time() - start_time
+    )
+
+
+def _play_games(game_numbers, blue_policy, red_policy, master_seed):
+    return [
+        play_game(n, blue_policy, red_policy, seed=derive_seed(master_seed, n))
+        for n in game_numbers
+    ]
+
+
+def run_headless(num_games, blue_policy='greedy', red_policy='random', processes=None, master_seed=0, chunk_size=50):
+    """
+    Plays num_games games across a process pool and returns their results ordered by game number.
+    Game n is seeded from (master_seed, n), so results do not depend on the number of processes.
+    """
+    game_numbers = list(range(1, num_games + 1))
+    chunks = [game_numbers[i:i + chunk_size] for i in range(0, num_games, chunk_size)]
+    if processes == 1:
+        results = [r for chunk in chunks for r in _play_games(chunk, blue_policy, red_policy, master_seed)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(_play_games, chunk, blue_policy, red_policy, master_seed) for chunk in chunks]
+            results = [r for f in futures for r in f.result()]
+    return sorted(results, key=lambda r: r.game_number)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games between local scripted policies without a display or LLM")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--blue", choices=list(POLICIES), default="lookahead")
+    parser.add_argument("--red", choices=list(POLICIES), default="greedy")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="master seed; game n uses a seed derived from it")
+    args = parser.parse_args()
+
+    start = time.time()
+    results = run_headless(args.games, args.blue, args.red, processes=args.processes, master_seed=args.seed)
+    elapsed = time.time() - start
+
+    blue_wins = sum(1 for r in results if r.winner == "Blue")
+    red_wins = sum(1 for r in results if r.winner == "Red")
+    draws = sum(1 for r in results if r.winner == "Draw")
+    avg_turns = sum(r.turns_taken for r in results) / len(results)
+
+    print(f"🎮 {len(results)} games: Blue ({args.blue}) vs Red ({args.red})")
+    print(f"Blue Wins: {blue_wins} ({blue_wins / len(results) * 100:.1f}%)")
+    print(f"Red Wins: {red_wins} ({red_wins / len(results) * 100:.1f}%)")
+    print(f"Draws: {draws} ({draws / len(results) * 100:.1f}%)")
+    print(f"Average Turns: {avg_turns:.1f}")
+    print(f"Elapsed: {elapsed:.2f}s ({len(results) / elapsed:.0f} games/s on {args.processes} processes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,28 @@
 import openai
 import os
-import json
 import re
-import random
 import asyncio
+import uuid
 from miniOR import *
 from dotenv import load_dotenv
 load_dotenv()
 from icecream import ic
 from datetime import datetime
+from game_log import GameLogWriter
+from response_cache import ResponseCache, make_cache_key
+from prompt_format import PROMPT_FORMATS, estimate_tokens, serialize_state
+from retry_policy import PROVIDER_REASONS, RetryPolicy, classify_error
+from telemetry import count, timed
+from plan_validation import action_plan_response_format, parse_action_plan, validate_actions
 
-# Configure icecream to log to file instead of console
-def log_to_file(*args):
-    with open('game_debug.log', 'a', encoding='utf-8') as f:
-        f.write(' '.join(str(arg) for arg in args) + '\n')
+from debug_log import DEBUG, debug_log, ic_noop
 
-ic.configureOutput(includeContext=True, outputFunction=log_to_file)
+# icecream output goes to the background debug log (see debug_log.py); with
+# HARCO_DEBUG_LOG=off (or a level above DEBUG), ic is replaced by a no-op
+if debug_log.is_enabled_for(DEBUG):
+    ic.configureOutput(includeContext=True, outputFunction=debug_log.debug)
+else:
+    ic = ic_noop
 
 # Hardcoded map for prompt, assuming these connections based on Harford County layout
 LOCATIONS = [
@@ -37,7 +44,45 @@ TEAM_MODELS = {
     'Blue': googleflashlite
 }
 
-client = openai.AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+# Bump whenever the prompt changes so responses cached for older prompts are not reused
+PROMPT_VERSION = 3
+
+# How the visible state is written into the prompt: 'compact' or 'json' (see prompt_format.py)
+PROMPT_FORMAT = os.getenv('HARCO_PROMPT_FORMAT', 'compact')
+
+# Prompts estimated above this many tokens are reported in the debug log (0 disables)
+PROMPT_TOKEN_BUDGET = int(os.getenv('HARCO_PROMPT_TOKEN_BUDGET', '2000'))
+
+# Ask for JSON-schema structured output; models that reject it are remembered and asked without it
+STRUCTURED_OUTPUT = os.getenv('HARCO_STRUCTURED_OUTPUT', '1') != '0'
+_no_structured_output = set()
+ACTION_PLAN_RESPONSE_FORMAT = action_plan_response_format(LOCATIONS)
+
+# How failed requests are retried (backoff, Retry-After, deadline, fallback model); see retry_policy.py
+retry_policy = RetryPolicy.from_env(fallback_model=FALLBACK_MODEL)
+
+# Opt-in cache of LLM responses keyed on the visible state (see response_cache.py)
+response_cache = ResponseCache(os.getenv('HARCO_RESPONSE_CACHE')) if os.getenv('HARCO_RESPONSE_CACHE') else None
+
+# Cache key -> future resolving to the raw response of a request already in flight,
+# so concurrent games asking about the same position share one LLM call
+_pending_responses = {}
+
+def set_retry_policy(policy):
+    """
+    Replaces the RetryPolicy used by get_action_plan.
+    """
+    global retry_policy
+    retry_policy = policy
+    return policy
+
+def set_response_cache(cache):
+    """
+    Enables (or with None, disables) the response cache used by get_action_plan.
+    """
+    global response_cache
+    response_cache = cache
+    return cache
 
 def extract_json_from_markdown(response):
     """
@@ -58,27 +103,30 @@ def extract_json_from_markdown(response):
     # If no code blocks found, return original response
     return response.strip()
 
-async def get_action_plan(team, visible_state):
+def set_prompt_format(prompt_format):
     """
-    Generates a prompt for the LLM based on the team's visible game state and retrieves a JSON action plan.
-    Retries up to 3 times if the response is not valid JSON.
+    Selects how build_action_prompt writes the visible state: 'compact' or 'json'.
+    """
+    global PROMPT_FORMAT
+    if prompt_format not in PROMPT_FORMATS:
+        raise ValueError(f"Unknown prompt format '{prompt_format}'. Choose from: {', '.join(PROMPT_FORMATS)}")
+    PROMPT_FORMAT = prompt_format
+    return prompt_format
 
-    :param team: str, 'Blue' or 'Red'
-    :param visible_state: dict, the visible state
-    :return: tuple (dict action_plan, str final_prompt, str response)
+def build_system_prompt():
     """
-    visible_state_str = json.dumps(visible_state, indent=2)
-    action_limit = visible_state.get('opponent_unit_count', 1)
+    Builds the part of the prompt that is the same for every team and turn: rules, map and output format.
+    Sent as the system message so providers can serve it from their prompt cache.
 
-    # Build map description
+    :return: str, the system prompt
+    """
     map_desc = "Locations: " + ", ".join(LOCATIONS) + "\n"
     map_desc += "Connections:\n"
     for loc, adj in ADJACENCIES.items():
         map_desc += f"- {loc}: {', '.join(adj)}\n"
 
-    # Base prompt
-    prompt = f"""
-You are the commander of the {team.upper()} Team in a turn-based strategy game set in Harford County, Maryland.
+    return f"""
+You command one team in a turn-based strategy game set in Harford County, Maryland.
 
 Game Goal: Win by controlling at least 5 out of 6 locations or by eliminating all enemy units. The game ends after a maximum of 120 turns if no winner.
 
@@ -94,14 +142,11 @@ Game Mechanics:
 - Moving a unit to an adjacent location:
   - If neutral or empty, you can take control.
   - If enemy-controlled or has enemy units, it initiates an attack. Combat is resolved by a simple dice-roll simulation based on unit strengths (attacker vs. defender). Winner takes the location; units may lose health or be eliminated.
-- **IMPORTANT RULE**: Your number of actions this turn is limited. The number of actions you can take is equal to the number of units your opponent has. Your opponent currently has {action_limit} units, so you can perform a maximum of {action_limit} actions this turn.
+- **IMPORTANT RULE**: Your number of actions each turn is limited. The number of actions you can take is equal to the number of units your opponent has.
 - Reinforce: Spend 3 resources to add a new unit at one of your controlled locations.
 - Visibility: You see your units, controlled locations, resources, and partial intel on enemy positions (e.g., from scouts).
 
-Current Visible State:
-{visible_state_str}
-
-Plan your actions for this turn. You can specify multiple actions, but respect unit limits and resources. Remember, you are limited to {action_limit} actions.
+Each turn you receive your team, your action limit and your current visible state.
 
 Output ONLY a valid JSON object in this format:
 {{
@@ -115,67 +160,205 @@ Output ONLY a valid JSON object in this format:
 Moves to enemy locations are treated as attacks. Do not include any other text or explanations.
 """
 
-    response = None
-    model_for_team = TEAM_MODELS.get(team, 'gpt-4o')
+# Built once; identical for every request so it stays a cacheable prefix
+SYSTEM_PROMPT = build_system_prompt()
+
+def build_action_prompt(team, visible_state, prompt_format=None):
+    """
+    Builds the per-turn part of the LLM prompt from a team's visible game state.
+    The rules and map are in SYSTEM_PROMPT, sent alongside it.
+
+    :param team: str, 'Blue' or 'Red'
+    :param visible_state: dict, the visible state
+    :param prompt_format: str, 'compact' or 'json'; defaults to PROMPT_FORMAT
+    :return: str, the prompt
+    """
+    legend, visible_state_str = serialize_state(visible_state, prompt_format or PROMPT_FORMAT)
+    state_header = f"Current Visible State ({legend}):" if legend else "Current Visible State:"
+    action_limit = visible_state.get('opponent_unit_count', 1)
+
+    prompt = f"""You are the commander of the {team.upper()} Team.
+Your opponent currently has {action_limit} units, so you can perform a maximum of {action_limit} actions this turn.
+
+{state_header}
+{visible_state_str}
+
+Plan your actions for this turn. You can specify multiple actions, but respect unit limits and resources. Remember, you are limited to {action_limit} actions. Output ONLY the JSON object.
+"""
+    if PROMPT_TOKEN_BUDGET:
+        tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt)
+        if tokens > PROMPT_TOKEN_BUDGET:
+            debug_log.info(f"Prompt for {team} is ~{tokens} tokens, over the budget of {PROMPT_TOKEN_BUDGET}")
+    return prompt
+
+async def get_action_plan(team, visible_state, model=None):
+    """
+    Generates a prompt for the LLM based on the team's visible game state and retrieves a JSON action plan.
+    The plan is checked against the visible state with plan_validation.validate_actions: fixable
+    mistakes are repaired and impossible actions dropped locally. Failed requests are retried
+    as retry_policy decides: after Retry-After on 429, with jittered backoff on 5xx and timeouts,
+    at once if no plan can be recovered from the response, and never past the turn deadline.
+
+    :param team: str, 'Blue' or 'Red'
+    :param visible_state: dict, the visible state
+    :param model: str, model to ask instead of TEAM_MODELS[team]
+    :return: tuple (dict action_plan, str final_prompt (the per-turn part after SYSTEM_PROMPT), str response)
+    """
+    with timed('get_action_plan'):
+        return await _get_action_plan(team, visible_state, model)
+
+async def _get_action_plan(team, visible_state, model=None):
+    prompt = build_action_prompt(team, visible_state)
+    model_for_team = model or TEAM_MODELS.get(team, 'gpt-4o')
     ic(f"Model for team: {model_for_team}")
-    ic(f"Prompt:")
-    ic(prompt)
-    for attempt in range(3):
+
+    cache_key = None
+    pending = None
+    if response_cache is not None:
+        cache_key = make_cache_key(team, model_for_team, visible_state, f"{PROMPT_VERSION}:{PROMPT_FORMAT}")
+        cached = response_cache.get(cache_key)
+        # Wait for an identical request in flight; if it fails, the first waiter to wake takes over
+        while cached is None and cache_key in _pending_responses:
+            cached = await asyncio.shield(_pending_responses[cache_key])
+            if cached is not None:
+                response_cache.stats['coalesced'] += 1
+        if cached is not None:
+            ic("Response cache hit")
+            count('cache_hits')
+            return _checked_plan(team, visible_state, parse_action_plan(cached)), prompt, cached
+        pending = _pending_responses[cache_key] = asyncio.get_running_loop().create_future()
+
+    shared = None
+    try:
+        action_plan, prompt, response, answered_by = await _request_action_plan(team, visible_state, prompt, model_for_team)
+        if pending is not None and answered_by is not None:
+            shared = response
+            # Answers from the fallback model are shared with waiting games but not cached
+            if answered_by == model_for_team:
+                response_cache.put(cache_key, response)
+        return action_plan, prompt, response
+    finally:
+        if pending is not None:
+            # Only this call's own entry; a waiter may already have replaced a failed one
+            if _pending_responses.get(cache_key) is pending:
+                del _pending_responses[cache_key]
+            if not pending.done():
+                pending.set_result(shared)
+
+def _checked_plan(team, visible_state, action_plan):
+    # Keeps only the actions that can succeed, logging what was dropped
+    actions, problems = validate_actions(team, visible_state, action_plan['actions'])
+    if problems:
+        ic(f"Pruned action plan for {team}: {problems}")
+    return {**action_plan, 'actions': actions}
+
+async def _request_action_plan(team, visible_state, prompt, model_for_team):
+    # Queries the LLM until it answers or retry_policy gives up; see get_action_plan.
+    # Returns (action_plan, prompt, response, model that answered or None if none did)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + retry_policy.turn_deadline
+    response = None
+    base_prompt = prompt
+    model = model_for_team
+    attempt = 0
+    provider_failures = 0
+    debug_log.prompt(prompt)
+    while True:
+        structured = STRUCTURED_OUTPUT and model not in _no_structured_output
         try:
-            completion = await chat(
-                prompt_str= prompt,
-                model=model_for_team,
-                # temperature=0,  # Deterministic
-                # max_tokens=1000
+            completion = await asyncio.wait_for(
+                chat(
+                    prompt_str= prompt,
+                    model=model,
+                    system_prompt=SYSTEM_PROMPT,
+                    response_format=ACTION_PLAN_RESPONSE_FORMAT if structured else None,
+                    # temperature=0,  # Deterministic
+                    # max_tokens=1000
+                ),
+                timeout=max(0.0, deadline - loop.time()),
             )
             ic(f"Response: {completion}")
             response = completion
-            
-            # Extract JSON from markdown code blocks if present
-            json_content = extract_json_from_markdown(response)
-            action_plan = json.loads(json_content)
-            
-            if isinstance(action_plan, dict) and 'actions' in action_plan:
-                ic(f"Action plan: {action_plan}")
-                return action_plan, prompt, response
-            else:
-                ic(f"Action plan: {action_plan}")
-                ic("Action plan is not a dict or does not have an 'actions' key")
-                await asyncio.sleep(0.1)
-                raise json.JSONDecodeError("Invalid JSON structure", "", 0)
-        except (json.JSONDecodeError, openai.OpenAIError, Exception) as e:
-            error_msg = f"Attempt {attempt + 1} failed. Error: {str(e)}. "
-            ic(f"Error: {error_msg}")
-            await asyncio.sleep(0.1)
-            if response:
-                error_msg += f"Previous response: {response[:200]}..."  # Truncate for brevity
-                ic(f"Error message: {error_msg}")
-                await asyncio.sleep(0.1)
-            prompt += f"\n\n{error_msg}\nPlease correct and output ONLY valid JSON as specified."
-            ic(f"Prompt: {prompt}")
-    ic("Failed to get valid response from LLM. Using default empty actions.")
-    await asyncio.sleep(0.1)
-    
+
+            # Tolerates markdown fences, prose and truncated output
+            with timed('llm_parse'):
+                action_plan = parse_action_plan(response)
+                checked_plan = _checked_plan(team, visible_state, action_plan)
+            ic(f"Action plan: {action_plan}")
+            return checked_plan, prompt, response, model
+        except Exception as e:
+            if structured and isinstance(e, openai.BadRequestError):
+                debug_log.warning(f"{model} rejected structured output, retrying without it: {str(e)[:200]}")
+                _no_structured_output.add(model)
+                continue
+            attempt += 1
+            reason = classify_error(e)
+            retry_policy.stats[reason] += 1
+            count('llm_retries')
+            provider_failures = provider_failures + 1 if reason in PROVIDER_REASONS else 0
+            error_msg = f"Attempt {attempt} failed ({reason}). Error: {str(e)[:200]}. "
+            debug_log.warning(f"{team}: {error_msg}")
+            if reason == 'parse':
+                if response:
+                    error_msg += f"Previous response: {response[:200]}..."  # Truncate for brevity
+                # Only the latest error is sent back, so retries don't grow the prompt
+                prompt = f"{base_prompt}\n\n{error_msg}\nPlease correct and output ONLY valid JSON as specified."
+
+            delay = retry_policy.delay(reason, attempt, e)
+            if delay is None:
+                retry_policy.stats['gave_up'] += 1
+                break
+            if loop.time() + delay >= deadline:
+                retry_policy.stats['deadline'] += 1
+                debug_log.warning(f"{team}: turn deadline reached after {attempt} attempts")
+                break
+            next_model = retry_policy.next_model(model_for_team, provider_failures)
+            if next_model != model:
+                retry_policy.stats['fallback'] += 1
+                debug_log.warning(f"Switching {team} from {model} to {next_model}")
+                model = next_model
+            with timed('llm_backoff'):
+                await asyncio.sleep(delay)
+    debug_log.error(f"{team}: failed to get a valid response from the LLM. Using default empty actions.")
+
     action_plan = {"actions": []}
-    return action_plan, prompt, response
+    return action_plan, prompt, response, None
 
 def get_unique_game_id():
     """
-    Generates a unique game ID based on the current timestamp.
-    Returns: str, e.g., '20240607_153012'
+    Generates a unique game ID: the current timestamp plus a random suffix, so games
+    started in the same second (or in other processes) get different IDs.
+    Returns: str, e.g., '20240607_153012_3f9c2a1b'
     """
-    return datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+# Open append-only writers used by save_game_move, keyed by game ID
+_log_writers = {}
 
 
 def save_game_move(game_id, game_log):
     """
     Saves the current game log (list of moves) to a uniquely identified file in the 'games/' directory.
     Each move should be a dict with at least: team, visible_state, actions.
+    Only the moves not yet written for this game are appended, so calling this
+    after every turn costs O(1) per turn instead of rewriting the whole file.
     Args:
         game_id (str): Unique identifier for the game (timestamp-based).
         game_log (list): List of move dicts.
     """
-    os.makedirs('games', exist_ok=True)
-    file_path = os.path.join('games', f'game_{game_id}.json')
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(game_log, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+    with timed('save_game_move'):
+        writer = _log_writers.get(game_id)
+        if writer is None:
+            writer = _log_writers[game_id] = GameLogWriter(game_id)
+        for move in game_log[writer.records_written:]:
+            writer.append(move)
+
+
+def close_game_log(game_id):
+    """
+    Flushes and closes the writer opened by save_game_move for a game.
+    """
+    writer = _log_writers.pop(game_id, None)
+    if writer:
+        writer.close()
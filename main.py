@@ -1,18 +1,19 @@
+import argparse
 import pygame
 import sys
 import asyncio
-import json
-import time
 from dataclasses import dataclass
-from typing import List
-from game import Game
-from llm_controller import get_action_plan, get_unique_game_id, save_game_move
-from visualization import GameVisualizer
+from typing import Callable, Dict, List
+from game import Game, derive_seed
+from llm_controller import get_action_plan, get_unique_game_id
+from game_log import GameLogWriter
+from controllers import CONTROLLER_NAMES, describe_controller, get_controller
+from miniOR import close_client
+from telemetry import start_turn, timed
+from visualization import GameVisualizer, RenderLoop
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
-from rich.text import Text
-from rich import print as rprint
 
 console = Console()
 
@@ -27,149 +28,151 @@ class GameResult:
     final_red_locations: int
 
 class BatchGameRunner:
-    def __init__(self):
+    def __init__(self, controllers: Dict[str, Callable | str] | None = None, master_seed=None):
         self.all_results: List[GameResult] = []
         self.current_batch_results: List[GameResult] = []
+        # Per-team async controllers with get_action_plan's signature (see controllers.py), or
+        # controller names, built for each game with an RNG seeded from the game's seed
+        self.controllers = {'Blue': get_action_plan, 'Red': get_action_plan, **(controllers or {})}
+        # Game n is seeded with derive_seed(master_seed, n); None gives every game a fresh seed
+        self.master_seed = master_seed
         
-    async def run_single_game(self, game_number: int, visualizer: GameVisualizer, clock: pygame.time.Clock) -> GameResult:
-        """Run a single game with full visualization"""
-        game = Game()
+    async def run_single_game(self, game_number: int, renderer: RenderLoop) -> GameResult:
+        """Run a single game with full visualization.
+        Turns are handed to the render task, so the next plan is requested while the last one animates"""
+        game = Game(seed=derive_seed(self.master_seed, game_number) if self.master_seed is not None else None)
+        controllers = {
+            team: get_controller(c, seed=derive_seed(game.seed, team)) if isinstance(c, str) else c
+            for team, c in self.controllers.items()
+        }
         game_id = get_unique_game_id()
-        game_log = []
+        models = {team: describe_controller(team, controller) for team, controller in controllers.items()}
+        game_log = GameLogWriter(game_id, header={'game_id': game_id, 'models': models, 'seed': game.seed})
         
-        console.print(f"\n[bold cyan]Game {game_number} (ID: {game_id})[/bold cyan]")
+        console.print(f"\n[bold cyan]Game {game_number} (ID: {game_id}, seed: {game.seed})[/bold cyan]")
         console.print(Panel("🎮 [bold cyan]Harford County Strategy Game[/bold cyan] 🎮", style="bright_blue"))
         console.print("[green]Initial game state loaded successfully![/green]")
         
         # Initial draw
-        visualizer.draw_game_state(game)
-        await asyncio.sleep(0.1)
+        await renderer.submit(game.get_full_state(), hold=0.1)
 
         winner = None
-        for turn in range(1, 121):
-            game.turn = turn
+        try:
+            for turn in range(1, 121):
+                game.turn = turn
             
-            # Handle pygame events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-
-            active_team = 'Blue' if turn % 2 == 1 else 'Red'
-            team_color = "blue" if active_team == 'Blue' else "red"
+                active_team = 'Blue' if turn % 2 == 1 else 'Red'
+                team_color = "blue" if active_team == 'Blue' else "red"
             
-            console.print(f"\n[bold {team_color}]{'='*50}[/bold {team_color}]")
-            console.print(f"[bold {team_color}]Turn {turn}: {active_team}'s turn[/bold {team_color}]")
-            console.print(f"[bold {team_color}]{'='*50}[/bold {team_color}]")
+                console.print(f"\n[bold {team_color}]{'='*50}[/bold {team_color}]")
+                console.print(f"[bold {team_color}]Turn {turn}: {active_team}'s turn[/bold {team_color}]")
+                console.print(f"[bold {team_color}]{'='*50}[/bold {team_color}]")
 
-            state = game.get_visible_state(active_team)
-            actions, prompt, response = await get_action_plan(active_team, state)
+                recorder = start_turn()
+                with timed('get_visible_state'):
+                    state = game.get_visible_state(active_team)
+                with timed('controller'):
+                    actions, prompt, response = await controllers[active_team](active_team, state)
 
-            # Log the move
-            move_data = {
-                "turn": turn,
-                "team": active_team,
-                "visible_state": state,
-                "actions": actions.get('actions', []),
-                "raw_response": response
-            }
-            game_log.append(move_data)
-            save_game_move(game_id, game_log)
+                # Logged once the turn has been played, with its timings
+                move_data = {
+                    "turn": turn,
+                    "team": active_team,
+                    "visible_state": state,
+                    "actions": actions.get('actions', []),
+                    "raw_response": response
+                }
 
-            console.print("\n[dim]Prompt sent to LLM:[/dim]")
-            console.print("\n[dim]LLM Response received[/dim]")
+                console.print("\n[dim]Prompt sent to LLM:[/dim]")
+                console.print("\n[dim]LLM Response received[/dim]")
             
-            # Apply action limit based on opponent units
-            opponent_team = 'Red' if active_team == 'Blue' else 'Blue'
-            num_opponent_units = len(game.teams[opponent_team].units)
-            action_limit = max(1, num_opponent_units)
+                # Apply action limit based on opponent units
+                opponent_team = 'Red' if active_team == 'Blue' else 'Blue'
+                num_opponent_units = len(game.teams[opponent_team].units)
+                action_limit = max(1, num_opponent_units)
 
-            if len(actions['actions']) > action_limit:
-                console.print(f"[bold yellow]Limiting actions from {len(actions['actions'])} to {action_limit} (based on opponent's {num_opponent_units} units)[/bold yellow]")
-                actions['actions'] = actions['actions'][:action_limit]
+                if len(actions['actions']) > action_limit:
+                    console.print(f"[bold yellow]Limiting actions from {len(actions['actions'])} to {action_limit} (based on opponent's {num_opponent_units} units)[/bold yellow]")
+                    actions['actions'] = actions['actions'][:action_limit]
                 
-            console.print("\n[yellow]📋 Parsed actions:[/yellow]")
+                console.print("\n[yellow]📋 Parsed actions:[/yellow]")
 
-            results = game.execute_actions(active_team, actions['actions'])
-            
-            # Process results for visual effects
-            visualizer.process_action_results(results, active_team)
+                with timed('execute_actions'):
+                    results = game.execute_actions(active_team, actions['actions'])
             
-            # Create a table for action results
-            results_table = Table(title=f"[bold green]⚔️  {active_team} Team Action Results[/bold green]", show_header=True, header_style="bold magenta")
-            results_table.add_column("Action Type", style="cyan", width=12)
-            results_table.add_column("Description", style="white", width=50)
-            results_table.add_column("Status", style="green", width=15)
+                # Create a table for action results
+                results_table = Table(title=f"[bold green]⚔️  {active_team} Team Action Results[/bold green]", show_header=True, header_style="bold magenta")
+                results_table.add_column("Action Type", style="cyan", width=12)
+                results_table.add_column("Description", style="white", width=50)
+                results_table.add_column("Status", style="green", width=15)
             
-            for res in results:
-                if "Moving" in res and "from" in res and "to" in res:
-                    action_type = "🚶 Move"
-                    description = res.replace("Moving ", "")
-                    status = "[yellow]In Progress[/yellow]"
-                elif "Successfully moved" in res:
-                    action_type = "✅ Move"
-                    description = res.replace("Successfully moved to ", "Arrived at ")
-                    status = "[green]Success[/green]"
-                elif "Combat at" in res:
-                    action_type = "⚔️  Combat"
-                    description = res
-                    status = "[red]Fighting[/red]"
-                elif "eliminated" in res:
-                    action_type = "💀 Casualty"
-                    description = res
-                    status = "[bright_red]KIA[/bright_red]"
-                elif "Combat result" in res:
-                    action_type = "📊 Result"
-                    description = res.replace("Combat result: ", "")
-                    status = "[yellow]Complete[/yellow]"
-                elif "Reinforced" in res:
-                    action_type = "🛡️  Reinforce"
-                    description = res
-                    status = "[blue]Success[/blue]"
-                elif "Gained" in res and "resources" in res:
-                    action_type = "💰 Resources"
-                    description = res
-                    status = "[yellow]Collected[/yellow]"
-                elif "Failed" in res:
-                    action_type = "❌ Failed"
-                    description = res
-                    status = "[red]Error[/red]"
-                else:
-                    action_type = "ℹ️  Info"
-                    description = res
-                    status = "[white]Info[/white]"
+                for res in results:
+                    if "Moving" in res and "from" in res and "to" in res:
+                        action_type = "🚶 Move"
+                        description = res.replace("Moving ", "")
+                        status = "[yellow]In Progress[/yellow]"
+                    elif "Successfully moved" in res:
+                        action_type = "✅ Move"
+                        description = res.replace("Successfully moved to ", "Arrived at ")
+                        status = "[green]Success[/green]"
+                    elif "Combat at" in res:
+                        action_type = "⚔️  Combat"
+                        description = res
+                        status = "[red]Fighting[/red]"
+                    elif "eliminated" in res:
+                        action_type = "💀 Casualty"
+                        description = res
+                        status = "[bright_red]KIA[/bright_red]"
+                    elif "Combat result" in res:
+                        action_type = "📊 Result"
+                        description = res.replace("Combat result: ", "")
+                        status = "[yellow]Complete[/yellow]"
+                    elif "Reinforced" in res:
+                        action_type = "🛡️  Reinforce"
+                        description = res
+                        status = "[blue]Success[/blue]"
+                    elif "Gained" in res and "resources" in res:
+                        action_type = "💰 Resources"
+                        description = res
+                        status = "[yellow]Collected[/yellow]"
+                    elif "Failed" in res:
+                        action_type = "❌ Failed"
+                        description = res
+                        status = "[red]Error[/red]"
+                    else:
+                        action_type = "ℹ️  Info"
+                        description = res
+                        status = "[white]Info[/white]"
                 
-                results_table.add_row(action_type, description, status)
+                    results_table.add_row(action_type, description, status)
             
-            console.print(results_table)
-            console.print("\n[dim]Updated game state processed[/dim]")
+                console.print(results_table)
+                console.print("\n[dim]Updated game state processed[/dim]")
 
-            # Draw the game state with animations
-            visualizer.draw_game_state(game)
-            
-            # Allow time for animations to play
-            animation_time = 2.0  # 2 seconds for animations
-            start_time = pygame.time.get_ticks() / 1000
-            while pygame.time.get_ticks() / 1000 - start_time < animation_time:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                
-                visualizer.draw_game_state(game)
-                clock.tick(60)  # 60 FPS for smooth animations
-                await asyncio.sleep(0)  # Allow other async tasks to run
+                move_data["telemetry"] = recorder.as_dict()
+                with timed('save_game_move'):
+                    game_log.append(move_data)
+
+                winner = game.check_victory()
+                messages = []
+                if winner:
+                    winner_color = "blue" if winner == 'Blue' else "red"
+                    console.print(f"\n[bold {winner_color}]🏆 {winner} wins! 🏆[/bold {winner_color}]")
+                    messages.append((f"🏆 {winner} WINS! 🏆", "success"))
+                elif turn == 120:
+                    console.print("\n[bold yellow]⚖️  Draw! ⚖️[/bold yellow]")
+                    messages.append(("⚖️ Game ended in a draw!", "info"))
 
-            winner = game.check_victory()
-            if winner:
-                winner_color = "blue" if winner == 'Blue' else "red"
-                console.print(f"\n[bold {winner_color}]🏆 {winner} wins! 🏆[/bold {winner_color}]")
-                visualizer.add_event(f"🏆 {winner} WINS! 🏆", "success")
-                break
+                # Animate this turn while the next one is being planned; waits only if the
+                # screen is already a turn behind
+                await renderer.submit(game.get_full_state(), results, active_team, messages)
+                if winner:
+                    break
+        finally:
+            game_log.close()
+        await renderer.drain()
 
         if not winner:
-            console.print("\n[bold yellow]⚖️  Draw! ⚖️[/bold yellow]")
-            visualizer.add_event("⚖️ Game ended in a draw!", "info")
             winner = "Draw"
 
         # Collect final stats
@@ -186,19 +189,24 @@ class BatchGameRunner:
             final_red_locations=len(red_team.controlled_locations)
         )
 
-    async def run_batch(self, batch_number: int, visualizer: GameVisualizer, clock: pygame.time.Clock):
+    async def run_batch(self, batch_number: int, renderer: RenderLoop):
         """Run a batch of 10 games"""
         console.print(f"\n[bold cyan]🎮 Starting Batch {batch_number} (10 games)...[/bold cyan]")
         
         batch_results = []
         
-        for i in range(1, 11):
-            game_number = len(self.all_results) + i
-            result = await self.run_single_game(game_number, visualizer, clock)
-            batch_results.append(result)
-            
-            # Brief pause between games
-            await asyncio.sleep(0.1)
+        renderer.start()
+        try:
+            for i in range(1, 11):
+                game_number = len(self.all_results) + i
+                result = await self.run_single_game(game_number, renderer)
+                batch_results.append(result)
+                
+                # Brief pause between games
+                if not renderer.max_speed:
+                    await asyncio.sleep(0.1)
+        finally:
+            await renderer.stop()
         
         self.current_batch_results = batch_results
         self.all_results.extend(batch_results)
@@ -282,18 +290,30 @@ class BatchGameRunner:
             clock.tick(60)
 
 async def main():
+    parser = argparse.ArgumentParser(description="Play batches of games with live visualization")
+    parser.add_argument("--blue", choices=CONTROLLER_NAMES, default="llm", help="controller for Blue")
+    parser.add_argument("--red", choices=CONTROLLER_NAMES, default="llm", help="controller for Red")
+    parser.add_argument("--max-speed", action="store_true",
+                        help="never wait for animations; the window just shows the latest state")
+    parser.add_argument("--turn-seconds", type=float, default=2.0, help="how long each turn stays on screen")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=None, help="master seed; game n uses a seed derived from it (default: random per game)")
+    args = parser.parse_args()
+
     # Initialize the enhanced visualizer
     visualizer = GameVisualizer(800, 600)
     clock = pygame.time.Clock()
-    runner = BatchGameRunner()
+    renderer = RenderLoop(visualizer, fps=args.fps, turn_seconds=args.turn_seconds, max_speed=args.max_speed)
+    runner = BatchGameRunner(controllers={'Blue': args.blue, 'Red': args.red}, master_seed=args.seed)
     batch_number = 1
     
     while True:
         # Run batch of 10 games
-        await runner.run_batch(batch_number, visualizer, clock)
+        await runner.run_batch(batch_number, renderer)
         
         # Show results screen and wait for input
         user_choice = runner.show_results_screen(visualizer, clock)
+        visualizer.invalidate()
         
         if user_choice == "exit":
             console.print("\n[bold green]Thanks for playing! Goodbye! 👋[/bold green]")
@@ -302,6 +322,7 @@ async def main():
             batch_number += 1
             continue
     
+    await close_client()
     pygame.quit()
     sys.exit()
 
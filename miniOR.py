@@ -1,8 +1,14 @@
 import asyncio
 import os
+from collections import Counter
 
+import httpx
 from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI, RateLimitError
+
+from rate_limiter import RateLimiter, estimate_request_tokens
+from retry_policy import retry_after_seconds
+from telemetry import count, timed
 
 load_dotenv()
 
@@ -19,11 +25,35 @@ grok4 : str = "x-ai/grok-4"
 SUMMARY_MODEL : str = googleflashlite  # Model for summaries
 MAIN_MODEL : str = f"{googleflashlite}"  # Primary model for main agent operations
 CODE_MODEL : str = f"{googleflashlite}:web"  # Model for code generation tasks
-BASE_URL : str = "https://openrouter.ai/api/v1"
+BASE_URL : str = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")  # e.g. stub_server.py for offline runs
 DEFAULT_MODEL : str = MAIN_MODEL
+FALLBACK_MODEL : str = os.getenv("OPENROUTER_FALLBACK_MODEL", openai41mini)  # Used when the primary model keeps failing
 
 BASE_SYSTEM_PROMPT : str = "You are a helpful AI assistant. "
 
+# Connection pool and timeout settings for the shared async client
+MAX_CONNECTIONS : int = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS : int = int(os.getenv("OPENROUTER_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY : float = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT : float = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10"))
+REQUEST_TIMEOUT : float = float(os.getenv("OPENROUTER_REQUEST_TIMEOUT", "120"))
+# Retries inside the SDK; 0 leaves them to the caller (llm_controller uses retry_policy.RetryPolicy)
+MAX_RETRIES : int = int(os.getenv("OPENROUTER_MAX_RETRIES", "0"))
+
+# Upper bound on chat requests in flight at once across all games in the process
+MAX_INFLIGHT_REQUESTS : int = int(os.getenv("OPENROUTER_MAX_INFLIGHT_REQUESTS", "16"))
+
+_shared_client : AsyncOpenAI | None = None
+_shared_client_loop : asyncio.AbstractEventLoop | None = None
+_request_semaphore : asyncio.Semaphore | None = None
+_request_semaphore_loop : asyncio.AbstractEventLoop | None = None
+
+# Per-model RPM/TPM budgets (see rate_limiter.py); unlimited unless configured
+rate_limiter : RateLimiter = RateLimiter.from_env()
+
+# Token usage reported by the provider, summed over all chat requests in the process
+usage_stats : Counter = Counter()
+
 
 def get_llm(
     base_url : str = BASE_URL,
@@ -45,23 +75,181 @@ def get_llm(
         )
 
 
-async def chat(prompt_str, model=os.getenv("OPENROUTER_MODEL", DEFAULT_MODEL)):
+def get_async_client() -> AsyncOpenAI:
+    """
+    Get the process-wide async client, creating it on first use.
+
+    All callers share one HTTP connection pool, so keep-alive connections (and
+    their TLS sessions) are reused across turns and games. The pool belongs to
+    the event loop that first used it, so await close_client() before that loop
+    ends; a new client is then built on the next loop.
+    """
+    global _shared_client, _shared_client_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if (
+        _shared_client is not None
+        and not _shared_client.is_closed()
+        and loop is not None
+        and _shared_client_loop not in (None, loop)
+    ):
+        # Its connections can only be closed from their own loop, which may be gone
+        raise RuntimeError("The shared client belongs to another event loop; await close_client() before that loop ends")
+    if _shared_client is None or _shared_client.is_closed():
+        _shared_client = AsyncOpenAI(
+            base_url=BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY") or str(None),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            max_retries=MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            ),
+        )
+        _shared_client_loop = loop
+    elif _shared_client_loop is None:
+        _shared_client_loop = loop
+    return _shared_client
+
+
+async def close_client():
+    """
+    Close the shared async client and its connection pool.
+    """
+    global _shared_client, _shared_client_loop
+    if _shared_client is not None:
+        await _shared_client.close()
+    _shared_client = None
+    _shared_client_loop = None
+
+
+def set_max_inflight_requests(limit : int) -> None:
+    """
+    Change the cap on concurrent chat requests. Takes effect for new requests.
+    """
+    global MAX_INFLIGHT_REQUESTS, _request_semaphore
+    MAX_INFLIGHT_REQUESTS = max(1, int(limit))
+    _request_semaphore = None
+
+
+def set_rate_limit(model : str, rpm : int = 0, tpm : int = 0) -> None:
+    """
+    Set the client-side requests-per-minute and tokens-per-minute budget for a model (0 = unlimited).
+    """
+    rate_limiter.set_limit(model, rpm, tpm)
+
+
+def _get_request_semaphore() -> asyncio.Semaphore:
+    global _request_semaphore, _request_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _request_semaphore is None or _request_semaphore_loop is not loop:
+        _request_semaphore = asyncio.Semaphore(MAX_INFLIGHT_REQUESTS)
+        _request_semaphore_loop = loop
+    return _request_semaphore
+
+
+def system_message(text : str, model : str = DEFAULT_MODEL) -> dict:
+    """
+    Build a system message whose text can be served from the provider's prompt cache.
+
+    OpenAI, Gemini and most other providers cache a repeated prompt prefix on their
+    own; Anthropic models only do so for content blocks marked with cache_control.
+    """
+    if model.startswith("anthropic/"):
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}],
+        }
+    return {"role": "system", "content": text}
+
+
+def record_usage(usage) -> None:
+    """
+    Add a response's usage block to usage_stats, splitting input tokens into cached and uncached.
+    """
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    tokens = {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "cached_prompt_tokens": cached,
+        "uncached_prompt_tokens": (usage.prompt_tokens or 0) - cached,
+        "completion_tokens": usage.completion_tokens or 0,
+    }
+    usage_stats["requests"] += 1
+    usage_stats.update(tokens)
+    # Also per turn, for the game log (see telemetry.py)
+    for name, value in tokens.items():
+        count(name, value)
+
+
+def usage_summary() -> str:
+    """
+    One-line report of input tokens served from the provider's prompt cache.
+    """
+    prompt_tokens = usage_stats["prompt_tokens"]
+    rate = usage_stats["cached_prompt_tokens"] / prompt_tokens * 100 if prompt_tokens else 0.0
+    return (
+        f"{prompt_tokens} input tokens ({usage_stats['cached_prompt_tokens']} cached, "
+        f"{usage_stats['uncached_prompt_tokens']} uncached, {rate:.1f}% cached), "
+        f"{usage_stats['completion_tokens']} output tokens over {usage_stats['requests']} requests"
+    )
+
+
+async def chat_completion(messages : list, model : str = DEFAULT_MODEL, **kwargs):
+    """
+    Send a list of chat messages and return the full completion, recording its token usage.
+
+    The request first waits its turn in the model's rate limiter queue, then for a free
+    in-flight slot. A 429 pauses the model's queue for the Retry-After period.
+    """
+    llm = get_async_client()
+    limiter = rate_limiter.for_model(model)
+    estimated = estimate_request_tokens(messages, kwargs.get("max_tokens"))
+    with timed("llm_queue"):
+        await limiter.acquire(estimated)
+        semaphore = _get_request_semaphore()
+        await semaphore.acquire()
+    try:
+        with timed("llm_network"):
+            response = await llm.chat.completions.create(messages=messages, model=model, **kwargs)
+    except RateLimitError as e:
+        retry_after = retry_after_seconds(e)
+        limiter.pause(1.0 if retry_after is None else retry_after)
+        raise
+    finally:
+        semaphore.release()
+    record_usage(response.usage)
+    limiter.settle(estimated, response.usage.total_tokens if response.usage else None)
+    return response
+
+
+async def chat(prompt_str, model=os.getenv("OPENROUTER_MODEL", DEFAULT_MODEL), system_prompt=None, response_format=None):
     """
     Send a chat message to the LLM.
-    
+
+    A system_prompt, if given, is sent first as a cacheable system message, so it
+    should hold the parts of the prompt that do not change between calls.
+    A response_format (e.g. {"type": "json_schema", ...}) asks for structured output.
     """
-    llm = get_llm()
     messages = [{"role": "user", "content": prompt_str}]
-    if isinstance(llm, AsyncOpenAI):
-        response = await llm.chat.completions.create(messages=messages, model=model)
-        return response.choices[0].message.content
-    else:
-        response = llm.chat.completions.create(messages=messages, model=model)
-        return response.choices[0].message.content
+    if system_prompt:
+        messages.insert(0, system_message(system_prompt, model))
+    kwargs = {"response_format": response_format} if response_format else {}
+    response = await chat_completion(messages, model=model, **kwargs)
+    return response.choices[0].message.content
 
 async def main():
     response = await chat(prompt_str="Hello, how can you assist me today?")
     print(response)
+    await close_client()
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,240 @@
+import json
+import re
+
+# Checks and repairs LLM action plans locally, so a sloppy response costs a few
+# microseconds instead of another round trip to the model.
+
+REINFORCE_COST = 3
+
+
+def action_plan_schema(location_names):
+    """
+    JSON schema for {"actions": [...]}, in the strict subset accepted by OpenAI-style structured outputs.
+    """
+    return {
+        'type': 'object',
+        'properties': {
+            'actions': {
+                'type': 'array',
+                'items': {
+                    'anyOf': [
+                        {
+                            'type': 'object',
+                            'properties': {
+                                'type': {'type': 'string', 'enum': ['move']},
+                                'unit_id': {'type': 'string'},
+                                'to': {'type': 'string', 'enum': list(location_names)},
+                            },
+                            'required': ['type', 'unit_id', 'to'],
+                            'additionalProperties': False,
+                        },
+                        {
+                            'type': 'object',
+                            'properties': {
+                                'type': {'type': 'string', 'enum': ['reinforce']},
+                                'location': {'type': 'string', 'enum': list(location_names)},
+                            },
+                            'required': ['type', 'location'],
+                            'additionalProperties': False,
+                        },
+                    ],
+                },
+            },
+        },
+        'required': ['actions'],
+        'additionalProperties': False,
+    }
+
+
+def action_plan_response_format(location_names):
+    """
+    The response_format argument requesting an action plan as structured output.
+    """
+    return {
+        'type': 'json_schema',
+        'json_schema': {'name': 'action_plan', 'strict': True, 'schema': action_plan_schema(location_names)},
+    }
+
+
+_FENCE_PATTERN = re.compile(r'```(?:json)?')
+
+
+def _balanced_object(text, start):
+    # Returns the end index of the JSON object starting at text[start], or None if it never closes
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def _salvage_actions(text):
+    # Collects every complete {...} action inside a truncated "actions" array
+    start = text.find('[', text.find('"actions"'))
+    if start < 0:
+        return None
+    actions = []
+    i = start
+    while True:
+        i = text.find('{', i)
+        if i < 0:
+            break
+        end = _balanced_object(text, i)
+        if end is None:
+            break
+        try:
+            actions.append(json.loads(text[i:end]))
+        except json.JSONDecodeError:
+            pass
+        i = end
+    return {'actions': actions}
+
+
+def parse_action_plan(response):
+    """
+    Reads an action plan out of a raw LLM response, tolerating markdown fences,
+    surrounding prose, trailing commas and truncated output.
+
+    :param response: str, the raw response from the LLM
+    :return: dict with an 'actions' list
+    :raises ValueError: if no action plan can be recovered
+    """
+    if not response:
+        raise ValueError("Empty response")
+    text = _FENCE_PATTERN.sub('', response)
+    start = text.find('{')
+    if start < 0:
+        raise ValueError("No JSON object in response")
+    end = _balanced_object(text, start)
+    if end is not None:
+        candidate = text[start:end]
+        for attempt in (candidate, re.sub(r',\s*([\]}])', r'\1', candidate)):
+            try:
+                plan = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(plan, dict) and isinstance(plan.get('actions'), list):
+                return plan
+            if isinstance(plan, list):
+                return {'actions': plan}
+    plan = _salvage_actions(text[start:])
+    if plan is None:
+        raise ValueError("Response does not contain an 'actions' list")
+    return plan
+
+
+def _location_key(name):
+    return re.sub(r'[^a-z]', '', name.lower())
+
+
+def _repair_location(name, locations_by_key):
+    if not isinstance(name, str):
+        return None
+    return locations_by_key.get(_location_key(name))
+
+
+def _repair_unit_id(team, unit_id, own_ids):
+    if unit_id in own_ids:
+        return unit_id
+    # Accept '3', 3, 'blue-3' or 'Blue 3' for 'Blue-3'
+    match = re.fullmatch(r'(?:([A-Za-z]+)[-_ ]?)?(\d+)', str(unit_id).strip())
+    if match and (match.group(1) is None or match.group(1).lower() == team.lower()):
+        candidate = f"{team}-{int(match.group(2))}"
+        if candidate in own_ids:
+            return candidate
+    return None
+
+
+def validate_actions(team, visible_state, actions, limit=None):
+    """
+    Checks a list of actions against the visible state and returns only those that can succeed.
+
+    Moves are replayed in order, so a unit may move more than once and reinforcements
+    may use locations captured earlier in the turn. Moves into a location with (possibly)
+    enemy units start a combat whose outcome is unknown; later actions depending on it
+    are kept and left for the engine to judge. Unit IDs and location names with small
+    formatting mistakes are repaired.
+
+    :param team: str, 'Blue' or 'Red'
+    :param visible_state: dict, as returned by Game.get_visible_state
+    :param actions: list of action dicts from the LLM
+    :param limit: int, maximum number of actions to keep (defaults to the opponent's unit count)
+    :return: tuple (list of valid actions, list of str problems found)
+    """
+    if limit is None:
+        limit = max(1, visible_state.get('opponent_unit_count', 1))
+    locations = visible_state['locations']
+    locations_by_key = {_location_key(name): name for name in locations}
+    positions = {u['id']: u['location'] for u in visible_state['units']}
+    control = {name: info['control'] for name, info in locations.items()}
+    contested = set()  # locations whose outcome this turn depends on a combat
+    resources = visible_state['resources']
+    valid, problems = [], []
+
+    for i, action in enumerate(actions):
+        if len(valid) >= limit:
+            problems.append(f"Dropped {len(actions) - i} action(s) over the limit of {limit}")
+            break
+        if not isinstance(action, dict):
+            problems.append(f"Not an action: {action!r}")
+            continue
+        action_type = action.get('type')
+        if isinstance(action_type, str):
+            action_type = action_type.strip().lower()
+        elif action_type is None:
+            action_type = 'move' if 'unit_id' in action else 'reinforce' if 'location' in action else None
+
+        if action_type == 'reinforce':
+            loc_name = _repair_location(action.get('location'), locations_by_key)
+            if loc_name is None:
+                problems.append(f"Unknown reinforce location: {action.get('location')!r}")
+            elif control.get(loc_name) != team and loc_name not in contested:
+                problems.append(f"Cannot reinforce {loc_name}: not controlled by {team}")
+            elif resources < REINFORCE_COST:
+                problems.append(f"Cannot afford reinforcement at {loc_name}: {resources} resources")
+            else:
+                resources -= REINFORCE_COST
+                valid.append({'type': 'reinforce', 'location': loc_name})
+
+        elif action_type == 'move':
+            unit_id = _repair_unit_id(team, action.get('unit_id'), positions)
+            dest = _repair_location(action.get('to'), locations_by_key)
+            if unit_id is None:
+                problems.append(f"Unit {action.get('unit_id')!r} does not belong to {team}")
+                continue
+            if dest is None:
+                problems.append(f"Unknown destination for {unit_id}: {action.get('to')!r}")
+                continue
+            src = positions[unit_id]
+            if src is not None and dest not in locations[src]['connections']:
+                problems.append(f"{dest} is not adjacent to {src} for {unit_id}")
+                continue
+            valid.append({'type': 'move', 'unit_id': unit_id, 'to': dest})
+            enemies = locations[dest]['enemy_units_count']
+            if src is None or dest in contested or enemies != 0:
+                # Combat (or a move after one): where the unit ends up is decided by the dice
+                positions[unit_id] = None
+                contested.add(dest)
+            else:
+                positions[unit_id] = dest
+                control[dest] = team
+
+        else:
+            problems.append(f"Unknown action type: {action_type!r}")
+
+    return valid, problems
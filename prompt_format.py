@@ -0,0 +1,105 @@
+import json
+import math
+
+# How the visible state is rendered into the prompt:
+#   'json'    - the full state dict, pretty-printed (the original format)
+#   'compact' - minified JSON without the static map (connections are already in
+#               the prompt), units as rows and locations as [control, own, enemy]
+PROMPT_FORMATS = ('json', 'compact')
+
+# Rough characters-per-token ratio for English/JSON text with GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+UNIT_COLUMNS = ['id', 'health', 'strength', 'location']
+LOCATION_COLUMNS = ['control', 'own_units', 'enemy_units']
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of input tokens a piece of text will cost.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def serialize_state(visible_state, prompt_format='compact'):
+    """
+    Renders a visible state for the prompt.
+
+    :param visible_state: dict, as returned by Game.get_visible_state
+    :param prompt_format: str, one of PROMPT_FORMATS
+    :return: tuple (str legend describing the layout, str serialized state)
+    """
+    if prompt_format == 'json':
+        return '', json.dumps(visible_state, indent=2)
+    if prompt_format != 'compact':
+        raise ValueError(f"Unknown prompt format '{prompt_format}'. Choose from: {', '.join(PROMPT_FORMATS)}")
+
+    units = visible_state['units']
+    unit_columns = list(UNIT_COLUMNS)
+    # Only spell out unit types once there is more than one kind
+    with_type = any(u['type'] != 'infantry' for u in units)
+    if with_type:
+        unit_columns.append('type')
+    rows = []
+    for u in units:
+        row = [u['id'], u['health'], u['strength'], u['location']]
+        if with_type:
+            row.append(u['type'])
+        rows.append(row)
+
+    locations = visible_state['locations']
+    resources = {info['resources'] for info in locations.values()}
+    location_columns = list(LOCATION_COLUMNS)
+    if len(resources) > 1:
+        location_columns.append('resources')
+    compact_locations = {}
+    for name, info in locations.items():
+        row = [info['control'], info['own_units_count'], info['enemy_units_count']]
+        if len(resources) > 1:
+            row.append(info['resources'])
+        compact_locations[name] = row
+
+    compact = {
+        'team': visible_state['team'],
+        'resources': visible_state['resources'],
+        'controlled_locations': visible_state['controlled_locations'],
+        'own_unit_count': visible_state['own_unit_count'],
+        'opponent_unit_count': visible_state['opponent_unit_count'],
+        'units': rows,
+        'locations': compact_locations,
+    }
+    legend = f"units rows are [{', '.join(unit_columns)}]"
+    if not with_type:
+        legend += " (all infantry)"
+    legend += f"; locations map name -> [{', '.join(location_columns)}], enemy_units null = not visible"
+    if len(resources) == 1:
+        legend += f"; every location yields {resources.pop()} resource per turn"
+    return legend, json.dumps(compact, separators=(',', ':'), ensure_ascii=False)
+
+
+def parse_state(text, adjacencies=None):
+    """
+    Reads a state rendered by serialize_state in either format back into visible-state form.
+    Connections are restored from adjacencies when the compact format dropped them.
+    """
+    state = json.loads(text)
+    if not state.get('units') or isinstance(state['units'][0], dict):
+        if isinstance(next(iter(state.get('locations', {}).values()), None), dict):
+            return state
+
+    units = []
+    for row in state['units']:
+        units.append({
+            'id': row[0], 'type': row[4] if len(row) > 4 else 'infantry',
+            'health': row[1], 'strength': row[2], 'location': row[3],
+        })
+    locations = {}
+    for name, row in state['locations'].items():
+        locations[name] = {
+            'control': row[0],
+            'resources': row[3] if len(row) > 3 else 1,
+            'connections': (adjacencies or {}).get(name, []),
+            'own_units_count': row[1],
+            'enemy_units_count': row[2],
+        }
+    return {**state, 'units': units, 'locations': locations}
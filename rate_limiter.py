@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from collections import Counter
+
+# Client-side requests-per-minute / tokens-per-minute limits per model, so many
+# concurrent games can run at a provider's real limit without 429 storms.
+#
+# Limits come from OPENROUTER_RPM / OPENROUTER_TPM (defaults for every model) and
+# OPENROUTER_RATE_LIMITS, e.g. "openai/gpt-4.1-mini=500:200000,anthropic/claude-sonnet-4=50:40000"
+# (rpm:tpm per model; 0 means unlimited).
+
+# Completion tokens assumed per request until the response reports the real usage
+EXPECTED_COMPLETION_TOKENS = 300
+
+# Buckets hold this many seconds' worth of budget, limiting bursts
+BURST_SECONDS = 10.0
+
+
+def estimate_request_tokens(messages, max_tokens=None):
+    """
+    Rough token cost of a chat request (about 4 characters per token), used before the real usage is known.
+    """
+    chars = 0
+    for m in messages:
+        content = m.get('content')
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(p.get('text', '')) for p in content if isinstance(p, dict))
+    return chars // 4 + (max_tokens or EXPECTED_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at rate_per_minute, holding at most capacity.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until amount can be taken (requests larger than the bucket wait for a full bucket).
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def give(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelRateLimiter:
+    """
+    RPM and TPM buckets for one model with a FIFO queue in front of them.
+
+    Callers are served strictly in arrival order, so no game can starve another
+    by retrying more aggressively.
+    """
+
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.queue_depth = 0
+        self.stats = Counter()
+        self._lock = None
+        self._loop = None
+
+    def _get_lock(self):
+        # asyncio.Lock wakes waiters first-in first-out; one per event loop
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    async def acquire(self, tokens):
+        """
+        Waits for this request's turn and budget, then spends one request and `tokens` tokens.
+
+        :return: float, seconds spent waiting
+        """
+        if not (self.requests or self.tokens or self.paused_until):
+            self.stats['requests'] += 1
+            return 0.0
+        start = time.monotonic()
+        self.queue_depth += 1
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+        try:
+            async with self._get_lock():
+                while True:
+                    now = time.monotonic()
+                    wait = self.paused_until - now
+                    if self.requests:
+                        wait = max(wait, self.requests.wait_time(1, now))
+                    if self.tokens:
+                        wait = max(wait, self.tokens.wait_time(tokens, now))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(min(tokens, self.tokens.capacity))
+        finally:
+            self.queue_depth -= 1
+        waited = time.monotonic() - start
+        self.stats['requests'] += 1
+        self.stats['wait_seconds'] += waited
+        self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+        if waited > 0.001:
+            self.stats['delayed'] += 1
+        return waited
+
+    def settle(self, estimated, actual):
+        """
+        Corrects the TPM bucket once the response reports how many tokens the request really used.
+        """
+        if self.tokens and actual is not None:
+            if actual > estimated:
+                self.tokens.take(actual - estimated)
+            else:
+                self.tokens.give(estimated - actual)
+
+    def pause(self, seconds):
+        """
+        Holds every queued request for this model, e.g. after the provider answered 429.
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.stats['pauses'] += 1
+
+
+def parse_rate_limits(spec):
+    """
+    Parses "model=rpm:tpm,model=rpm:tpm" into {model: (rpm, tpm)}.
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        model, _, values = item.rpartition('=')
+        rpm, _, tpm = values.partition(':')
+        limits[model] = (int(rpm or 0), int(tpm or 0))
+    return limits
+
+
+class RateLimiter:
+    """
+    One ModelRateLimiter per model name, created on first use.
+    """
+
+    def __init__(self, default_rpm=0, default_tpm=0, limits=None):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.limits = dict(limits or {})
+        self._models = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            default_rpm=int(os.getenv('OPENROUTER_RPM', '0')),
+            default_tpm=int(os.getenv('OPENROUTER_TPM', '0')),
+            limits=parse_rate_limits(os.getenv('OPENROUTER_RATE_LIMITS')),
+        )
+
+    def set_limit(self, model, rpm=0, tpm=0):
+        self.limits[model] = (rpm, tpm)
+        self._models.pop(model, None)
+
+    def for_model(self, model):
+        limiter = self._models.get(model)
+        if limiter is None:
+            rpm, tpm = self.limits.get(model, (self.default_rpm, self.default_tpm))
+            limiter = self._models[model] = ModelRateLimiter(rpm, tpm)
+        return limiter
+
+    def metrics(self):
+        """
+        Per-model request counts, queue depths and wait times.
+        """
+        return {
+            model: {
+                'rpm': limiter.rpm,
+                'tpm': limiter.tpm,
+                'queue_depth': limiter.queue_depth,
+                'max_queue_depth': limiter.stats['max_queue_depth'],
+                'requests': limiter.stats['requests'],
+                'delayed': limiter.stats['delayed'],
+                'avg_wait_seconds': limiter.stats['wait_seconds'] / limiter.stats['requests'] if limiter.stats['requests'] else 0.0,
+                'max_wait_seconds': limiter.stats['max_wait_seconds'],
+                'pauses': limiter.stats['pauses'],
+            }
+            for model, limiter in self._models.items()
+        }
+
+    def summary(self):
+        lines = []
+        for model, m in self.metrics().items():
+            if not (m['rpm'] or m['tpm'] or m['pauses']):
+                continue
+            lines.append(
+                f"{model}: {m['requests']} requests, {m['delayed']} delayed, "
+                f"avg wait {m['avg_wait_seconds']:.2f}s, max wait {m['max_wait_seconds']:.2f}s, "
+                f"max queue {m['max_queue_depth']}"
+            )
+        return '\n'.join(lines)
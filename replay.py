@@ -0,0 +1,288 @@
+import os
+
+# Frames are drawn off-screen; keep SDL from looking for a display or sound card
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pygame
+
+from game import replay_moves
+from game_log import GAMES_DIR, list_game_logs, read_game_log
+from visualization import GameVisualizer
+
+# Headless replays of logged games, rendered frame by frame with the same
+# GameVisualizer as main.py and written as PNG sequences or videos (through an
+# ffmpeg pipe). Work is split into chunks of turns spread over a process pool,
+# so archiving many games takes a fraction of their real-time playback.
+#
+# Logs whose header has a seed are re-simulated with the logged actions, which
+# reproduces the exact board and the move/combat animations. Other logs (and
+# any whose re-simulation disagrees with the logged states) are drawn from the
+# visible states: the board at the start of each turn, with enemy units the
+# acting team cannot see taken from the opponent's latest view.
+
+WIDTH, HEIGHT = 800, 600
+DEFAULT_FPS = 30
+DEFAULT_TURN_SECONDS = 2.0
+DEFAULT_CHUNK_TURNS = 20
+FORMATS = ('png', 'mp4')
+
+
+class VirtualClock:
+    """
+    Animation clock for captured frames, moved forward explicitly instead of in real time.
+    """
+
+    def __init__(self):
+        self.ms = 0.0
+
+    def __call__(self):
+        return int(self.ms)
+
+
+def log_game_id(path):
+    name = os.path.basename(path)
+    for suffix in ('.jsonl', '.json'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name[len('game_'):] if name.startswith('game_') else name
+
+
+def _opponent(team):
+    return 'Red' if team == 'Blue' else 'Blue'
+
+
+def _simulate(seed, moves, models):
+    # Returns one (state, results, team, messages) per move, or None if the
+    # simulated game stops matching the log
+    frames = []
+    try:
+        for game, move, results in replay_moves(moves, seed):
+            state = game.get_full_state()
+            for name, model in models.items():
+                if name in state['teams']:
+                    state['teams'][name]['model'] = model
+            messages = []
+            winner = game.check_victory()
+            if winner:
+                messages.append((f"🏆 {winner} WINS! 🏆", "success"))
+            frames.append((state, results, move['team'], messages))
+    except ValueError:
+        return None
+    return frames
+
+
+def _from_visible_states(moves, models):
+    last_seen = {'Blue': {}, 'Red': {}}  # team -> location -> unit count
+    resources = {'Blue': 0, 'Red': 0}
+    frames = []
+    for move in moves:
+        team = move['team']
+        opponent = _opponent(team)
+        visible = move['visible_state']
+        resources[team] = visible.get('resources', resources[team])
+        for loc, data in visible['locations'].items():
+            last_seen[team][loc] = data.get('own_units_count', 0)
+            if data.get('enemy_units_count') is not None:
+                last_seen[opponent][loc] = data['enemy_units_count']
+        state = {
+            'turn': move['turn'],
+            'teams': {t: {'model': models.get(t, t), 'resources': resources[t]} for t in ('Blue', 'Red')},
+            'locations': {
+                loc: {'control': data.get('control'), 'units': {t: last_seen[t].get(loc, 0) for t in ('Blue', 'Red')}}
+                for loc, data in visible['locations'].items()
+            },
+        }
+        messages = []
+        for action in move.get('actions', []):
+            if not isinstance(action, dict):
+                continue
+            if action.get('type') == 'move':
+                messages.append((f"{action.get('unit_id')} moving to {action.get('to')}", "move"))
+            elif action.get('type') == 'reinforce':
+                messages.append((f"{team} reinforces {action.get('location')}", "success"))
+        frames.append((state, [], team, messages))
+    return frames
+
+
+def replay_turns(header, moves):
+    """
+    Rebuilds what to show for each logged turn.
+
+    :return: tuple (mode, list of (state, results, team, messages)); mode is 'simulate' when
+             the game was re-simulated from its seed, otherwise 'snapshot'
+    """
+    models = (header or {}).get('models') or {}
+    if header and header.get('seed') is not None:
+        frames = _simulate(header['seed'], moves, models)
+        if frames is not None:
+            return 'simulate', frames
+    return 'snapshot', _from_visible_states(moves, models)
+
+
+def frames_per_turn(fps, turn_seconds):
+    return max(1, round(fps * turn_seconds))
+
+
+def _ffmpeg_writer(path, fps):
+    return subprocess.Popen(
+        ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+         '-s', f'{WIDTH}x{HEIGHT}', '-r', str(fps), '-i', '-',
+         '-c:v', 'libx264', '-pix_fmt', 'yuv420p', path],
+        stdin=subprocess.PIPE,
+    )
+
+
+def render_chunk(path, start, stop, out_dir, fmt='png', fps=DEFAULT_FPS, turn_seconds=DEFAULT_TURN_SECONDS):
+    """
+    Renders logged turns [start, stop) of one game.
+
+    PNG frames are numbered across the whole game, so chunks can be written independently;
+    for 'mp4' the chunk becomes one segment file for concat_segments.
+
+    :return: int, frames written
+    """
+    header, moves = read_game_log(path)
+    _, turns = replay_turns(header, moves)
+    per_turn = frames_per_turn(fps, turn_seconds)
+    frame_ms = 1000.0 / fps
+    turn_ms = per_turn * frame_ms
+
+    clock = VirtualClock()
+    visualizer = GameVisualizer(WIDTH, HEIGHT, headless=True, ticks=clock)
+
+    def show(index):
+        state, results, team, messages = turns[index]
+        visualizer.process_action_results(results, team)
+        for text, event_type in messages:
+            visualizer.add_event(text, event_type)
+
+    # Replay the effects of earlier turns that are still on screen when this chunk starts
+    # (event log lines outlast every animation)
+    for index in range(start):
+        if (start - index) * turn_ms <= visualizer.event_display_time:
+            clock.ms = index * turn_ms
+            show(index)
+
+    game_dir = os.path.join(out_dir, log_game_id(path))
+    writer = None
+    if fmt == 'mp4':
+        os.makedirs(game_dir + '.parts', exist_ok=True)
+        writer = _ffmpeg_writer(os.path.join(game_dir + '.parts', f'part_{start:05d}.mp4'), fps)
+    else:
+        os.makedirs(game_dir, exist_ok=True)
+
+    written = 0
+    try:
+        for index in range(start, min(stop, len(turns))):
+            clock.ms = index * turn_ms
+            show(index)
+            state = turns[index][0]
+            for frame in range(per_turn):
+                clock.ms = index * turn_ms + frame * frame_ms
+                visualizer.draw_state(state)
+                if writer:
+                    writer.stdin.write(pygame.image.tobytes(visualizer.screen, 'RGB'))
+                else:
+                    pygame.image.save(visualizer.screen, os.path.join(game_dir, f'frame_{index * per_turn + frame:06d}.png'))
+                written += 1
+    finally:
+        if writer:
+            writer.stdin.close()
+            if writer.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed while encoding {path} turns {start}-{stop}")
+    return written
+
+
+def concat_segments(path, out_dir):
+    """
+    Joins a game's mp4 segments (in turn order) into <out_dir>/<game id>.mp4 and removes them.
+    """
+    game_dir = os.path.join(out_dir, log_game_id(path))
+    parts_dir = game_dir + '.parts'
+    parts = sorted(name for name in os.listdir(parts_dir) if name.endswith('.mp4'))
+    list_path = os.path.join(parts_dir, 'parts.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.writelines(f"file '{name}'\n" for name in parts)
+    subprocess.run(['ffmpeg', '-loglevel', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+                    '-c', 'copy', game_dir + '.mp4'], check=True)
+    shutil.rmtree(parts_dir)
+    return game_dir + '.mp4'
+
+
+def render_games(paths, out_dir='recordings', fmt='png', fps=DEFAULT_FPS, turn_seconds=DEFAULT_TURN_SECONDS,
+                 chunk_turns=DEFAULT_CHUNK_TURNS, processes=None, on_chunk=None):
+    """
+    Renders every game in `paths`, split into chunks of chunk_turns turns across a process pool.
+
+    :param fmt: 'png' for frame sequences in <out_dir>/<game id>/, 'mp4' for <out_dir>/<game id>.mp4 (needs ffmpeg)
+    :param processes: worker processes (default: CPU count); 1 renders everything in this process
+    :param on_chunk: optional callback (path, start, stop, frames) called as chunks finish
+    :return: int, total frames written
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    if fmt == 'mp4' and shutil.which('ffmpeg') is None:
+        raise RuntimeError("ffmpeg was not found on PATH; install it or use --format png")
+
+    jobs = []
+    for path in paths:
+        turns = len(read_game_log(path)[1])
+        jobs += [(path, start, min(start + chunk_turns, turns)) for start in range(0, turns, chunk_turns)]
+    remaining = {path: sum(1 for job in jobs if job[0] == path) for path in paths}
+    total = 0
+
+    def finished(job, frames):
+        nonlocal total
+        path, start, stop = job
+        total += frames
+        if on_chunk:
+            on_chunk(path, start, stop, frames)
+        remaining[path] -= 1
+        if fmt == 'mp4' and remaining[path] == 0:
+            concat_segments(path, out_dir)
+
+    if processes == 1:
+        for job in jobs:
+            finished(job, render_chunk(*job, out_dir, fmt, fps, turn_seconds))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(render_chunk, *job, out_dir, fmt, fps, turn_seconds): job for job in jobs}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render logged games to PNG frames or video without a display")
+    parser.add_argument("logs", nargs="*", help=f"game logs to render (default: every log in {GAMES_DIR}/)")
+    parser.add_argument("--out", default="recordings", help="output directory")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--turn-seconds", type=float, default=DEFAULT_TURN_SECONDS, help="screen time per turn")
+    parser.add_argument("--chunk-turns", type=int, default=DEFAULT_CHUNK_TURNS, help="turns per work item")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    paths = args.logs or list_game_logs()
+    if not paths:
+        parser.error(f"no game logs found in {GAMES_DIR}/")
+
+    def progress(path, start, stop, frames):
+        print(f"{log_game_id(path)} turns {start + 1}-{stop}: {frames} frames")
+
+    start = time.time()
+    total = render_games(paths, out_dir=args.out, fmt=args.format, fps=args.fps, turn_seconds=args.turn_seconds,
+                         chunk_turns=args.chunk_turns, processes=args.processes, on_chunk=progress)
+    elapsed = time.time() - start
+    print(f"\n🎬 Rendered {len(paths)} games, {total} frames in {elapsed:.1f}s ({total / elapsed:.0f} frames/s) to {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+
+
+def canonical_state(visible_state):
+    """
+    Serializes a visible state so that equal states always give the same string.
+    """
+    return json.dumps(visible_state, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def make_cache_key(team, model, visible_state, prompt_version):
+    """
+    Returns the cache key for one LLM turn: a hash of (team, model, canonical visible state, prompt version).
+    """
+    raw = '\x1f'.join([team, model, str(prompt_version), canonical_state(visible_state)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of raw LLM responses: an in-memory LRU in front of an optional
+    SQLite file that persists across runs.
+
+    Entries older than ttl_seconds (in either tier) are treated as misses and deleted;
+    when the file holds more than max_disk_entries, the least recently used tenth is
+    evicted.
+    Hit and miss counts are kept in `stats`. The last-used times of disk hits are
+    written in batches (with the next put, every touch_batch hits and on close), so
+    a lookup from the event loop does not wait on a SQLite commit.
+    """
+
+    def __init__(self, path=None, max_memory_entries=4096, ttl_seconds=None, max_disk_entries=200_000,
+                 touch_batch=256, busy_timeout=30.0):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.touch_batch = touch_batch
+        self.stats = Counter()
+        self._memory = OrderedDict()  # key -> (response, created)
+        self._db = None
+        self._disk_entries = 0
+        self._touched = {}  # key -> last-used time not yet written to disk
+        if path:
+            # Several processes may share the file (see tournament.py): WAL lets readers run
+            # alongside a writer, and writers wait up to busy_timeout for each other
+            self._db = sqlite3.connect(path, timeout=busy_timeout)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY, response TEXT NOT NULL,'
+                ' created REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+            self._db.commit()
+            self._disk_entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def get(self, key):
+        """
+        Returns the cached response for a key, or None on a miss.
+        """
+        now = time.time()
+        if key in self._memory:
+            response, created = self._memory[key]
+            if not self._expired(created, now):
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return response
+            del self._memory[key]
+            if self._db is None:
+                self.stats['expired'] += 1
+            # Otherwise the disk row decides: another process may have stored a fresh one
+
+        if self._db is not None:
+            row = self._db.execute('SELECT response, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row:
+                response, created = row
+                if self._expired(created, now):
+                    self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self._db.commit()
+                    self._disk_entries -= 1
+                    self.stats['expired'] += 1
+                else:
+                    self._touched[key] = now
+                    if len(self._touched) >= self.touch_batch:
+                        self._write_touched()
+                        self._db.commit()
+                    self._remember(key, response, created)
+                    self.stats['disk_hits'] += 1
+                    return response
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key, response):
+        """
+        Stores a response in both tiers.
+        """
+        now = time.time()
+        self._remember(key, response, now)
+        self.stats['stores'] += 1
+        if self._db is None:
+            return
+        existed = self._db.execute('SELECT 1 FROM responses WHERE key = ?', (key,)).fetchone()
+        self._db.execute(
+            'INSERT OR REPLACE INTO responses (key, response, created, last_used) VALUES (?, ?, ?, ?)',
+            (key, response, now, now),
+        )
+        if not existed:
+            self._disk_entries += 1
+        self._touched.pop(key, None)
+        self._write_touched()
+        if self._disk_entries > self.max_disk_entries:
+            self._evict_disk()
+        self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _remember(self, key, response, created):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats['memory_evictions'] += 1
+
+    def _write_touched(self):
+        # Caller commits
+        if self._touched:
+            self._db.executemany('UPDATE responses SET last_used = ? WHERE key = ?',
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def _evict_disk(self):
+        excess = self._disk_entries - self.max_disk_entries + max(1, self.max_disk_entries // 10)
+        self._db.execute(
+            'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)',
+            (excess,),
+        )
+        self._disk_entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        self.stats['disk_evictions'] += excess
+
+    @property
+    def hits(self):
+        # 'coalesced' counts lookups that missed but were answered by an identical request in flight
+        return self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['coalesced']
+
+    @property
+    def misses(self):
+        return self.stats['misses'] - self.stats['coalesced']
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"{self.hits} hits / {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self):
+        if self._db is not None:
+            self._write_touched()
+            self._db.commit()
+            self._db.close()
+            self._db = None
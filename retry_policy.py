@@ -0,0 +1,127 @@
+import asyncio
+import os
+import random
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import openai
+
+# Failures worth switching to the fallback model for: the provider, not the prompt, is the problem
+PROVIDER_REASONS = ('rate_limit', 'server_error', 'timeout', 'connection')
+
+
+def classify_error(exc):
+    """
+    Names the kind of failure behind an exception raised while getting an action plan.
+
+    :return: str, one of 'rate_limit', 'server_error', 'timeout', 'connection',
+             'client_error', 'parse' or 'other'
+    """
+    if isinstance(exc, openai.RateLimitError):
+        return 'rate_limit'
+    if isinstance(exc, (openai.APITimeoutError, asyncio.TimeoutError)):
+        return 'timeout'
+    if isinstance(exc, openai.APIConnectionError):
+        return 'connection'
+    if isinstance(exc, openai.APIStatusError):
+        return 'server_error' if exc.status_code >= 500 else 'client_error'
+    if isinstance(exc, ValueError):
+        return 'parse'
+    return 'other'
+
+
+def retry_after_seconds(exc):
+    """
+    Reads the server's requested wait from a Retry-After (or retry-after-ms) header, if any.
+    """
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Decides whether, when and against which model to retry a failed LLM request.
+
+    - 429: wait as long as Retry-After asks (capped at max_retry_after), else back off
+    - 5xx, timeouts, connection errors: exponential backoff with full jitter
+    - unparseable responses: ask again at once (local repair has already been tried)
+    - other 4xx: give up
+    After fallback_after consecutive provider failures the request moves to
+    fallback_model. No attempt starts once the per-turn deadline would be passed.
+    Retries are counted per reason in `stats`.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0, max_retry_after=60.0,
+                 turn_deadline=90.0, fallback_model=None, fallback_after=2, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.turn_deadline = turn_deadline
+        self.fallback_model = fallback_model
+        self.fallback_after = fallback_after
+        self.rng = rng or random.Random()
+        self.stats = Counter()
+
+    @classmethod
+    def from_env(cls, fallback_model=None):
+        return cls(
+            max_attempts=int(os.getenv('HARCO_RETRY_ATTEMPTS', '4')),
+            base_delay=float(os.getenv('HARCO_RETRY_BASE_DELAY', '0.5')),
+            max_delay=float(os.getenv('HARCO_RETRY_MAX_DELAY', '20')),
+            turn_deadline=float(os.getenv('HARCO_TURN_DEADLINE', '90')),
+            fallback_model=fallback_model,
+        )
+
+    def backoff(self, attempt):
+        """
+        Full-jitter exponential backoff for the given (1-based) failed attempt.
+        """
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def delay(self, reason, attempt, exc=None):
+        """
+        Seconds to wait before the next attempt, or None to stop retrying.
+        """
+        if attempt >= self.max_attempts or reason == 'client_error':
+            return None
+        if reason == 'parse':
+            return 0.0
+        if reason == 'rate_limit':
+            requested = retry_after_seconds(exc)
+            if requested is not None:
+                # A little jitter so games told to wait the same time don't return in lockstep
+                return min(requested, self.max_retry_after) + self.rng.uniform(0, self.base_delay / 2)
+        return self.backoff(attempt)
+
+    def next_model(self, primary, consecutive_provider_failures):
+        """
+        Model for the next attempt: the fallback once the primary keeps failing on the provider side.
+        """
+        if self.fallback_model and self.fallback_model != primary and consecutive_provider_failures >= self.fallback_after:
+            return self.fallback_model
+        return primary
+
+    def summary(self):
+        if not self.stats:
+            return "no retries"
+        return ', '.join(f"{reason}={count}" for reason, count in sorted(self.stats.items()))
@@ -0,0 +1,130 @@
+import math
+from statistics import NormalDist
+
+# Early stopping for Blue-vs-Red comparisons. Only decisive games inform the
+# win rate p = P(Blue wins | someone wins); draws just use up budget.
+
+
+def wilson_interval(wins, n, confidence=0.95):
+    """
+    Wilson score interval for a binomial proportion.
+
+    :return: tuple (low, high); (0.0, 1.0) when n is 0
+    """
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = wins / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class SequentialTest:
+    """
+    Decides after every game whether Blue and Red differ, are practically tied, or
+    whether to keep playing.
+
+    method='sprt' (default): two-sided sequential probability ratio test (Sobel
+    and Wald) made of two one-sided SPRTs, p = 0.5 against p = 0.5 + delta (is
+    Blue stronger?) and p = 0.5 against p = 0.5 - delta (is Red stronger?), each
+    at error rates alpha / 2 and beta. The first to accept its alternative names
+    the winner; if both accept p = 0.5 the teams are tied. It is built for
+    looking after every game and typically needs far fewer games than a
+    fixed-size test.
+
+    method='wilson': stop when the Wilson interval for p excludes 0.5. Checking
+    a fixed-confidence interval after every game inflates the false-positive
+    rate above alpha, so prefer 'sprt' unless a large min_games is used.
+
+    Both methods also stop with 'tie' when the interval lies inside
+    [0.5 - delta, 0.5 + delta].
+
+    Either way the test stops with 'budget' after max_games games.
+    """
+
+    def __init__(self, method='sprt', alpha=0.05, beta=0.05, delta=0.1, min_games=10, max_games=200):
+        if method not in ('wilson', 'sprt'):
+            raise ValueError(f"Unknown method '{method}'. Choose from: wilson, sprt")
+        self.method = method
+        self.alpha = alpha
+        self.beta = beta
+        self.delta = delta
+        self.min_games = min_games
+        self.max_games = max_games
+        self.blue_wins = 0
+        self.red_wins = 0
+        self.draws = 0
+        self.decision = None
+        # Log-likelihood ratios of "Blue stronger" and "Red stronger" against p = 0.5;
+        # None once that side has accepted p = 0.5
+        self.llr = {'blue': 0.0, 'red': 0.0}
+        self._llr_steps = {
+            'blue': (math.log((0.5 + delta) / 0.5), math.log((0.5 - delta) / 0.5)),
+            'red': (math.log((0.5 - delta) / 0.5), math.log((0.5 + delta) / 0.5)),
+        }
+        self.upper = math.log((1 - beta) / (alpha / 2))
+        self.lower = math.log(beta / (1 - alpha / 2))
+        self.confidence = 1 - alpha
+
+    @property
+    def games(self):
+        return self.blue_wins + self.red_wins + self.draws
+
+    @property
+    def decisive(self):
+        return self.blue_wins + self.red_wins
+
+    def interval(self):
+        return wilson_interval(self.blue_wins, self.decisive, self.confidence)
+
+    def update(self, winner):
+        """
+        Records one result ('Blue', 'Red' or 'Draw') and returns the decision so far:
+        'blue', 'red', 'tie', 'budget', or None to keep playing.
+        """
+        if self.decision:
+            return self.decision
+        if winner in ('Blue', 'Red'):
+            if winner == 'Blue':
+                self.blue_wins += 1
+            else:
+                self.red_wins += 1
+            for side, (on_blue, on_red) in self._llr_steps.items():
+                if self.llr[side] is not None:
+                    self.llr[side] += on_blue if winner == 'Blue' else on_red
+        else:
+            self.draws += 1
+
+        if self.games >= self.min_games:
+            low, high = self.interval()
+            if low >= 0.5 - self.delta and high <= 0.5 + self.delta:
+                self.decision = 'tie'
+            elif self.method == 'wilson':
+                if low > 0.5:
+                    self.decision = 'blue'
+                elif high < 0.5:
+                    self.decision = 'red'
+            else:
+                for side, llr in self.llr.items():
+                    if llr is not None and llr >= self.upper:
+                        self.decision = side
+                        break
+                    if llr is not None and llr <= self.lower:
+                        self.llr[side] = None
+                if self.decision is None and all(llr is None for llr in self.llr.values()):
+                    self.decision = 'tie'
+        if self.decision is None and self.games >= self.max_games:
+            self.decision = 'budget'
+        return self.decision
+
+    def summary(self):
+        low, high = self.interval()
+        rate = self.blue_wins / self.decisive if self.decisive else 0.0
+        text = (f"Blue {self.blue_wins} / Red {self.red_wins} / Draws {self.draws} - "
+                f"Blue win rate {rate:.1%} [{low:.1%}, {high:.1%}]")
+        if self.method == 'sprt':
+            llrs = ', '.join(f"{side} {'accepted p=0.5' if llr is None else f'{llr:+.2f}'}" for side, llr in self.llr.items())
+            text += f", LLR {llrs} (bounds {self.lower:.2f}, {self.upper:.2f})"
+        return text
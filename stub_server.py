@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from controllers import POLICIES
+from game import CONNECTIONS
+from prompt_format import parse_state
+
+# Local stand-in for OpenRouter's /v1/chat/completions, for load-testing the LLM
+# pipeline offline. Point the client at it with
+#     OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1
+
+STATE_PATTERN = re.compile(r'Current Visible State[^\n]*:\s*(\{.*\})\s*Plan your actions', re.DOTALL)
+TEAM_PATTERN = re.compile(r'commander of the (\w+) Team', re.IGNORECASE)
+
+REASON_PHRASES = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 429: 'Too Many Requests',
+    500: 'Internal Server Error', 502: 'Bad Gateway', 503: 'Service Unavailable',
+}
+
+
+@dataclass
+class StubConfig:
+    host: str = '127.0.0.1'
+    port: int = 8765
+    latency: str = 'fixed:0'  # fixed:S | uniform:LO,HI | lognormal:MU,SIGMA (seconds)
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_malformed: float = 0.0
+    rate_markdown: float = 0.0
+    retry_after: float = 1.0
+    policy: str = 'greedy'  # a controllers.POLICIES name, or 'empty'
+    script: list = field(default_factory=list)  # canned response bodies, replayed in order
+    seed: int | None = None
+
+
+def parse_latency(spec):
+    """
+    Parses a latency spec into a function rng -> seconds.
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda rng: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+def prompt_text(messages):
+    """
+    Joins the text of chat messages, whether content is a string or a list of parts.
+    """
+    parts = []
+    for m in messages:
+        content = m.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(p.get('text', '') for p in content if isinstance(p, dict))
+    return '\n'.join(parts)
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class StubServer:
+    """
+    Minimal HTTP/1.1 server speaking the OpenAI chat completions protocol.
+
+    Responses are legal action plans produced by a local policy from the visible
+    state embedded in the prompt (or taken from a script), delayed by the
+    configured latency distribution and replaced by injected errors at the
+    configured rates.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or StubConfig()
+        self.rng = random.Random(self.config.seed)
+        self.policy_rng = random.Random(self.config.seed)
+        self.latency = parse_latency(self.config.latency)
+        self.stats = Counter()
+        self._script_pos = 0
+        self._seen_prefixes = set()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.config.host}:{self.config.port}/v1'
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.config.host, self.config.port)
+        if self.config.port == 0:
+            self.config.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, extra_headers, payload = await self._dispatch(method, path, body)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                head = [f'HTTP/1.1 {status} {REASON_PHRASES.get(status, "")}',
+                        'Content-Type: application/json',
+                        f'Content-Length: {len(data)}']
+                head += [f'{k}: {v}' for k, v in extra_headers.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        path = path.split('?', 1)[0].rstrip('/')
+        if method == 'GET' and path.endswith('/models'):
+            return 200, {}, {'object': 'list', 'data': [{'id': name, 'object': 'model'} for name in POLICIES]}
+        if method == 'GET' and path.endswith('/stats'):
+            return 200, {}, dict(self.stats)
+        if method != 'POST' or not path.endswith('/chat/completions'):
+            return 404, {}, {'error': {'message': f'No route for {method} {path}'}}
+
+        self.stats['requests'] += 1
+        await asyncio.sleep(self.latency(self.rng))
+
+        roll = self.rng.random()
+        if roll < self.config.rate_429:
+            self.stats['429'] += 1
+            return 429, {'Retry-After': f'{self.config.retry_after:g}'}, {
+                'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_exceeded', 'code': 429}}
+        roll -= self.config.rate_429
+        if roll < self.config.rate_5xx:
+            status = self.rng.choice([500, 502, 503])
+            self.stats[str(status)] += 1
+            return status, {}, {'error': {'message': 'Injected upstream failure', 'code': status}}
+
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError:
+            return 400, {}, {'error': {'message': 'Request body is not JSON'}}
+        prompt = prompt_text(request.get('messages', []))
+        content = self._content_for(prompt)
+
+        roll = self.rng.random()
+        if roll < self.config.rate_malformed:
+            self.stats['malformed'] += 1
+            content = content[:max(1, len(content) // 2)]
+        elif roll < self.config.rate_malformed + self.config.rate_markdown:
+            self.stats['markdown'] += 1
+            content = f'Here is my plan:\n```json\n{content}\n```'
+        self.stats['ok'] += 1
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        # Mimic provider prompt caching: a system message seen before counts as cached input
+        prefix = prompt_text([m for m in request.get('messages', []) if m.get('role') == 'system'])
+        cached_tokens = 0
+        if prefix:
+            if prefix in self._seen_prefixes:
+                cached_tokens = estimate_tokens(prefix)
+            self._seen_prefixes.add(prefix)
+        return 200, {}, {
+            'id': f'stub-{self.stats["requests"]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+                'prompt_tokens_details': {'cached_tokens': cached_tokens},
+            },
+        }
+
+    def _content_for(self, prompt):
+        if self.config.script:
+            content = self.config.script[self._script_pos % len(self.config.script)]
+            self._script_pos += 1
+            return content if isinstance(content, str) else json.dumps(content)
+
+        policy = POLICIES.get(self.config.policy)
+        state_match = STATE_PATTERN.search(prompt)
+        team_match = TEAM_PATTERN.search(prompt)
+        if policy is None or not state_match or not team_match:
+            return json.dumps({'actions': []})
+        try:
+            visible_state = parse_state(state_match.group(1), CONNECTIONS)
+        except (json.JSONDecodeError, IndexError, KeyError, TypeError):
+            return json.dumps({'actions': []})
+        return json.dumps({'actions': policy(team_match.group(1).capitalize(), visible_state, self.policy_rng)})
+
+
+def load_script(path):
+    """
+    Reads canned responses from a file with one response per line (JSON or raw text).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server for offline load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S, uniform:LO,HI or lognormal:MU,SIGMA (seconds)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction answered with 500/502/503")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="fraction with truncated JSON content")
+    parser.add_argument("--rate-markdown", type=float, default=0.0, help="fraction with markdown-wrapped JSON")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--policy", default="greedy", choices=list(POLICIES) + ['empty'])
+    parser.add_argument("--script", default=None, help="file of canned responses, one per line")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        host=args.host, port=args.port, latency=args.latency,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+        rate_malformed=args.rate_malformed, rate_markdown=args.rate_markdown,
+        retry_after=args.retry_after, policy=args.policy,
+        script=load_script(args.script) if args.script else [], seed=args.seed,
+    )
+    server = StubServer(config)
+    print(f"Stub LLM server listening on {server.base_url}")
+    try:
+        await server.serve_forever()
+    finally:
+        print(f"Stats: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,184 @@
+import contextvars
+import math
+import os
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Timings and token counts for the game loop.
+#
+# Durations go to a process-wide Telemetry registry (for percentiles and the
+# Prometheus exporter) and, while a turn is being played, to that turn's
+# TurnRecorder, which the runners write into the game log. The current turn is
+# held in a context variable, so concurrent games in one event loop each record
+# into their own turn.
+
+# Samples kept per metric for percentiles; count and sum stay exact
+MAX_SAMPLES = 20_000
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Telemetry:
+    """
+    Duration summaries and counters for the whole process.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = {}
+        self.sums = Counter()
+        self.counts = Counter()
+        self.counters = Counter()
+
+    def observe(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.max_samples)
+        samples.append(seconds)
+        self.sums[name] += seconds
+        self.counts[name] += 1
+
+    def increment(self, name, amount=1):
+        self.counters[name] += amount
+
+    def percentiles(self, name, ps=PERCENTILES):
+        values = sorted(self.samples.get(name, ()))
+        return {p: percentile(values, p) for p in ps}
+
+    def summary_rows(self, ps=PERCENTILES):
+        """
+        (name, count, mean, {p: value}) for every timed metric, in seconds.
+        """
+        return [
+            (name, self.counts[name], self.sums[name] / self.counts[name], self.percentiles(name, ps))
+            for name in sorted(self.samples)
+        ]
+
+    def reset(self):
+        self.samples.clear()
+        self.sums.clear()
+        self.counts.clear()
+        self.counters.clear()
+
+
+telemetry = Telemetry()
+
+
+class TurnRecorder:
+    """
+    Timings (seconds, summed per name) and counters for one turn of one game.
+    """
+
+    def __init__(self):
+        self.timings = Counter()
+        self.counters = Counter()
+
+    def as_dict(self):
+        """
+        JSON-ready form for the game log, with timings in milliseconds.
+        """
+        record = {'timings_ms': {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}}
+        if self.counters:
+            record.update(self.counters)
+        return record
+
+
+_current_turn = contextvars.ContextVar('turn_recorder', default=None)
+
+
+def start_turn():
+    """
+    Starts recording a turn in the current context and returns its TurnRecorder.
+    """
+    recorder = TurnRecorder()
+    _current_turn.set(recorder)
+    return recorder
+
+
+def current_turn():
+    return _current_turn.get()
+
+
+def record(name, seconds):
+    """
+    Adds a duration to the process-wide summary and to the current turn, if any.
+    """
+    telemetry.observe(name, seconds)
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.timings[name] += seconds
+
+
+def count(name, amount=1):
+    """
+    Adds to a counter, both process-wide and for the current turn.
+    """
+    telemetry.increment(name, amount)
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.counters[name] += amount
+
+
+@contextmanager
+def timed(name):
+    """
+    Times the enclosed block under `name`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def _metric_name(name):
+    return 'harco_' + ''.join(ch if ch.isalnum() else '_' for ch in name)
+
+
+def prometheus_text(extra_counters=None, gauges=None):
+    """
+    Renders the registry in the Prometheus text exposition format: one summary per
+    timed metric (with quantiles), plus counters and gauges.
+
+    :param extra_counters: dict name -> value of counters kept elsewhere (e.g. retry reasons)
+    :param gauges: dict name -> value
+    :return: str
+    """
+    lines = []
+    for name, _, _, quantiles in telemetry.summary_rows():
+        metric = _metric_name(name) + '_seconds'
+        lines.append(f'# TYPE {metric} summary')
+        for p, value in quantiles.items():
+            lines.append(f'{metric}{{quantile="{p / 100:g}"}} {value:.6f}')
+        lines.append(f'{metric}_sum {telemetry.sums[name]:.6f}')
+        lines.append(f'{metric}_count {telemetry.counts[name]}')
+    for name, value in sorted({**telemetry.counters, **(extra_counters or {})}.items()):
+        metric = _metric_name(name) + '_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value}')
+    for name, value in sorted((gauges or {}).items()):
+        metric = _metric_name(name)
+        lines.append(f'# TYPE {metric} gauge')
+        lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, extra_counters=None, gauges=None):
+    """
+    Writes prometheus_text to path atomically, for node_exporter's textfile collector or a file scrape.
+    """
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(extra_counters, gauges))
+    os.replace(tmp, path)
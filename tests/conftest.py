@@ -0,0 +1,6 @@
+import os
+
+# Keep the background debug log and pygame quiet while testing
+os.environ.setdefault('HARCO_DEBUG_LOG', 'off')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+import numpy as np
+
+from analytics import GameIndex, update_index
+from batch_runner import BatchGameRunner
+from game_log import list_game_logs
+
+
+def play_games(numbers, master_seed=5):
+    runner = BatchGameRunner(log_games=True, controllers={'Blue': 'greedy', 'Red': 'random'}, master_seed=master_seed)
+    for n in numbers:
+        asyncio.run(runner.run_single_game(n))
+
+
+def load(games_dir):
+    """
+    Returns the index as {table: {column: array}}, with rows in a canonical order
+    (update_index appends new games, so a rebuild numbers them differently).
+    """
+    index = GameIndex.open(games_dir, update=False)
+    order = np.argsort(index.games['file'], kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    tables = {'games': {name: column[order] for name, column in index.games.items()}}
+    for table in ('turns', 'actions'):
+        columns = dict(getattr(index, table))
+        columns['game'] = rank[columns['game']]
+        rows = np.lexsort([columns[name] for name in sorted(columns, reverse=True) if columns[name].ndim == 1])
+        tables[table] = {name: column[rows] for name, column in columns.items()}
+    return tables
+
+
+def test_incremental_update_matches_a_rebuild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    play_games([1, 2, 3])
+    first_logs = list_game_logs('games')
+    assert update_index('games') == {'added': 3, 'removed': 0, 'games': 3}
+    assert update_index('games') == {'added': 0, 'removed': 0, 'games': 3}
+
+    play_games([4, 5])
+    os.remove(first_logs[0])
+    assert update_index('games') == {'added': 2, 'removed': 1, 'games': 4}
+    incremental = load('games')
+
+    assert update_index('games', rebuild=True)['games'] == 4
+    rebuilt = load('games')
+    for table, columns in incremental.items():
+        for name, column in columns.items():
+            np.testing.assert_array_equal(column, rebuilt[table][name], err_msg=f'{table}.{name}')
+    assert len(rebuilt['turns']['turn']) > 0
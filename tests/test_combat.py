@@ -0,0 +1,41 @@
+import pytest
+
+import combat
+from combat import combat_odds, simulate_combat
+
+MATCHUPS = [
+    ([(3, 1)], [(3, 1)]),
+    ([(3, 1)] * 3, [(3, 1)] * 2),
+    ([(2, 1), (3, 2)], [(1, 1), (3, 1), (3, 1)]),
+    ([(1, 1)], [(3, 1)] * 4),
+    ([(3, 1)] * 4, [(3, 1)] * 4),
+]
+
+
+@pytest.mark.parametrize('attackers, defenders', MATCHUPS)
+def test_exact_odds_agree_with_simulation(attackers, defenders):
+    exact = combat_odds(attackers, defenders)
+    simulated = simulate_combat(attackers, defenders, n=40_000, seed=1)
+    assert exact.unresolved == 0.0
+    assert exact.attacker_win + exact.defender_win == pytest.approx(1.0)
+    assert exact.attacker_win == pytest.approx(simulated.attacker_win, abs=0.015)
+    assert exact.expected_attackers_left == pytest.approx(simulated.expected_attackers_left, abs=0.05)
+    assert exact.expected_defenders_left == pytest.approx(simulated.expected_defenders_left, abs=0.05)
+
+
+def test_solved_states_are_shared_between_fights(monkeypatch):
+    monkeypatch.setattr(combat, '_solved', {})
+    small = combat_odds([(3, 1)], [(3, 1)] * 2)
+    solved = len(combat._solved)
+    combat_odds([(3, 1)], [(3, 1)] * 3)
+    # The bigger fight passes through the smaller one, which is already solved
+    assert (((3, 1),), ((3, 1), (3, 1))) in combat._solved
+    assert len(combat._solved) > solved
+    monkeypatch.setattr(combat, '_solved', {})
+    assert combat_odds([(3, 1)], [(3, 1)] * 2) == small
+
+
+def test_big_fights_are_simulated():
+    odds = combat_odds([(3, 1)], [(3, 1)] * 200)
+    assert odds.defender_win == 1.0
+    assert odds == combat_odds([(3, 1)], [(3, 1)] * 200)
@@ -0,0 +1,166 @@
+import random
+
+from controllers import POLICIES
+from game import CONNECTIONS, Game
+
+
+def play_turns(game, turns, blue='greedy', red='random', seed=0):
+    """
+    Plays up to `turns` turns with scripted policies, checking the indexes after each one.
+    Returns every result line execute_actions produced.
+    """
+    rng = random.Random(seed)
+    policies = {'Blue': POLICIES[blue], 'Red': POLICIES[red]}
+    results = []
+    for _ in range(turns):
+        game.turn += 1
+        team = 'Blue' if game.turn % 2 == 1 else 'Red'
+        opponent = 'Red' if team == 'Blue' else 'Blue'
+        actions = policies[team](team, game.get_visible_state(team), rng)
+        results += game.execute_actions(team, actions[:max(1, len(game.teams[opponent].units))])
+        assert game.check_consistency() == [], f"turn {game.turn}"
+        if game.check_victory():
+            break
+    return results
+
+
+def test_new_game_is_consistent():
+    assert Game(seed=1).check_consistency() == []
+
+
+def test_indexes_follow_a_move():
+    game = Game(seed=1)
+    game.execute_actions('Blue', [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Fallston'}])
+    assert game.check_consistency() == []
+    assert game.get_location_of_unit('Blue-1').name == 'Fallston'
+    assert 'Fallston' in game.teams['Blue'].controlled_locations
+
+
+def test_indexes_follow_a_reinforcement():
+    game = Game(seed=1)
+    game.teams['Blue'].resources = 6
+    results = game.execute_actions('Blue', [{'type': 'reinforce', 'location': 'Bel Air'}] * 2)
+    assert game.check_consistency() == []
+    assert 'Reinforced Bel Air with new unit Blue-7' in results
+    assert game.get_location_of_unit('Blue-7').name == 'Bel Air'
+
+
+def test_indexes_follow_combat():
+    game = Game(seed=3)
+    # Walk Red's whole army next to Blue, then attack into it
+    game.execute_actions('Red', [{'type': 'move', 'unit_id': f'Red-{i}', 'to': 'Edgewood'} for i in range(1, 6)])
+    results = game.execute_actions('Blue', [{'type': 'move', 'unit_id': f'Blue-{i}', 'to': 'Edgewood'} for i in range(1, 6)])
+    assert any(r.startswith('Combat at Edgewood') for r in results)
+    assert any('eliminated' in r for r in results)
+    assert game.check_consistency() == []
+    for team in game.teams.values():
+        for unit in team.units:
+            assert game.get_unit_by_id(unit.id) is unit
+
+
+def test_indexes_stay_consistent_over_whole_games():
+    results = []
+    for seed in range(5):
+        results += play_turns(Game(seed=seed), 120, seed=seed)
+    assert any(r.startswith('Combat at') for r in results)
+    assert any(r.startswith('Reinforced') for r in results)
+
+
+def test_state_dicts_do_not_share_the_map():
+    game = Game(seed=1)
+    game.get_visible_state('Blue')['locations']['Bel Air']['connections'].append('Nowhere')
+    game.get_full_state()['locations']['Bel Air']['connections'].clear()
+    assert 'Nowhere' not in CONNECTIONS['Bel Air']
+    assert list(game.get_location_by_name('Bel Air').connections) == CONNECTIONS['Bel Air']
+    assert Game(seed=2).get_visible_state('Blue')['locations']['Bel Air']['connections'] == CONNECTIONS['Bel Air']
+
+
+def test_check_consistency_reports_stale_entries():
+    game = Game(seed=1)
+    unit = game.get_unit_by_id('Blue-1')
+    game.teams['Blue'].units.remove(unit)
+    assert game.check_consistency()
+
+
+def test_restore_rewinds_to_the_snapshot():
+    game = Game(seed=2)
+    play_turns(game, 10)
+    snapshot = game.snapshot()
+    before = game.get_full_state()
+    play_turns(game, 30, seed=1)
+    assert game.get_full_state() != before
+    game.restore(snapshot)
+    assert game.get_full_state() == before
+    assert game.check_consistency() == []
+    assert game.snapshot() == snapshot
+
+
+def test_restore_recreates_eliminated_units():
+    game = Game(seed=3)
+    snapshot = game.snapshot()
+    game.execute_actions('Red', [{'type': 'move', 'unit_id': f'Red-{i}', 'to': 'Edgewood'} for i in range(1, 6)])
+    game.execute_actions('Blue', [{'type': 'move', 'unit_id': f'Blue-{i}', 'to': 'Edgewood'} for i in range(1, 6)])
+    game.restore(snapshot)
+    assert game.check_consistency() == []
+    assert [u.id for u in game.teams['Blue'].units] == [f'Blue-{i}' for i in range(1, 6)]
+    assert all(u.health == 3 for team in game.teams.values() for u in team.units)
+
+
+def test_repeated_branching_matches_a_full_restore():
+    game = Game(seed=6)
+    play_turns(game, 8)
+    snapshot = game.snapshot()
+    before = game.get_full_state()
+    game.teams['Blue'].resources = 3
+    game.execute_actions('Blue', [{'type': 'reinforce', 'location': game.teams['Blue'].controlled_locations[-1]}])
+    game.restore(snapshot)
+    assert game.get_full_state() == before
+    for seed in range(20):
+        # Restoring the last snapshot only rebuilds the locations the branch touched
+        play_turns(game, 1 + seed % 4, blue=('lookahead', 'random')[seed % 2], red='greedy', seed=seed)
+        game.restore(snapshot)
+        assert game.get_full_state() == before, f"branch {seed}"
+        assert game.check_consistency() == []
+        assert all(game.get_unit_by_id(uid) for uid in snapshot.unit_ids)
+    assert game.snapshot() == snapshot
+
+
+def test_restore_switches_between_snapshots():
+    game = Game(seed=7)
+    first = game.snapshot()
+    play_turns(game, 12)
+    second = game.snapshot()
+    state = game.get_full_state()
+    play_turns(game, 6, seed=3)
+    game.restore(first)
+    assert game.get_full_state() == Game(seed=7).get_full_state()
+    play_turns(game, 5, seed=4)
+    game.restore(second)
+    assert game.get_full_state() == state
+    assert game.check_consistency() == []
+    # A clone's snapshot does not replace the one restore rewinds to cheaply
+    play_turns(game, 3, seed=5)
+    game.clone()
+    game.restore(second)
+    assert game.get_full_state() == state
+
+
+def test_clone_is_independent():
+    game = Game(seed=4)
+    play_turns(game, 6)
+    before = game.get_full_state()
+    copy = game.clone()
+    assert copy.get_full_state() == before
+    assert copy.seed == game.seed
+    play_turns(copy, 20, seed=9)
+    assert game.get_full_state() == before
+    assert game.check_consistency() == []
+    assert copy.check_consistency() == []
+
+
+def test_clone_replays_the_same_dice():
+    game = Game(seed=5)
+    play_turns(game, 4)
+    copy = game.clone()
+    assert play_turns(copy, 40, seed=8) == play_turns(game, 40, seed=8)
+    assert copy.get_full_state() == game.get_full_state()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+
+from batch_runner import BatchGameRunner
+from game import Game, replay_moves
+from game_log import GameLogWriter, game_log_path, list_game_logs, read_game_log
+
+
+def test_visible_state_does_not_follow_the_game():
+    # Turn records are written after execute_actions, so the state must be a copy
+    game = Game(seed=1)
+    state = game.get_visible_state('Blue')
+    full_state = game.get_full_state()
+    game.execute_actions('Blue', [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Fallston'}])
+    assert state['controlled_locations'] == ['Bel Air']
+    assert full_state['teams']['Blue']['controlled_locations'] == ['Bel Air']
+    assert game.teams['Blue'].controlled_locations == ['Bel Air', 'Fallston']
+
+
+def test_logged_turns_hold_the_state_before_the_turn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = BatchGameRunner(log_games=True, controllers={'Blue': 'greedy', 'Red': 'greedy'}, master_seed=3)
+    asyncio.run(runner.run_single_game(1))
+    [path] = list_game_logs()
+    header, moves = read_game_log(path)
+
+    # Raises ValueError if a logged state differs from the one the controller was given
+    assert len(list(replay_moves(moves, header['seed']))) == len(moves) > 0
+
+
+def test_a_torn_last_line_is_dropped(tmp_path):
+    with GameLogWriter('torn', directory=str(tmp_path), header={'seed': 1}) as log:
+        log.append({'turn': 1, 'team': 'Blue'})
+        log.append({'turn': 2, 'team': 'Red'})
+    path = game_log_path('torn', str(tmp_path))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"turn": 3, "team": "Bl')
+    header, moves = read_game_log(path)
+    assert header == {'seed': 1}
+    assert [m['turn'] for m in moves] == [1, 2]
+
+
+def test_a_torn_earlier_line_is_an_error(tmp_path):
+    path = tmp_path / 'game_bad.jsonl'
+    path.write_text('{"turn": 1, "team": "Bl\n{"turn": 2, "team": "Red"}\n', encoding='utf-8')
+    with pytest.raises(json.JSONDecodeError):
+        read_game_log(str(path))
+
+
+def test_log_ids_are_not_reused(tmp_path):
+    GameLogWriter('same', directory=str(tmp_path)).close()
+    with pytest.raises(FileExistsError):
+        GameLogWriter('same', directory=str(tmp_path))
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+import llm_controller
+from game import Game
+from response_cache import ResponseCache
+from retry_policy import RetryPolicy
+
+PLAN = {'actions': [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Fallston'}]}
+
+
+class StubLLM:
+    """
+    Stands in for miniOR.chat: answers with PLAN, or times out on the calls
+    (1-based) listed in `failures`.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = set()
+
+    async def __call__(self, prompt_str, model=None, system_prompt=None, response_format=None, **kwargs):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(0.01)
+        if call in self.failures:
+            raise TimeoutError("stub timeout")
+        return json.dumps(PLAN)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    stub = StubLLM()
+    monkeypatch.setattr(llm_controller, 'chat', stub)
+    # One attempt per request, so a failure hands over to the next waiting game at once
+    monkeypatch.setattr(llm_controller, 'retry_policy', RetryPolicy(max_attempts=1, turn_deadline=5))
+    monkeypatch.setattr(llm_controller, 'response_cache', ResponseCache())
+    yield stub
+    assert llm_controller._pending_responses == {}
+
+
+def ask_concurrently(n):
+    state = Game(seed=1).get_visible_state('Blue')
+
+    async def ask():
+        return await asyncio.wait_for(
+            asyncio.gather(*(llm_controller.get_action_plan('Blue', state) for _ in range(n))), timeout=5)
+    return asyncio.run(ask())
+
+
+def test_identical_requests_share_one_call(llm):
+    results = ask_concurrently(4)
+    assert llm.calls == 1
+    assert [plan for plan, _, _ in results] == [PLAN] * 4
+    assert llm_controller.response_cache.stats['coalesced'] == 3
+
+
+def test_a_waiter_takes_over_when_the_first_request_fails(llm):
+    llm.failures = {1}
+    results = ask_concurrently(4)
+    assert llm.calls == 2
+    assert [plan for plan, _, _ in results] == [{'actions': []}] + [PLAN] * 3
+
+
+def test_every_waiter_retries_when_every_request_fails(llm):
+    llm.failures = {1, 2, 3, 4}
+    results = ask_concurrently(4)
+    assert llm.calls == 4
+    assert [plan for plan, _, _ in results] == [{'actions': []}] * 4
+
+
+def test_later_requests_are_served_from_the_cache(llm):
+    ask_concurrently(1)
+    results = ask_concurrently(2)
+    assert llm.calls == 1
+    assert [plan for plan, _, _ in results] == [PLAN] * 2
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+import miniOR
+
+
+@pytest.fixture(autouse=True)
+def no_shared_client(monkeypatch):
+    monkeypatch.setattr(miniOR, '_shared_client', None)
+    monkeypatch.setattr(miniOR, '_shared_client_loop', None)
+
+
+async def get_client():
+    return miniOR.get_async_client()
+
+
+async def get_and_close():
+    client = miniOR.get_async_client()
+    assert miniOR.get_async_client() is client
+    await miniOR.close_client()
+    return client
+
+
+def test_client_is_rebuilt_after_close_client():
+    first = asyncio.run(get_and_close())
+    second = asyncio.run(get_and_close())
+    assert first.is_closed()
+    assert second is not first and second.is_closed()
+
+
+def test_client_left_open_on_another_loop_is_an_error():
+    client = asyncio.run(get_client())
+    with pytest.raises(RuntimeError, match='close_client'):
+        asyncio.run(get_client())
+    assert miniOR._shared_client is client
@@ -0,0 +1,79 @@
+import pytest
+
+from game import Game
+from plan_validation import parse_action_plan, validate_actions
+
+
+@pytest.fixture
+def state():
+    return Game(seed=1).get_visible_state('Blue')
+
+
+def test_valid_actions_are_kept(state):
+    state['resources'] = 3
+    actions = [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Fallston'}, {'type': 'reinforce', 'location': 'Bel Air'}]
+    assert validate_actions('Blue', state, actions) == (actions, [])
+
+
+def test_rejects_units_of_the_other_team(state):
+    valid, problems = validate_actions('Blue', state, [{'type': 'move', 'unit_id': 'Red-1', 'to': 'Fallston'}])
+    assert valid == []
+    assert problems == ["Unit 'Red-1' does not belong to Blue"]
+
+
+def test_rejects_moves_to_locations_not_adjacent(state):
+    valid, problems = validate_actions('Blue', state, [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Havre de Grace'}])
+    assert valid == []
+    assert problems == ["Havre de Grace is not adjacent to Bel Air for Blue-1"]
+
+
+def test_rejects_unknown_destinations(state):
+    valid, problems = validate_actions('Blue', state, [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Baltimore'}])
+    assert valid == []
+    assert problems == ["Unknown destination for Blue-1: 'Baltimore'"]
+
+
+def test_rejects_reinforcing_locations_not_controlled(state):
+    state['resources'] = 3
+    valid, problems = validate_actions('Blue', state, [{'type': 'reinforce', 'location': 'Edgewood'}])
+    assert valid == []
+    assert problems == ["Cannot reinforce Edgewood: not controlled by Blue"]
+
+
+def test_rejects_reinforcements_that_cannot_be_paid_for(state):
+    state['resources'] = 5
+    valid, problems = validate_actions('Blue', state, [{'type': 'reinforce', 'location': 'Bel Air'}] * 2)
+    assert valid == [{'type': 'reinforce', 'location': 'Bel Air'}]
+    assert problems == ["Cannot afford reinforcement at Bel Air: 2 resources"]
+
+
+def test_rejects_unknown_action_types_and_non_actions(state):
+    valid, problems = validate_actions('Blue', state, [{'type': 'attack', 'unit_id': 'Blue-1'}, 'move Blue-1'])
+    assert valid == []
+    assert problems == ["Unknown action type: 'attack'", "Not an action: 'move Blue-1'"]
+
+
+def test_drops_actions_over_the_limit(state):
+    actions = [{'type': 'move', 'unit_id': f'Blue-{i}', 'to': 'Fallston'} for i in range(1, 5)]
+    valid, problems = validate_actions('Blue', state, actions, limit=2)
+    assert valid == actions[:2]
+    assert problems == ["Dropped 2 action(s) over the limit of 2"]
+
+
+def test_repairs_small_formatting_mistakes(state):
+    valid, problems = validate_actions('Blue', state, [{'type': 'Move', 'unit_id': 'blue 2', 'to': 'fallston'}])
+    assert valid == [{'type': 'move', 'unit_id': 'Blue-2', 'to': 'Fallston'}]
+    assert problems == []
+
+
+def test_reinforcing_a_location_captured_earlier_in_the_turn(state):
+    state['resources'] = 3
+    actions = [{'type': 'move', 'unit_id': 'Blue-1', 'to': 'Fallston'}, {'type': 'reinforce', 'location': 'Fallston'}]
+    assert validate_actions('Blue', state, actions) == (actions, [])
+
+
+def test_parse_rejects_responses_without_a_plan():
+    with pytest.raises(ValueError):
+        parse_action_plan("I would move my units north.")
+    with pytest.raises(ValueError):
+        parse_action_plan("")
@@ -0,0 +1,55 @@
+import json
+import random
+
+import pytest
+
+from controllers import POLICIES
+from game import CONNECTIONS, Game
+from prompt_format import estimate_tokens, parse_state, serialize_state
+
+
+def play_turns(game, turns, seed=0):
+    rng = random.Random(seed)
+    for _ in range(turns):
+        game.turn += 1
+        team = 'Blue' if game.turn % 2 == 1 else 'Red'
+        game.execute_actions(team, POLICIES['greedy'](team, game.get_visible_state(team), rng))
+
+
+def states():
+    game = Game(seed=11)
+    yield game.get_visible_state('Blue')
+    for _ in range(4):
+        play_turns(game, 7)
+        yield game.get_visible_state('Blue')
+        yield game.get_visible_state('Red')
+
+
+@pytest.mark.parametrize('prompt_format', ['json', 'compact'])
+def test_round_trip(prompt_format):
+    for state in states():
+        _, text = serialize_state(state, prompt_format)
+        assert parse_state(text, CONNECTIONS) == state
+
+
+def test_round_trip_with_unit_types_and_uneven_resources():
+    game = Game(seed=12)
+    game.get_location_by_name('Bel Air').resources = 3
+    game.get_unit_by_id('Blue-2').type = 'armor'
+    state = game.get_visible_state('Blue')
+    legend, text = serialize_state(state)
+    assert 'type' in legend and 'resources' in legend
+    assert parse_state(text, CONNECTIONS) == state
+
+
+def test_compact_is_smaller():
+    game = Game(seed=13)
+    play_turns(game, 20)
+    state = game.get_visible_state('Blue')
+    compact = serialize_state(state)[1]
+    assert estimate_tokens(compact) < estimate_tokens(json.dumps(state, indent=2)) / 2
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        serialize_state(Game(seed=1).get_visible_state('Blue'), 'yaml')
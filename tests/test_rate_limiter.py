@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import ModelRateLimiter, RateLimiter, TokenBucket, parse_rate_limits
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    bucket = TokenBucket(120, capacity=4)  # 2 per second
+    bucket.updated = 0.0
+    assert bucket.wait_time(4, 0.0) == 0.0
+    bucket.take(4)
+    assert bucket.wait_time(1, 0.0) == pytest.approx(0.5)
+    assert bucket.wait_time(1, 0.25) == pytest.approx(0.25)
+    assert bucket.wait_time(1, 100.0) == 0.0
+    assert bucket.tokens == 4
+    # Requests larger than the bucket wait for a full one instead of forever
+    bucket.take(4)
+    assert bucket.wait_time(50, 100.0) == pytest.approx(2.0)
+
+
+def test_bucket_burst_defaults_to_ten_seconds_of_budget():
+    assert TokenBucket(60).capacity == 10
+    assert TokenBucket(6).capacity == 1
+    assert TokenBucket(60_000).capacity == 10_000
+
+
+def test_settle_corrects_the_token_estimate():
+    limiter = ModelRateLimiter(tpm=6000)  # capacity 1000
+    limiter.tokens.take(300)
+    limiter.settle(estimated=300, actual=100)
+    assert limiter.tokens.tokens == pytest.approx(900, abs=1)
+    limiter.settle(estimated=100, actual=400)
+    assert limiter.tokens.tokens == pytest.approx(600, abs=1)
+    limiter.settle(estimated=100, actual=None)
+    assert limiter.tokens.tokens == pytest.approx(600, abs=1)
+
+
+def test_requests_wait_for_budget_in_arrival_order():
+    limiter = ModelRateLimiter(rpm=1200)  # 20 per second
+    limiter.requests = TokenBucket(1200, capacity=1)
+    served = []
+
+    async def request(i):
+        await limiter.acquire(10)
+        served.append(i)
+
+    async def main():
+        start = time.monotonic()
+        await asyncio.gather(*(request(i) for i in range(5)))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(main())
+    assert served == [0, 1, 2, 3, 4]
+    assert elapsed >= 4 / 20 * 0.9
+    assert limiter.stats['requests'] == 5
+    assert limiter.stats['delayed'] == 4
+    assert limiter.stats['max_queue_depth'] >= 4
+    assert limiter.queue_depth == 0
+
+
+def test_pause_holds_requests():
+    limiter = ModelRateLimiter()
+    assert asyncio.run(limiter.acquire(10)) == 0.0
+    limiter.pause(0.1)
+    assert asyncio.run(limiter.acquire(10)) >= 0.09
+    assert limiter.stats['pauses'] == 1
+
+
+def test_limits_per_model():
+    assert parse_rate_limits('a/b=500:200000, c=50, d=:100') == {'a/b': (500, 200000), 'c': (50, 0), 'd': (0, 100)}
+    limiter = RateLimiter(default_rpm=60, limits={'fast': (600, 0)})
+    assert limiter.for_model('fast').rpm == 600
+    assert limiter.for_model('other').rpm == 60
+    assert limiter.for_model('other') is limiter.for_model('other')
+    limiter.set_limit('other', rpm=5)
+    assert limiter.for_model('other').rpm == 5
+    assert set(limiter.metrics()) == {'fast', 'other'}
@@ -0,0 +1,83 @@
+import pytest
+
+import response_cache
+from response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return clock
+
+
+def test_memory_entries_expire(clock):
+    cache = ResponseCache(ttl_seconds=60)
+    cache.put('k', 'plan')
+    clock.now += 59
+    assert cache.get('k') == 'plan'
+    clock.now += 2
+    assert cache.get('k') is None
+    assert cache.stats['expired'] == 1
+    assert 'k' not in cache._memory
+
+
+def test_disk_entries_expire_across_instances(clock, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResponseCache(path, ttl_seconds=60)
+    cache.put('old', 'a')
+    clock.now += 30
+    cache.put('new', 'b')
+    clock.now += 40
+    # The memory tier and the file agree on the age of an entry
+    assert cache.get('old') is None
+    assert cache.get('new') == 'b'
+    cache.close()
+
+    reopened = ResponseCache(path, ttl_seconds=60)
+    assert reopened.get('old') is None
+    assert reopened.get('new') == 'b'
+    assert reopened.stats['disk_hits'] == 1
+    clock.now += 30
+    reopened._memory.clear()
+    assert reopened.get('new') is None
+    assert reopened.stats['expired'] == 1
+    assert reopened._disk_entries == 0
+    reopened.close()
+
+
+def test_disk_evicts_least_recently_used(clock, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResponseCache(path, max_memory_entries=2, max_disk_entries=10, touch_batch=1)
+    for i in range(10):
+        clock.now += 1
+        cache.put(f'k{i}', str(i))
+    clock.now += 1
+    cache._memory.clear()
+    assert cache.get('k0') == '0'  # now the most recently used
+    clock.now += 1
+    cache.put('k10', '10')
+    cache.close()
+
+    reopened = ResponseCache(path, max_memory_entries=0)
+    kept = {f'k{i}' for i in range(11) if reopened.get(f'k{i}') is not None}
+    assert kept == {'k0'} | {f'k{i}' for i in range(3, 11)}
+    assert reopened._disk_entries == 9
+    reopened.close()
+
+
+def test_memory_tier_is_bounded(clock):
+    cache = ResponseCache(max_memory_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key)
+    assert cache.get('a') is None
+    assert cache.get('c') == 'c'
+    assert cache.stats['memory_evictions'] == 1
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import openai
+
+import llm_controller
+from game import Game
+from retry_policy import RetryPolicy, classify_error, retry_after_seconds
+
+
+def status_error(status, headers=None):
+    request = httpx.Request('POST', 'https://openrouter.ai/api/v1/chat/completions')
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    cls = {429: openai.RateLimitError, 400: openai.BadRequestError}.get(status, openai.InternalServerError)
+    return cls(f'HTTP {status}', response=response, body=None)
+
+
+def test_classify_error():
+    request = httpx.Request('POST', 'https://openrouter.ai')
+    assert classify_error(status_error(429)) == 'rate_limit'
+    assert classify_error(status_error(503)) == 'server_error'
+    assert classify_error(status_error(400)) == 'client_error'
+    assert classify_error(openai.APITimeoutError(request)) == 'timeout'
+    assert classify_error(asyncio.TimeoutError()) == 'timeout'
+    assert classify_error(openai.APIConnectionError(request=request)) == 'connection'
+    assert classify_error(json.JSONDecodeError('bad', '', 0)) == 'parse'
+    assert classify_error(KeyError('actions')) == 'other'
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(status_error(429, {'retry-after': '7'})) == 7.0
+    assert retry_after_seconds(status_error(429, {'retry-after-ms': '1500', 'retry-after': '7'})) == 1.5
+    when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < retry_after_seconds(status_error(429, {'retry-after': when})) <= 30
+    assert retry_after_seconds(status_error(429)) is None
+    assert retry_after_seconds(status_error(429, {'retry-after': 'soon'})) is None
+    assert retry_after_seconds(ValueError('no response')) is None
+
+
+def test_rate_limits_wait_for_retry_after_plus_bounded_jitter():
+    policy = RetryPolicy(base_delay=0.5, max_retry_after=60, rng=random.Random(1))
+    delays = [policy.delay('rate_limit', 1, status_error(429, {'retry-after': '7'})) for _ in range(200)]
+    assert all(7 <= d <= 7.25 for d in delays)
+    assert len(set(delays)) > 1
+    capped = policy.delay('rate_limit', 1, status_error(429, {'retry-after': '3600'}))
+    assert 60 <= capped <= 60.25
+
+
+def test_backoff_is_full_jitter_within_the_cap():
+    policy = RetryPolicy(max_attempts=10, base_delay=0.5, max_delay=4.0, rng=random.Random(2))
+    for attempt in range(1, 10):
+        delays = [policy.delay('server_error', attempt) for _ in range(200)]
+        bound = min(4.0, 0.5 * 2 ** (attempt - 1))
+        assert all(0 <= d <= bound for d in delays)
+        assert max(delays) > bound * 0.9
+    # Without a Retry-After header a 429 backs off the same way
+    assert 0 <= policy.delay('rate_limit', 1, status_error(429)) <= 0.5
+
+
+def test_when_to_stop():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.delay('client_error', 1) is None
+    assert policy.delay('parse', 1) == 0.0
+    assert policy.delay('timeout', 3) is None
+    assert policy.next_model('a', 1) == 'a'
+    policy.fallback_model = 'b'
+    assert policy.next_model('a', 1) == 'a'
+    assert policy.next_model('a', 2) == 'b'
+
+
+def test_no_retry_starts_past_the_turn_deadline(monkeypatch):
+    calls = []
+
+    async def chat(prompt_str, model=None, **kwargs):
+        calls.append(model)
+        raise status_error(429, {'retry-after': '30'})
+
+    policy = RetryPolicy(turn_deadline=2.0)
+    monkeypatch.setattr(llm_controller, 'chat', chat)
+    monkeypatch.setattr(llm_controller, 'retry_policy', policy)
+    monkeypatch.setattr(llm_controller, 'response_cache', None)
+    state = Game(seed=1).get_visible_state('Blue')
+    plan, _, _ = asyncio.run(asyncio.wait_for(llm_controller.get_action_plan('Blue', state), timeout=1))
+    assert plan == {'actions': []}
+    assert len(calls) == 1
+    assert policy.stats['deadline'] == 1
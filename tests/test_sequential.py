@@ -0,0 +1,65 @@
+import pytest
+
+from sequential import SequentialTest, wilson_interval
+
+
+def run(test, winners):
+    """
+    Feeds results until the test decides; returns (decision, games played).
+    """
+    for winner in winners:
+        decision = test.update(winner)
+        if decision:
+            return decision, test.games
+    return None, test.games
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(1 - high)
+    assert 0.2 < low < 0.3
+
+
+def test_sprt_names_blue_after_a_run_of_blue_wins():
+    # Each Blue win adds log(0.6 / 0.5) to the "Blue stronger" LLR; the bound
+    # log(0.95 / 0.025) is first crossed by the 20th
+    assert run(SequentialTest(), ['Blue'] * 100) == ('blue', 20)
+
+
+def test_sprt_names_red_after_a_run_of_red_wins():
+    assert run(SequentialTest(), ['Red'] * 100) == ('red', 20)
+
+
+def test_sprt_waits_for_min_games():
+    assert run(SequentialTest(min_games=30), ['Blue'] * 100) == ('blue', 30)
+
+
+def test_sprt_calls_alternating_results_a_tie():
+    decision, games = run(SequentialTest(), ['Blue', 'Red'] * 100)
+    assert decision == 'tie'
+    assert games < 200
+
+
+def test_draws_only_use_up_the_budget():
+    test = SequentialTest(max_games=50)
+    assert run(test, ['Draw'] * 100) == ('budget', 50)
+    assert test.decisive == 0
+
+
+def test_decision_is_final():
+    test = SequentialTest()
+    run(test, ['Blue'] * 20)
+    assert test.update('Red') == 'blue'
+    assert test.red_wins == 0
+
+
+def test_wilson_method_names_blue():
+    decision, games = run(SequentialTest(method='wilson'), ['Blue'] * 100)
+    assert decision == 'blue'
+    assert games == 10
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        SequentialTest(method='bayes')
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import miniOR
+from batch_runner import BatchGameRunner
+from controllers import POLICIES, get_controller
+from game import derive_seed
+
+# Headless tournaments between models and/or local policies, sharded over a
+# process pool. Each worker runs its own event loop with several games in
+# flight; finished GameResults stream back to the parent through a queue.
+
+# Short names for the models defined in miniOR, e.g. 'googleflashlite'
+MODEL_ALIASES = {
+    name: value for name, value in vars(miniOR).items()
+    if isinstance(value, str) and not name.isupper() and not name.startswith('_') and '/' in value
+}
+
+
+def resolve_participant(name):
+    """
+    Turns a participant name into a controller name for controllers.get_controller:
+    POLICIES names and 'llm' stay as they are, miniOR aliases and model IDs become 'llm:<model>'.
+    """
+    if name in POLICIES or name == 'llm' or name.startswith('llm:'):
+        return name
+    if name in MODEL_ALIASES:
+        return f'llm:{MODEL_ALIASES[name]}'
+    if '/' in name:
+        return f'llm:{name}'
+    raise ValueError(f"Unknown participant '{name}'. Use a policy ({', '.join(POLICIES)}), "
+                     f"a miniOR model ({', '.join(MODEL_ALIASES)}) or a model ID")
+
+
+def round_robin(participants):
+    """
+    Every ordered pair of distinct participants, so each plays both colours against each other.
+    """
+    return [(blue, red) for blue, red in itertools.permutations(participants, 2)]
+
+
+async def _play_shard(jobs, matchups, master_seed, concurrency, log_games, cache_path, results):
+    import llm_controller
+    if cache_path:
+        from response_cache import ResponseCache
+        # One connection per shard; the cache file is opened in WAL mode with a busy timeout
+        llm_controller.set_response_cache(ResponseCache(cache_path))
+    runner = BatchGameRunner(log_games=log_games, concurrency=concurrency)
+    game_slots = asyncio.Semaphore(concurrency)
+
+    async def play(game_number, matchup_index, n):
+        blue, red = matchups[matchup_index]
+        # Same scheme as headless.py: game n of every matchup gets the same dice, and each
+        # scripted team an RNG derived from the game's seed and its name
+        seed = derive_seed(master_seed, n)
+        controllers = {
+            'Blue': get_controller(resolve_participant(blue), seed=derive_seed(seed, 'Blue')),
+            'Red': get_controller(resolve_participant(red), seed=derive_seed(seed, 'Red')),
+        }
+        async with game_slots:
+            result = await runner.run_single_game(game_number, seed=seed, controllers=controllers)
+        results.put((matchup_index, result))
+
+    try:
+        await asyncio.gather(*(play(*job) for job in jobs))
+    finally:
+        await miniOR.close_client()
+        if cache_path:
+            llm_controller.response_cache.close()
+            llm_controller.set_response_cache(None)
+
+
+def _run_shard(jobs, matchups, master_seed, concurrency, log_games, cache_path, results):
+    # Entry point in each worker process: one event loop per shard
+    asyncio.run(_play_shard(jobs, matchups, master_seed, concurrency, log_games, cache_path, results))
+    return len(jobs)
+
+
+def run_tournament(matchups, games_per_matchup, processes=None, concurrency=8, master_seed=0,
+                   shard_size=20, log_games=False, cache_path=None, on_result=None):
+    """
+    Plays games_per_matchup games for every (blue, red) matchup across a process pool.
+
+    :param matchups: list of (blue participant, red participant) names (see resolve_participant)
+    :param processes: worker processes (default: CPU count); 1 plays everything in this process
+    :param concurrency: games in flight per worker
+    :param master_seed: game n of every matchup is seeded with f'{master_seed}:{n}'
+    :param shard_size: games handed to a worker at a time
+    :param on_result: optional callback (matchup, GameResult) called as results arrive
+    :return: dict matchup -> list of GameResults ordered by game number
+    """
+    matchups = [tuple(m) for m in matchups]
+    for blue, red in matchups:
+        resolve_participant(blue)
+        resolve_participant(red)
+    jobs = [
+        (game_number, matchup_index, n)
+        for game_number, (matchup_index, n) in enumerate(
+            ((m, n) for m in range(len(matchups)) for n in range(1, games_per_matchup + 1)), start=1)
+    ]
+    shards = [jobs[i:i + shard_size] for i in range(0, len(jobs), shard_size)]
+    results = {m: [] for m in matchups}
+
+    def collect(item):
+        matchup_index, result = item
+        results[matchups[matchup_index]].append(result)
+        if on_result:
+            on_result(matchups[matchup_index], result)
+
+    if processes == 1:
+        local = queue.SimpleQueue()
+        for shard in shards:
+            _run_shard(shard, matchups, master_seed, concurrency, log_games, cache_path, local)
+            while not local.empty():
+                collect(local.get())
+    else:
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=processes) as pool:
+            result_queue = manager.Queue()
+            futures = [pool.submit(_run_shard, shard, matchups, master_seed, concurrency, log_games,
+                                   cache_path, result_queue) for shard in shards]
+            received = 0
+            while received < len(jobs):
+                try:
+                    collect(result_queue.get(timeout=0.5))
+                    received += 1
+                except queue.Empty:
+                    # Surface a crashed worker instead of waiting forever
+                    for f in futures:
+                        if f.done() and f.exception():
+                            raise f.exception()
+            for f in futures:
+                f.result()
+
+    for games in results.values():
+        games.sort(key=lambda r: r.game_number)
+    return results
+
+
+def standings(results):
+    """
+    Wins, losses and draws per participant over all matchups.
+    """
+    table = {}
+    for (blue, red), games in results.items():
+        for name in (blue, red):
+            table.setdefault(name, Counter())
+        for r in games:
+            if r.winner == 'Draw':
+                table[blue]['draws'] += 1
+                table[red]['draws'] += 1
+            else:
+                winner, loser = (blue, red) if r.winner == 'Blue' else (red, blue)
+                table[winner]['wins'] += 1
+                table[loser]['losses'] += 1
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless tournament between models and local policies")
+    parser.add_argument("--matchup", action="append", default=[], metavar="BLUE:RED",
+                        help="a matchup such as googleflashlite:openai41mini or greedy:random (repeatable)")
+    parser.add_argument("--round-robin", default=None, metavar="A,B,C",
+                        help="comma-separated participants; every pair plays both colours")
+    parser.add_argument("--games", type=int, default=20, help="games per matchup")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=8, help="games in flight per process")
+    parser.add_argument("--seed", type=int, default=0, help="master seed; game n of each matchup uses a seed derived from it")
+    parser.add_argument("--shard-size", type=int, default=20)
+    parser.add_argument("--log-games", action="store_true", help="write game logs to games/")
+    parser.add_argument("--cache", default=None, help="SQLite file for the LLM response cache")
+    args = parser.parse_args()
+
+    matchups = [tuple(m.split(':', 1)) for m in args.matchup]
+    if args.round_robin:
+        matchups += round_robin([p.strip() for p in args.round_robin.split(',') if p.strip()])
+    if not matchups:
+        parser.error("give at least one --matchup or --round-robin")
+
+    total = len(matchups) * args.games
+    done = 0
+
+    def progress(matchup, result):
+        nonlocal done
+        done += 1
+        print(f"[{done}/{total}] {matchup[0]} vs {matchup[1]} game {result.game_number}: "
+              f"{result.winner} in {result.turns_taken} turns")
+
+    start = time.time()
+    results = run_tournament(matchups, args.games, processes=args.processes, concurrency=args.concurrency,
+                             master_seed=args.seed, shard_size=args.shard_size, log_games=args.log_games,
+                             cache_path=args.cache, on_result=progress)
+    elapsed = time.time() - start
+
+    print(f"\n🏆 Tournament: {total} games in {elapsed:.1f}s ({total / elapsed:.1f} games/s)")
+    print(f"{'Blue':<24} {'Red':<24} {'Games':>6} {'Blue W':>7} {'Red W':>6} {'Draws':>6} {'Turns':>6}")
+    for (blue, red), games in results.items():
+        wins = Counter(r.winner for r in games)
+        avg_turns = sum(r.turns_taken for r in games) / len(games) if games else 0
+        print(f"{blue:<24} {red:<24} {len(games):>6} {wins['Blue']:>7} {wins['Red']:>6} {wins['Draw']:>6} {avg_turns:>6.1f}")
+
+    print(f"\n{'Participant':<24} {'W':>5} {'L':>5} {'D':>5}")
+    for name, record in sorted(standings(results).items(), key=lambda item: -item[1]['wins']):
+        print(f"{name:<24} {record['wins']:>5} {record['losses']:>5} {record['draws']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
+import asyncio
 import pygame
+import sys
 import time
 import math
-from collections import deque
+from collections import OrderedDict, deque
+
+from telemetry import timed
 
 # Fixed positions for locations
 LOCATIONS = {
@@ -23,13 +27,27 @@ CONNECTIONS = {
     'Fallston': ['Bel Air']
 }
 
+BACKGROUND = (240, 240, 240)
+
+# Rendered text surfaces kept per visualizer, least recently used dropped first
+TEXT_CACHE_SIZE = 512
+
 # Animation and event system
 class GameVisualizer:
-    def __init__(self, width=800, height=600):
+    def __init__(self, width=800, height=600, headless=False, ticks=None):
+        """
+        :param headless: draw to an off-screen surface instead of opening a window (for frame capture)
+        :param ticks: callable returning the animation clock in milliseconds (default pygame.time.get_ticks)
+        """
         pygame.init()
-        self.screen = pygame.display.set_mode((width, height))
-        pygame.display.set_caption("Harford County Strategy Game")
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface((width, height))
+        else:
+            self.screen = pygame.display.set_mode((width, height))
+            pygame.display.set_caption("Harford County Strategy Game")
         self.clock = pygame.time.Clock()
+        self.ticks = ticks or pygame.time.get_ticks
         
         # Fonts
         self.font = pygame.font.Font(None, 20)
@@ -44,6 +62,36 @@ class GameVisualizer:
         self.animations = []
         self.combat_effects = []
         
+        # Rendering caches: the map never changes, the board only when the turn does
+        self._text_cache = OrderedDict()
+        self._static_layer = None
+        self._board = None
+        self._board_state = None
+        self._board_game = None
+        self._board_turn = None
+        self._dirty = []  # screen areas animations/events covered last frame
+        self._combat_surface = pygame.Surface((100, 100), pygame.SRCALPHA)
+        self._event_backgrounds = {}
+        
+    def render_text(self, font, text, color):
+        """Font.render with a cache keyed by (font, text, color)"""
+        key = (id(font), text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            surface = self._text_cache[key] = font.render(text, True, color)
+            if len(self._text_cache) > TEXT_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+        else:
+            self._text_cache.move_to_end(key)
+        return surface
+    
+    def invalidate(self):
+        """Forces the next draw_game_state to refetch the state and repaint the whole window,
+        e.g. after something else has drawn on the screen"""
+        self._board_state = None
+        self._board_game = None
+        self._board_turn = None
+        
     def add_event(self, event_text, event_type="info"):
         """Add an event to the display queue"""
         colors = {
@@ -55,7 +103,7 @@ class GameVisualizer:
         self.events.append({
             'text': event_text,
             'color': colors.get(event_type, colors['info']),
-            'time': pygame.time.get_ticks()
+            'time': self.ticks()
         })
     
     def add_move_animation(self, from_loc, to_loc, unit_id, team):
@@ -68,7 +116,7 @@ class GameVisualizer:
                 'to': LOCATIONS[to_loc],
                 'unit_id': unit_id,
                 'color': color,
-                'start_time': pygame.time.get_ticks(),
+                'start_time': self.ticks(),
                 'duration': 1000  # 1 second
             })
     
@@ -77,13 +125,14 @@ class GameVisualizer:
         if location in LOCATIONS:
             self.combat_effects.append({
                 'pos': LOCATIONS[location],
-                'start_time': pygame.time.get_ticks(),
+                'start_time': self.ticks(),
                 'duration': 2000  # 2 seconds
             })
     
     def draw_animations(self):
-        """Draw all active animations"""
-        current_time = pygame.time.get_ticks()
+        """Draw all active animations and return the screen areas they covered"""
+        current_time = self.ticks()
+        dirty = []
         
         # Draw move animations
         for anim in self.animations[:]:
@@ -102,7 +151,7 @@ class GameVisualizer:
                 current_y = start_y + (end_y - start_y) * progress
                 
                 # Draw moving unit
-                pygame.draw.circle(self.screen, anim['color'], (int(current_x), int(current_y)), 8)
+                dirty.append(pygame.draw.circle(self.screen, anim['color'], (int(current_x), int(current_y)), 8))
                 pygame.draw.circle(self.screen, (255, 255, 255), (int(current_x), int(current_y)), 8, 2)
                 
                 # Draw trail
@@ -111,9 +160,7 @@ class GameVisualizer:
                     if trail_progress > 0:
                         trail_x = start_x + (end_x - start_x) * trail_progress
                         trail_y = start_y + (end_y - start_y) * trail_progress
-                        alpha = max(0, 255 - i * 50)
-                        color = (*anim['color'], alpha)
-                        pygame.draw.circle(self.screen, anim['color'], (int(trail_x), int(trail_y)), max(1, 8 - i))
+                        dirty.append(pygame.draw.circle(self.screen, anim['color'], (int(trail_x), int(trail_y)), max(1, 8 - i)))
         
         # Draw combat effects
         for effect in self.combat_effects[:]:
@@ -127,14 +174,18 @@ class GameVisualizer:
             radius = 40 + math.sin(progress * math.pi * 8) * 10
             alpha = max(0, 255 - int(progress * 255))
             
-            # Create surface for alpha blending
-            combat_surface = pygame.Surface((100, 100), pygame.SRCALPHA)
+            # Scratch surface for alpha blending, reused for every effect
+            combat_surface = self._combat_surface
+            combat_surface.fill((0, 0, 0, 0))
             pygame.draw.circle(combat_surface, (255, 0, 0, alpha), (50, 50), int(radius))
-            self.screen.blit(combat_surface, (effect['pos'][0] - 50, effect['pos'][1] - 50))
+            dirty.append(self.screen.blit(combat_surface, (effect['pos'][0] - 50, effect['pos'][1] - 50)))
+        
+        return dirty
     
     def draw_events(self):
-        """Draw the event log"""
-        current_time = pygame.time.get_ticks()
+        """Draw the event log and return the screen areas it covered"""
+        current_time = self.ticks()
+        dirty = []
         
         # Calculate starting position from bottom
         screen_height = self.screen.get_height()
@@ -148,9 +199,12 @@ class GameVisualizer:
             visible_count = min(len([e for e in self.events if current_time - e['time'] <= self.event_display_time]), max_events)
             if visible_count > 0:
                 bg_height = visible_count * event_height + 20
-                event_bg = pygame.Surface((self.screen.get_width(), bg_height), pygame.SRCALPHA)
-                event_bg.fill((0, 0, 0, 180))  # Slightly more opaque for better contrast
-                self.screen.blit(event_bg, (0, screen_height - bg_height))
+                event_bg = self._event_backgrounds.get(bg_height)
+                if event_bg is None:
+                    event_bg = pygame.Surface((self.screen.get_width(), bg_height), pygame.SRCALPHA)
+                    event_bg.fill((0, 0, 0, 180))  # Slightly more opaque for better contrast
+                    self._event_backgrounds[bg_height] = event_bg
+                dirty.append(self.screen.blit(event_bg, (0, screen_height - bg_height)))
         
         # Draw events from bottom up
         y_offset = start_y + 10
@@ -179,38 +233,51 @@ class GameVisualizer:
                 prefix = "ℹ️  "
             
             # Render white text for max contrast
-            text_surface = self.event_font.render(prefix + event['text'], True, (255, 255, 255))
+            text_surface = self.render_text(self.event_font, prefix + event['text'], (255, 255, 255))
             text_surface.set_alpha(alpha)
             
             # Optional: Draw a subtle shadow for even better readability
-            shadow = self.event_font.render(prefix + event['text'], True, (0, 0, 0))
+            shadow = self.render_text(self.event_font, prefix + event['text'], (0, 0, 0))
             shadow.set_alpha(int(alpha * 0.7))
-            self.screen.blit(shadow, (12, y_offset + 2))
+            dirty.append(self.screen.blit(shadow, (12, y_offset + 2)))
             
-            self.screen.blit(text_surface, (10, y_offset))
+            dirty.append(self.screen.blit(text_surface, (10, y_offset)))
             y_offset += event_height
             visible_events += 1
+        
+        return dirty
     
-    def draw_game_state(self, game):
-        """Draw the current game state with enhanced visuals"""
-        state = game.get_full_state()
-
-        # Clear the screen
-        self.screen.fill((240, 240, 240))
+    def _build_static_layer(self):
+        """Background, roads and location names: everything that never changes"""
+        layer = pygame.Surface(self.screen.get_size())
+        if not self.headless:
+            layer = layer.convert()
+        layer.fill(BACKGROUND)
 
         # Draw connections (lines between locations)
         drawn = set()
-        for loc, data in state['locations'].items():
-            pos1 = LOCATIONS[loc]
-            for conn in data['connections']:
-                if conn in LOCATIONS:
-                    pos2 = LOCATIONS[conn]
-                    key = tuple(sorted((loc, conn)))
-                    if key not in drawn:
-                        pygame.draw.line(self.screen, (150, 150, 150), pos1, pos2, 3)
-                        drawn.add(key)
-
-        # Draw locations (circles with control colors, names, and unit counts)
+        for loc, connections in CONNECTIONS.items():
+            for conn in connections:
+                key = tuple(sorted((loc, conn)))
+                if key not in drawn:
+                    pygame.draw.line(layer, (150, 150, 150), LOCATIONS[loc], LOCATIONS[conn], 3)
+                    drawn.add(key)
+
+        # Location names (above the circles)
+        for loc, pos in LOCATIONS.items():
+            name_text = self.render_text(self.font, loc, (0, 0, 0))
+            layer.blit(name_text, name_text.get_rect(center=(pos[0], pos[1] - 50)))
+        return layer
+
+    def _render_board(self, state):
+        """Draws the state onto the board layer: the static map plus control colours, unit counts and the HUD"""
+        if self._static_layer is None or self._static_layer.get_size() != self.screen.get_size():
+            self._static_layer = self._build_static_layer()
+            self._board = self._static_layer.copy()
+        board = self._board
+        board.blit(self._static_layer, (0, 0))
+
+        # Draw locations (circles with control colors and unit counts)
         for loc, data in state['locations'].items():
             pos = LOCATIONS[loc]
             control = data['control']
@@ -224,48 +291,67 @@ class GameVisualizer:
                 color = (255, 100, 100)
             
             # Draw main circle
-            pygame.draw.circle(self.screen, color, pos, 35)
-            pygame.draw.circle(self.screen, (0, 0, 0), pos, 35, 3)
+            pygame.draw.circle(board, color, pos, 35)
+            pygame.draw.circle(board, (0, 0, 0), pos, 35, 3)
             
             # Draw inner circle for better visibility
-            pygame.draw.circle(self.screen, (255, 255, 255), pos, 25, 2)
-
-            # Location name (above the circle)
-            name_text = self.font.render(loc, True, (0, 0, 0))
-            text_rect = name_text.get_rect(center=(pos[0], pos[1] - 50))
-            self.screen.blit(name_text, text_rect)
+            pygame.draw.circle(board, (255, 255, 255), pos, 25, 2)
 
             # Unit counts (blue left, red right inside circle)
             blue_units = data['units'].get('Blue', 0)
             red_units = data['units'].get('Red', 0)
             
             if blue_units > 0:
-                blue_text = self.unit_font.render(str(blue_units), True, (0, 0, 150))
-                self.screen.blit(blue_text, (pos[0] - 25, pos[1] - 5))
+                board.blit(self.render_text(self.unit_font, str(blue_units), (0, 0, 150)), (pos[0] - 25, pos[1] - 5))
             
             if red_units > 0:
-                red_text = self.unit_font.render(str(red_units), True, (150, 0, 0))
-                self.screen.blit(red_text, (pos[0] + 10, pos[1] - 5))
+                board.blit(self.render_text(self.unit_font, str(red_units), (150, 0, 0)), (pos[0] + 10, pos[1] - 5))
 
         # Draw turn number and team resources
-        turn_text = self.font.render(f"Turn: {state['turn']}", True, (0, 0, 0))
-        self.screen.blit(turn_text, (10, 10))
+        board.blit(self.render_text(self.font, f"Turn: {state['turn']}", (0, 0, 0)), (10, 10))
 
         blue_res = state['teams']['Blue']['resources']
         blue_model_name = state['teams']['Blue'].get('model', 'Blue')
-        blue_text = self.font.render(f"{blue_model_name} Resources: {blue_res}", True, (0, 0, 255))
-        self.screen.blit(blue_text, (10, 40))
+        board.blit(self.render_text(self.font, f"{blue_model_name} Resources: {blue_res}", (0, 0, 255)), (10, 40))
 
         red_res = state['teams']['Red']['resources']
         red_model_name = state['teams']['Red'].get('model', 'Red')
-        red_text = self.font.render(f"{red_model_name} Resources: {red_res}", True, (255, 0, 0))
-        self.screen.blit(red_text, (10, 70))
-        
+        board.blit(self.render_text(self.font, f"{red_model_name} Resources: {red_res}", (255, 0, 0)), (10, 70))
+
+    def draw_game_state(self, game):
+        """Draw the current game state with enhanced visuals.
+
+        The state is only fetched and the board redrawn when the game or its turn changes
+        (call invalidate() to force it)."""
+        if game is not self._board_game or game.turn != self._board_turn:
+            state = game.get_full_state()
+            self._board_game = game
+            self._board_turn = game.turn
+        else:
+            state = self._board_state
+        self.draw_state(state)
+
+    @timed('render_frame')
+    def draw_state(self, state):
+        """Draw a state dict from Game.get_full_state().
+
+        The board is redrawn only when given a different state object; other frames repaint
+        just the areas animations and events touch and push only those to the display."""
+        if state is not self._board_state:
+            self._render_board(state)
+            self._board_state = state
+            self.screen.blit(self._board, (0, 0))
+            dirty = [self.screen.get_rect()]
+        else:
+            # Erase last frame's animations by restoring the board underneath them
+            dirty = [self.screen.blit(self._board, rect, rect) for rect in self._dirty]
+
         # Draw animations and effects
-        self.draw_animations()
-        self.draw_events()
+        self._dirty = self.draw_animations() + self.draw_events()
+        dirty += self._dirty
 
-        pygame.display.flip()
+        if dirty and not self.headless:
+            pygame.display.update(dirty)
     
     def process_action_results(self, results, team):
         """Process action results and create appropriate visual effects"""
@@ -310,6 +396,100 @@ class GameVisualizer:
             elif "Gained" in result and "resources" in result:
                 self.add_event(result, "info")
 
+class RenderLoop:
+    """
+    Drives a GameVisualizer from its own asyncio task, so the game loop never waits on drawing.
+
+    The game loop submits one event per turn (a state snapshot plus that turn's action
+    results); the render task shows each for `turn_seconds` while its animations play, at
+    up to `fps` frames per second. At most one event waits in the queue, so submit() holds
+    the game loop at most a turn ahead of the screen while it prefetches the next plan.
+
+    With max_speed the game loop is never held: animations are skipped, a waiting event is
+    replaced by the newer one, and the screen just shows the latest state.
+    """
+
+    def __init__(self, visualizer, fps=60, turn_seconds=2.0, max_speed=False):
+        self.visualizer = visualizer
+        self.frame_seconds = 1.0 / fps
+        self.turn_seconds = turn_seconds
+        self.max_speed = max_speed
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize=1)
+        self._state = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Cancels the render task (call drain() first to let queued turns play out)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, state, results=(), team=None, messages=(), hold=None):
+        """
+        Queues a turn for display.
+
+        :param state: snapshot from Game.get_full_state(), taken when the turn was played
+        :param results: that turn's action results, animated for `team`
+        :param messages: extra (text, event_type) lines for the event log
+        :param hold: seconds to show it (default turn_seconds; ignored in max speed mode)
+        """
+        event = (state, results, team, messages, self.turn_seconds if hold is None else hold)
+        if not self.max_speed:
+            await self._queue.put(event)
+            return
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+        # Let the render task in even when the controllers never await anything
+        await asyncio.sleep(0)
+
+    async def drain(self):
+        """Waits until every submitted turn has been shown for its full time"""
+        await self._queue.join()
+
+    def _show(self, event):
+        state, results, team, messages, hold = event
+        if not self.max_speed:
+            self.visualizer.process_action_results(results, team)
+        for text, event_type in messages:
+            self.visualizer.add_event(text, event_type)
+        self._state = state
+        return 0.0 if self.max_speed else hold
+
+    async def run(self):
+        showing_until = None  # loop time the current turn's display ends
+        loop = asyncio.get_running_loop()
+        while True:
+            frame_start = loop.time()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    self.visualizer.invalidate()
+
+            if showing_until is not None and frame_start >= showing_until:
+                self._queue.task_done()
+                showing_until = None
+            if showing_until is None and not self._queue.empty():
+                showing_until = frame_start + self._show(self._queue.get_nowait())
+
+            if self._state is not None:
+                self.visualizer.draw_state(self._state)
+            await asyncio.sleep(max(0.0, frame_start + self.frame_seconds - loop.time()))
+
 # Legacy functions for backward compatibility
 def init_visualization(width=800, height=600):
     """Legacy function - creates a basic screen"""